@@ -0,0 +1,78 @@
+import os
+import sys
+import gc
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from classes.Asset import Asset
+
+"""
+Memory of one ticker : the previous Asset (history DataFrame + a prices copy + returns + log returns, in a __dict__)
+versus the block-based Asset (one contiguous OHLCV block, views on demand).
+Measured with tracemalloc, on 20 years of daily bars and 59 days of 1 minute bars (float32).
+
+python benchmarks/bench_asset_memory.py
+"""
+
+N_ASSETS = 20
+
+
+class LegacyAsset:
+    """What the previous Asset kept for every ticker"""
+
+    def __init__(self, history:pd.DataFrame):
+        self.history = history
+        self.prices = self.history[['Close']].rename(columns={'Close': 'Price'})
+        self.returns = self.prices['Price'].pct_change().dropna()
+        self.log_returns = np.log( self.prices['Price'] / self.prices['Price'].shift(1) ).dropna()
+        self._rolling = {}
+        self._garch = {}
+        self._slices = {}
+
+
+def synthetic_bars(index:pd.DatetimeIndex, seed:int, dtype:str) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    bars = pd.DataFrame({'Open': close, 'High': close * 1.001, 'Low': close * 0.999, 'Close': close,
+                         'Volume': rng.integers(1_000, 100_000, len(index)).astype('int64'),
+                         'Dividends': 0.0, 'Stock Splits': 0.0}, index=index)
+    return bars.astype({c: dtype for c in bars.columns}) if dtype == 'float32' else bars
+
+
+def measure(build, index:pd.DatetimeIndex, dtype:str) -> tuple:
+    """
+    Returns (bytes kept per ticker after loading, bytes kept per ticker once the returns are used).
+    The bars are created inside the measure and dropped after the build, like the store's DataFrame
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    assets = [build(synthetic_bars(index, i, dtype)) for i in range(N_ASSETS)]
+    gc.collect()
+    loaded = tracemalloc.get_traced_memory()[0] - start
+    for a in assets:
+        a.returns, a.log_returns # computed on first use by the new Asset
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return loaded / N_ASSETS, used / N_ASSETS
+
+
+def main():
+    daily = pd.bdate_range(end='2025-01-01', periods=252 * 20, tz='America/New_York')
+    sessions = pd.bdate_range(end='2025-01-01', periods=41)
+    minutes = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(pd.Timestamp(d) + pd.Timedelta('9h30min'), periods=390, freq='1min').values for d in sessions
+    ])).tz_localize('America/New_York')
+
+    print(f"{'bars':>22} {'legacy (KB)':>12} {'block (KB)':>11} {'legacy + returns':>17} {'block + returns':>16} {'saving':>7}")
+    for label, index, dtype in [("daily, 20 years", daily, 'float64'), ("1 minute, 41 sessions", minutes, 'float32')]:
+        legacy = measure(LegacyAsset, index, dtype)
+        block = measure(lambda f: Asset.from_bars('SYN', f), index, dtype)
+        print(f"{label:>22} {legacy[0] / 1024:>12.0f} {block[0] / 1024:>11.0f} {legacy[1] / 1024:>17.0f} "
+              f"{block[1] / 1024:>16.0f} {1 - block[1] / legacy[1]:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from classes.optimizer import (frontier_return_weights, efficient_frontier_weights, evaluate_weights,
+                               solve_mean_variance, solve_risk_parity)
+
+"""
+Time of the optimizer as the universe grows.
+The covariance comes from a 3 factor model (like real stocks : a few common factors + specific risk).
+
+python benchmarks/bench_optimizer.py
+"""
+
+SIZES = [6, 20, 50, 100, 200, 500]
+N_POINTS = 100
+
+
+def synthetic_universe(n:int, seed:int = 0):
+    """Returns annualized (mu, cov) for n assets"""
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0, 0.2, size=(n, 3))
+    cov = loadings @ loadings.T + np.diag(rng.uniform(0.02, 0.10, n))
+    mu = 0.02 + 0.5 * loadings[:, 0] ** 2 + rng.normal(0, 0.03, n)
+    return mu, cov
+
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    res = f(*args, **kwargs)
+    return res, time.perf_counter() - start
+
+
+def main():
+    print(f"{'assets':>7} {'frontier (s)':>13} {'per point (ms)':>15} {'min var (s)':>12} {'risk parity (s)':>16}")
+    for n in SIZES:
+        mu, cov = synthetic_universe(n)
+        return_weights = frontier_return_weights(mu, cov, N_POINTS)
+        W, t_frontier = timed(efficient_frontier_weights, mu, cov, return_weights)
+        evaluate_weights(W, mu, cov)
+        _, t_min_var = timed(solve_mean_variance, cov, mu, 0.0)
+        _, t_rp = timed(solve_risk_parity, cov)
+        print(f"{n:>7} {t_frontier:>13.3f} {1000 * t_frontier / N_POINTS:>15.2f} {t_min_var:>12.3f} {t_rp:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
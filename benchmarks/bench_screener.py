@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from load_data.price_store import PriceStore, FixtureProvider
+from classes.screener import screen
+from classes.Asset import Asset
+from classes.BuyHold import BuyHold
+
+"""
+Full-universe refresh of the screener versus one Asset + BuyHold per ticker.
+Synthetic S&P 500 sized universe (500 tickers, up to 20 years, some listed later), written once to a
+temporary price store, so both sides read the same parquet cache.
+The object path is timed on a sample and extrapolated to the whole universe.
+
+python benchmarks/bench_screener.py
+"""
+
+N_TICKERS = 500
+YEARS = 20
+SAMPLE = 25
+
+
+def synthetic_bars(n:int, seed:int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    vol = rng.uniform(0.15, 0.6) / np.sqrt(252)
+    # Student-t shocks, so the tails (Hill) look like stocks
+    shocks = rng.standard_t(4, n) * vol / np.sqrt(2)
+    close = 50 * np.exp(np.cumsum(shocks + 0.0003))
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n, tz='America/New_York')
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                         'Volume': 1e6, 'Dividends': 0.0, 'Stock Splits': 0.0}, index=dates)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    n_max = 252 * YEARS
+    frames = {f"S{i:03d}": synthetic_bars(int(rng.integers(n_max // 4, n_max + 1)), i) for i in range(N_TICKERS)}
+    store = PriceStore(tempfile.mkdtemp(), FixtureProvider(frames))
+    store.prefetch(list(frames))
+    tickers = list(frames)
+
+    start = time.perf_counter()
+    prices = store.load_matrix(tickers)
+    t_load = time.perf_counter() - start
+    start = time.perf_counter()
+    table = screen(prices)
+    t_screen = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in tickers[:SAMPLE]:
+        asset = Asset(t, store=store)
+        strat = BuyHold(asset, asset.prices.index[0], asset.prices.index[-1])
+        strat.metrics()
+        asset.get_hill_estimator()
+    t_objects = (time.perf_counter() - start) / SAMPLE * N_TICKERS
+
+    print(f"universe : {prices.shape[1]} tickers x {prices.shape[0]} dates, {len(table.columns)} metrics")
+    print(f"{'load matrix (s)':>16} {'screen (s)':>11} {'total (s)':>10} {'Asset + BuyHold (s, est.)':>26} {'speedup':>8}")
+    total = t_load + t_screen
+    print(f"{t_load:>16.3f} {t_screen:>11.3f} {total:>10.3f} {t_objects:>26.2f} {t_objects / total:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import datetime
+import subprocess
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from fixtures import synthetic_universe, fixture_store, bar_index
+from classes.Asset import Asset
+from classes.BuyHold import BuyHold
+from classes.Momentum import Momentum
+from classes.portfolio import Portfolio
+
+"""
+Benchmark suite of the classes, on synthetic fixtures (fixtures.py, no network).
+
+For every history length : Asset construction (from the parquet store and from bars), rolling mean / std,
+Hill estimator, every BuyHold / Momentum metric, and the Portfolio correlation / diversification ratio / value
+on n_tickers tickers. Each case runs `repeat` times on fresh objects (the classes memoize), the median is kept.
+
+The results are written as JSON (benchmarks/results/<date>_<commit>.json). With a baseline, every case is compared
+to it and the run fails (exit code 1) if one is slower than baseline x (1 + tolerance) : run it on the EC2 instance
+before deploying, with a baseline saved on the same machine.
+
+python benchmarks/bench_suite.py --bars 1000,100000 --tickers 5 --save-baseline
+python benchmarks/bench_suite.py --bars 1000,100000 --tickers 5
+python benchmarks/bench_suite.py --bars 10000000 --tickers 2 --model student --repeat 1
+"""
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+MIN_DELTA = 0.002 # seconds : slower by less than that is noise, never a regression
+
+
+# -------------------------------------------------------
+# CASES
+# -------------------------------------------------------
+
+def _strategy_metrics(strat):
+    """Every metric of a strategy, like the Strategies page"""
+    strat.metrics()
+    strat.pnl(), strat.drawdown(), strat.annualized_volatility(), strat.downside_volatility()
+    strat.sharpe(), strat.sortino(), strat.historical_VaR(), strat.historical_ES()
+
+def _fresh_asset(ticker:str, bars:pd.DataFrame, interval:str) -> Asset:
+    return Asset.from_bars(ticker, bars, interval=interval)
+
+def _portfolio(universe:dict, interval:str) -> Portfolio:
+    p = Portfolio("Benchmark")
+    for t, bars in universe.items():
+        p.add_asset(t, asset=_fresh_asset(t, bars, interval))
+    p.set_equal_weights()
+    return p
+
+def build_cases(n_bars:int, n_tickers:int, model:str, seed:int) -> tuple:
+    """
+    Returns (store, cases) : cases is a list of (name, setup, run), setup() builds fresh objects (not timed),
+    run(state) is the timed part
+    """
+    universe = synthetic_universe(n_tickers, n_bars, model, seed)
+    ticker, bars = next(iter(universe.items()))
+    _, interval = bar_index(n_bars)
+    store = fixture_store(universe)
+    start, end = bars.index[0], bars.index[-1]
+
+    def asset():
+        return _fresh_asset(ticker, bars, interval)
+
+    def strategy(cls, **params):
+        def setup():
+            strat = cls(asset(), start, end)
+            if params:
+                strat.define_positions(**params)
+            return strat
+        return setup
+
+    cases = [
+        ("Asset (store)", lambda: None, lambda _: Asset(ticker, store=store, interval=interval)),
+        ("Asset.from_bars", lambda: None, lambda _: asset()),
+        ("Asset.rolling_mean", asset, lambda a: a.rolling_mean(20)),
+        ("Asset.rolling_std", asset, lambda a: a.rolling_std(20)),
+        ("Asset.get_hill_estimator", asset, lambda a: a.get_hill_estimator()),
+        ("BuyHold metrics", strategy(BuyHold), _strategy_metrics),
+        ("Momentum metrics", strategy(Momentum, w=20), _strategy_metrics),
+        ("Portfolio.correlation_matrix", lambda: _portfolio(universe, interval), lambda p: p.correlation_matrix()),
+        ("Portfolio.diversification_ratio", lambda: _portfolio(universe, interval), lambda p: p.diversification_ratio()),
+        ("Portfolio.portfolio_value", lambda: _portfolio(universe, interval), lambda p: p.portfolio_value()),
+    ]
+    return store, cases
+
+def time_case(setup, run, repeat:int) -> list:
+    """Returns the time of each run, on fresh objects"""
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+        del state
+    return times
+
+
+# -------------------------------------------------------
+# RESULTS
+# -------------------------------------------------------
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def environment() -> dict:
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(), 'node': platform.node(),
+            'cpus': os.cpu_count(), 'commit': _git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds')}
+
+def compare(results:dict, baseline:dict, tolerance:float) -> pd.DataFrame:
+    """
+    Returns one row per case found in both runs : baseline and current medians, ratio, regression flag.
+    A case is a regression when it is slower than baseline x (1 + tolerance) and by more than MIN_DELTA seconds
+    """
+    rows = []
+    for key, res in results.items():
+        if key not in baseline:
+            continue
+        base, cur = baseline[key]['median'], res['median']
+        rows.append({'case': key, 'baseline (s)': base, 'current (s)': cur, 'ratio': cur / base if base else np.nan,
+                     'regression': cur > base * (1 + tolerance) and cur - base > MIN_DELTA})
+    return pd.DataFrame(rows, columns=['case', 'baseline (s)', 'current (s)', 'ratio', 'regression']).set_index('case')
+
+def save_json(data:dict, path:str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite on synthetic fixtures")
+    parser.add_argument('--bars', default="1000,10000,100000", help="Comma separated history lengths (1k to 10M)")
+    parser.add_argument('--tickers', type=int, default=5, help="Number of tickers of the portfolio cases")
+    parser.add_argument('--model', choices=['gbm', 'student'], default='gbm', help="Normal or fat-tailed returns")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON file of the results (default benchmarks/results/<date>_<commit>.json)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="JSON results to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="Also writes the results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Slowdown allowed before a regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(float(s)) for s in args.bars.split(',') if s.strip()]
+    env = environment()
+    results = {}
+    print(f"{'case':<34} {'bars':>10} {'median (s)':>11} {'min (s)':>10}")
+    for n_bars in sizes:
+        store, cases = build_cases(n_bars, args.tickers, args.model, args.seed)
+        for name, setup, run in cases:
+            times = time_case(setup, run, args.repeat)
+            key = f"{name} [{n_bars} bars]"
+            results[key] = {'case': name, 'bars': n_bars, 'median': float(np.median(times)), 'min': float(min(times)),
+                            'runs': times}
+            print(f"{name:<34} {n_bars:>10} {np.median(times):>11.4f} {min(times):>10.4f}")
+        del store, cases
+        gc.collect()
+
+    data = {'environment': env,
+            'config': {'bars': sizes, 'tickers': args.tickers, 'model': args.model, 'repeat': args.repeat, 'seed': args.seed},
+            'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"{env['date'][:10]}_{env['commit'] or 'nocommit'}.json")
+    save_json(data, output)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        save_json(data, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with (--save-baseline creates it)")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config', {}).get('model') != args.model or baseline.get('environment', {}).get('node') != env['node']:
+        print("Warning : the baseline was made on another machine or model, the ratios are not comparable")
+    table = compare(results, baseline['results'], args.tolerance)
+    if table.empty:
+        print("No case in common with the baseline")
+        return 0
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.max_columns', None):
+        print(table.round(4))
+    regressions = table[table['regression']]
+    if not regressions.empty:
+        print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%} : {', '.join(regressions.index)}")
+        return 1
+    print(f"\nNo regression above {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from classes.walkforward import WalkForward
+
+"""
+Speedup of the walk-forward runner with the number of processes.
+Synthetic 20 years of daily GBM prices, 3y train / 6m test folds, windows 5..200.
+Also checks that every number of processes gives exactly the same folds and equity.
+
+python benchmarks/bench_walkforward.py
+"""
+
+YEARS = 20
+REPEAT = 3
+
+
+class SyntheticAsset:
+    """Only what WalkForward reads from an Asset"""
+    periods_per_year = 252 # daily bars
+
+    def __init__(self, n:int, seed:int = 0):
+        rng = np.random.default_rng(seed)
+        log_returns = rng.normal(0.07 / 252, 0.2 / np.sqrt(252), n)
+        dates = pd.bdate_range("2000-01-03", periods=n)
+        self.prices = pd.DataFrame({'Price': 100 * np.exp(np.cumsum(log_returns))}, index=dates)
+
+
+def best_time(f, repeat:int = REPEAT):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = f()
+        times.append(time.perf_counter() - start)
+    return res, min(times)
+
+
+def main():
+    asset = SyntheticAsset(252 * YEARS)
+    walk = WalkForward(asset, train=756, test=126)
+    cores = os.cpu_count() or 1
+
+    (ref_folds, ref_equity), t_1 = best_time(lambda: walk.run(n_jobs=1))
+    print(f"{len(ref_folds)} folds, {len(walk.windows)} windows, {cores} core(s)")
+    print(f"{'n_jobs':>7} {'time (s)':>9} {'speedup':>8} {'identical':>10}")
+    print(f"{1:>7} {t_1:>9.3f} {1.0:>8.2f} {'yes':>10}")
+
+    for n_jobs in range(2, max(cores, 2) + 1):
+        (folds, equity), t = best_time(lambda: walk.run(n_jobs=n_jobs))
+        identical = folds.equals(ref_folds) and equity.equals(ref_equity)
+        print(f"{n_jobs:>7} {t:>9.3f} {t_1 / t:>8.2f} {'yes' if identical else 'NO':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import datetime
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from load_data.price_store import PriceStore, FixtureProvider, DAILY
+
+"""
+Synthetic OHLCV fixtures for the benchmarks : no network, same seed -> same bars.
+
+The closes follow a GBM (normal log returns) or a fat-tailed walk (Student-t log returns with the same volatility),
+the open / high / low / volume are built around them so the bars are consistent (low <= open, close <= high).
+Up to DAILY_MAX bars are daily business days ending yesterday, longer histories are 1 minute bars of
+390 minute sessions (10M bars ~ 100 years of minutes), like the intraday partitions of the store.
+"""
+
+DAILY_MAX = 50_000
+SESSION_MINUTES = 390
+
+
+def bar_index(n:int, tz:str = 'America/New_York') -> tuple:
+    """Returns (index of n bars ending yesterday, interval of the store : '1d' or '1m')"""
+    end = pd.Timestamp(datetime.date.today() - datetime.timedelta(days=1))
+    if n <= DAILY_MAX:
+        return pd.bdate_range(end=end, periods=n, tz=tz), DAILY
+
+    sessions = pd.bdate_range(end=end, periods=-(-n // SESSION_MINUTES))
+    opens = sessions.asi8 + pd.Timedelta('9h30min').value
+    minutes = np.arange(SESSION_MINUTES, dtype=np.int64) * pd.Timedelta('1min').value
+    stamps = (opens[:, None] + minutes[None, :]).ravel()[-n:]
+    return pd.DatetimeIndex(stamps).tz_localize(tz), '1m'
+
+
+def synthetic_bars(n:int, seed:int = 0, model:str = 'gbm', annual_vol:float = 0.25, annual_drift:float = 0.07,
+                   df:float = 3, dtype:str | None = None) -> pd.DataFrame:
+    """
+    Takes the number of bars, the model ('gbm' or 'student', df degrees of freedom) and the annualized moments
+    Returns the OHLCV bars (float32 for the 1 minute bars unless dtype says otherwise)
+    """
+    rng = np.random.default_rng(seed)
+    index, interval = bar_index(n)
+    periods_per_year = 252 if interval == DAILY else 252 * SESSION_MINUTES
+    vol = annual_vol / np.sqrt(periods_per_year)
+
+    if model == 'gbm':
+        shocks = rng.standard_normal(n)
+    elif model == 'student':
+        # Scaled to a unit variance, so both models have the same volatility
+        shocks = rng.standard_t(df, n) * np.sqrt((df - 2) / df)
+    else:
+        raise ValueError(f"Unknown model {model}, expected 'gbm' or 'student'")
+
+    log_returns = (annual_drift / periods_per_year - 0.5 * vol ** 2) + vol * shocks
+    close = 100 * np.exp(np.cumsum(log_returns))
+    open_ = np.empty(n)
+    open_[0] = 100
+    open_[1:] = close[:-1] * np.exp(rng.normal(0, vol / 4, n - 1)) # small gap between two bars
+    spread = np.abs(rng.normal(0, vol / 2, n))
+    bars = pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + spread),
+        'Low': np.minimum(open_, close) * (1 - spread),
+        'Close': close,
+        'Volume': np.round(rng.lognormal(13, 0.5, n)),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index)
+    dtype = dtype or ('float64' if interval == DAILY else 'float32')
+    return bars.astype(dtype)
+
+
+def synthetic_universe(n_tickers:int, n_bars:int, model:str = 'gbm', seed:int = 0) -> dict:
+    """Returns {ticker: bars} of n_tickers tickers (SYN000, SYN001...) with different volatilities"""
+    rng = np.random.default_rng(seed)
+    return {f"SYN{i:03d}": synthetic_bars(n_bars, seed + i, model, annual_vol=float(rng.uniform(0.15, 0.6)))
+            for i in range(n_tickers)}
+
+
+def fixture_store(frames:dict, path:str | None = None) -> PriceStore:
+    """
+    Takes {ticker: bars} (daily or 1 minute)
+    Returns a PriceStore on a temporary folder whose provider serves these bars, with every ticker already cached
+    """
+    keyed = {}
+    for ticker, bars in frames.items():
+        _, interval = bar_index(len(bars)) if len(bars) else (None, DAILY)
+        keyed[ticker if interval == DAILY else (ticker, interval)] = bars
+    store = PriceStore(path or tempfile.mkdtemp(prefix='bench_store_'), FixtureProvider(keyed))
+    for key in keyed:
+        ticker, interval = key if isinstance(key, tuple) else (key, DAILY)
+        store.get_history(ticker, interval=interval)
+    return store
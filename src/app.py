@@ -1,4 +1,5 @@
 from ui.views import *
+from classes import instrumentation
 import streamlit as st
 
 pages = [
@@ -6,19 +7,27 @@ pages = [
     st.Page(render_stocks, title="Stocks", icon=":material/area_chart:", url_path="stocks"),
     st.Page(render_strategies, title="Strategies", icon=":material/chess_knight:", url_path="strategies"),
     st.Page(render_pricing, title="Pricing", icon=":material/attach_money:", url_path="pricing"),
-    st.Page(render_portfolio, title="Portfolio", icon=":material/work:", url_path="portfolio")
+    st.Page(render_portfolio, title="Portfolio", icon=":material/work:", url_path="portfolio"),
+    st.Page(render_screener, title="Screener", icon=":material/filter_list:", url_path="screener")
 ]
 
 pg = st.navigation(pages, position="hidden")
 st.set_page_config(page_title="Financial Dashboard", layout="wide")
 
 with st.container():
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
     with col1: st.page_link(pages[0], label="Home", icon=":material/home:", use_container_width=True)
     with col2: st.page_link(pages[1], label="Stocks", icon=":material/area_chart:", use_container_width=True)
     with col3: st.page_link(pages[2], label="Strategies", icon=":material/chess_knight:", use_container_width=True)
     with col4: st.page_link(pages[3], label="Pricing", icon=":material/attach_money:", use_container_width=True)
     with col5: st.page_link(pages[4], label="Portfolio", icon=":material/work:", use_container_width=True)
+    with col6: st.page_link(pages[5], label="Screener", icon=":material/filter_list:", use_container_width=True)
     st.divider()
 
-pg.run()
\ No newline at end of file
+# Every event of this rerun is tagged with its id, the hidden debug panel (?debug=1) shows them
+rerun = instrumentation.start_rerun(pg.title)
+with instrumentation.span(f"page:{pg.title}"):
+    pg.run()
+
+if st.query_params.get("debug") == "1":
+    render_debug_panel(rerun)
@@ -1,55 +1,401 @@
-import yfinance as yf
+import functools
+import threading
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
+from load_data.price_store import PriceStore, get_default_store, DAILY
+from classes.downsample import MAX_POINTS, downsample_series, resample_ohlc, aggregate_ohlcv
+from classes.metrics import infer_periods_per_year
+from classes.montecarlo import monte_carlo_risk
+from classes.garch import GARCH
+from classes import rolling
+from classes.instrumentation import timed
+
+
+def _locked(f):
+    """Runs the method under the lock of the asset : its caches are filled lazily and the app shares the object"""
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return f(self, *args, **kwargs)
+    return wrapper
+
 
 class Asset:
     """
     A personalized class based on the Ticker class of yfinance
+    interval is the resolution of the bars ('1d', or intraday '1m', '5m', '1h'...), coarser bars come from bars()
+
+    The bars are kept once, as one contiguous (bars x columns) block, one column after the other.
+    history, prices, returns and log_returns are pandas views built on demand : history and prices share the memory
+    of the block, the returns are computed once (float64) and kept until new bars arrive.
+
+    The Streamlit sessions share the same Asset (ui/cache.py) : every method filling or reading a cache
+    (views, returns, slices, rolling series, resampled bars, GARCH) holds the lock of the asset (reentrant).
     """
+    __slots__ = ('ticker_symbol', 'start_date', 'end_date', 'interval', 'store',
+                 '_index', '_block', '_columns', '_returns', '_views',
+                 '_rolling', '_garch', '_slices', '_resampled', '_periods_per_year', '_lock', '__weakref__')
+
+    EMPTY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
     # Constructor
-    def __init__(self, ticker_symbol:str, start_date:str=None, end_date:str=None):
+    @timed()
+    def __init__(self, ticker_symbol:str, start_date:str=None, end_date:str=None, store:PriceStore=None,
+                 interval:str=DAILY):
         self.ticker_symbol = ticker_symbol
         self.start_date = start_date
         self.end_date = end_date
-        
+        self.interval = interval
+        self.store = store if store is not None else get_default_store()
+        self._init_caches()
+
         try:
-            self.ticker = yf.Ticker(ticker_symbol)
+            # The store reads the local cache first and only downloads the missing dates
             if start_date and end_date:
-                self.history = self.ticker.history(start=start_date, end=end_date, auto_adjust=True)
+                history = self.store.get_history(ticker_symbol, start_date, end_date, interval=interval)
             else:
-                self.history = self.ticker.history(period="max", auto_adjust=True)
-
-            self.prices = self.history[['Close']].rename(columns={'Close': 'Price'})
-            self.returns = self.prices['Price'].pct_change().dropna()
-            self.log_returns = np.log( self.prices['Price'] / self.prices['Price'].shift(1) ).dropna()
+                history = self.store.get_history(ticker_symbol, interval=interval)
+            self._set_history(history)
 
         except Exception as e:
             print(f"Error while creating the Asset : {e}")
+            # Empty data instead of missing attributes, so callers can just check history.empty
+            self._set_history(pd.DataFrame(columns=self.EMPTY_COLUMNS, dtype='float64'))
+
+    def _init_caches(self):
+        self._lock = threading.RLock()
+        # cached rolling series, {('Mean', window): [lo, values, live state]} : values of the positions [lo, lo + len)
+        # of the prices (Mean) or log returns (Std), the live state extends them bar by bar in update()
+        self._rolling = {}
+        self._garch = {} # last fitted GARCH of each model, {'garch': GARCH}
+        self._slices = {} # price slices shared by the strategies, {(start, end, n_prices): (dates, prices, returns)}
+        self._resampled = {} # coarser bars derived from the history, {rule: (n_bars, Asset)}
+        self._periods_per_year = None # (n_bars, value)
+
+    def _set_history(self, history:pd.DataFrame):
+        """Packs the bars into the block (float32 stays float32, everything else is float64)"""
+        columns = list(history.columns)
+        dtype = 'float32' if len(columns) and all(t == np.float32 for t in history.dtypes) else 'float64'
+        self._index = history.index if isinstance(history.index, pd.DatetimeIndex) else pd.DatetimeIndex(history.index)
+        self._block = np.asfortranarray(history.to_numpy(dtype=dtype))
+        self._columns = pd.Index(columns)
+        self._returns = None
+        self._views = {}
+
+    @classmethod
+    @timed()
+    def from_bars(cls, ticker_symbol:str, bars:pd.DataFrame, interval:str=DAILY, store:PriceStore=None):
+        """
+        Returns an Asset on already loaded bars (nothing is asked to the store)
+        """
+        asset = cls.__new__(cls)
+        asset.ticker_symbol = ticker_symbol
+        asset.start_date = None
+        asset.end_date = None
+        asset.interval = interval
+        asset.store = store if store is not None else get_default_store()
+        asset._init_caches()
+        asset._set_history(bars)
+        return asset
+
+    # Views on the block
+    @property
+    @_locked
+    def history(self) -> pd.DataFrame:
+        """OHLCV bars (no copy of the block)"""
+        if 'history' not in self._views:
+            # (bars x columns) in Fortran order is exactly the (columns x bars) block pandas keeps inside
+            self._views['history'] = pd.DataFrame(self._block, index=self._index, columns=self._columns, copy=False)
+        return self._views['history']
+
+    @property
+    @_locked
+    def prices(self) -> pd.DataFrame:
+        """Close prices, as a 'Price' column (no copy of the block)"""
+        if 'prices' not in self._views:
+            if 'Close' in self._columns:
+                j = self._columns.get_loc('Close')
+                close = self._block[:, j:j + 1]
+            else:
+                close = np.empty((len(self._index), 1))
+            self._views['prices'] = pd.DataFrame(close, index=self._index, columns=['Price'], copy=False)
+        return self._views['prices']
+
+    @_locked
+    def _return_arrays(self) -> tuple:
+        """(dates, returns, log returns) computed once from the closes, in float64, without the missing values"""
+        if self._returns is None:
+            p = self.prices['Price'].to_numpy(dtype='float64')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = p[1:] / p[:-1]
+            returns, log_returns = ratio - 1, np.log(ratio)
+            dates = self._index[1:]
+            valid = ~np.isnan(returns)
+            if not valid.all():
+                dates, returns, log_returns = dates[valid], returns[valid], log_returns[valid]
+            self._returns = (dates, returns, log_returns)
+        return self._returns
+
+    @property
+    @_locked
+    def returns(self) -> pd.Series:
+        """Simple returns (computed once)"""
+        if 'returns' not in self._views:
+            dates, returns, _ = self._return_arrays()
+            self._views['returns'] = pd.Series(returns, index=dates, name='Price', copy=False)
+        return self._views['returns']
+
+    @property
+    @_locked
+    def log_returns(self) -> pd.Series:
+        """Log returns (computed once)"""
+        if 'log_returns' not in self._views:
+            dates, _, log_returns = self._return_arrays()
+            self._views['log_returns'] = pd.Series(log_returns, index=dates, name='Price', copy=False)
+        return self._views['log_returns']
 
+    @property
+    @_locked
+    def nbytes(self) -> int:
+        """Memory held by the asset : block, dates, returns and the cached rolling series and slices"""
+        total = self._block.nbytes + self._index.nbytes
+        if self._returns is not None:
+            total += sum(a.nbytes for a in self._returns)
+        total += sum(values.nbytes for _, values, _ in self._rolling.values())
+        total += sum(p.nbytes + r.nbytes for _, p, r in self._slices.values())
+        return total
+
+    @property
+    @_locked
+    def periods_per_year(self) -> float:
+        """
+        Number of bars in a year, inferred from the dates (252 for daily stocks, 365 for crypto, 78 x 252 for 5m stocks...)
+        Every annualized metric of the asset and its strategies uses it
+        """
+        n = len(self._index)
+        if self._periods_per_year is None or self._periods_per_year[0] != n:
+            self._periods_per_year = (n, infer_periods_per_year(self._index))
+        return self._periods_per_year[1]
+
+    # Resampling
+    @timed()
+    def bars(self, rule:str) -> pd.DataFrame:
+        """
+        Takes a coarser rule than the base interval ('15min', '1h', '1D'...)
+        Returns the OHLCV bars at this resolution, derived from the stored bars (computed once per rule, and again
+        only when new bars arrive)
+        """
+        return self.resample(rule).history
+
+    @_locked
+    def resample(self, rule:str):
+        """
+        Returns an Asset on the bars of `rule` (same ticker, no download), cached like bars()
+        """
+        cached = self._resampled.get(rule)
+        if cached is None or cached[0] != len(self._index):
+            bars = aggregate_ohlcv(self.history, rule)
+            interval = DAILY if pd.Timedelta(rule) >= pd.Timedelta('1D') else rule
+            self._resampled[rule] = (len(self._index), Asset.from_bars(self.ticker_symbol, bars, interval, self.store))
+        return self._resampled[rule][1]
+
+    @property
+    def ticker(self):
+        """
+        The yfinance Ticker (only created when needed, prices don't go through it anymore)
+        """
+        import yfinance as yf
+        return yf.Ticker(self.ticker_symbol)
+
+    # Update Method
+    @timed()
+    @_locked
+    def update(self, new_bars:pd.DataFrame=None):
+        """
+        Takes the new OHLCV bars as parameter (if None, asks the store for the bars after the last one)
+        Appends them and extends returns, log returns and the cached rolling windows, without recomputing the past.
+        Returns the number of bars added
+        """
+        if new_bars is None:
+            if not len(self._index):
+                return 0
+            new_bars = self.store.get_history(self.ticker_symbol, start_date=self._index[-1], interval=self.interval)
+
+        if len(self._index):
+            new_bars = new_bars[new_bars.index > self._index[-1]]
+        if new_bars.empty:
+            return 0
+        n_new = len(new_bars)
+
+        if not len(self._index):
+            self._set_history(new_bars)
+            return n_new
+
+        # Only the new returns are computed (the last known price is enough to link them)
+        old_returns = self._returns
+        last_price = float(self._block[-1, self._columns.get_loc('Close')])
+        linked = np.concatenate([[last_price], new_bars['Close'].to_numpy(dtype='float64')])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = linked[1:] / linked[:-1]
+        valid = ~np.isnan(ratio)
+
+        # One new block (same columns and dtype), the views are rebuilt on demand
+        new_block = new_bars.reindex(columns=self._columns).to_numpy(dtype=self._block.dtype)
+        self._block = np.asfortranarray(np.concatenate([self._block, new_block]))
+        self._index = self._index.append(new_bars.index)
+        self._views = {}
+        if old_returns is not None:
+            dates, returns, log_returns = old_returns
+            self._returns = (dates.append(new_bars.index[valid]),
+                             np.concatenate([returns, ratio[valid] - 1]),
+                             np.concatenate([log_returns, np.log(ratio[valid])]))
+
+        # Rolling windows : the ones reaching the last bar are extended in O(1) per new value
+        old_lengths = {'Mean': len(self._index) - n_new,
+                       'Std': len(old_returns[2]) if old_returns is not None else 0}
+        for (kind, window), entry in self._rolling.items():
+            lo, values, state = entry
+            old_n = old_lengths[kind]
+            _, x = self._rolling_source(kind)
+            if lo + len(values) != old_n or len(x) == old_n:
+                continue
+            new = x[old_n:]
+            if np.isnan(x[max(0, old_n - window):]).any():
+                # A missing price would stay in the live sums : the engine recomputes the tail
+                tail = self._compute_rolling(kind, x, [window], old_n, len(x))[0]
+                state = None
+            else:
+                if state is None:
+                    state = rolling.RollingWindow.from_values(x[:old_n], window)
+                tail = np.empty(len(new))
+                for j, v in enumerate(new):
+                    state.append(v)
+                    tail[j] = state.mean if kind == 'Mean' else state.std
+            values = np.concatenate([values, tail])
+            values.flags.writeable = False
+            entry[1], entry[2] = values, state
+
+        if self.end_date:
+            self.end_date = self._index[-1]
+        return n_new
+
+    @_locked
+    def price_slice(self, start_date=None, end_date=None):
+        """
+        Takes a date range
+        Returns (dates, prices, returns) as NumPy arrays, returns[0] = 0 (nothing held before the start).
+        Computed once per range : every strategy on these dates shares the same arrays (read only).
+        """
+        key = (str(start_date), str(end_date), len(self.prices))
+        if key not in self._slices:
+            prices = self.prices['Price'].loc[start_date:end_date]
+            p = prices.to_numpy(dtype='float64')
+            r = np.zeros(len(p))
+            r[1:] = p[1:] / p[:-1] - 1
+            p.flags.writeable = False
+            r.flags.writeable = False
+            # Only the last ranges are kept, the dates of the UI change often
+            if len(self._slices) >= 16:
+                self._slices.pop(next(iter(self._slices)))
+            self._slices[key] = (prices.index, p, r)
+        return self._slices[key]
+
+    def _rolling_source(self, kind:str) -> tuple:
+        """(dates, values) the rolling series of kind are computed on : prices for 'Mean', log returns for 'Std'"""
+        if kind == 'Mean':
+            return self._index, self._block[:, self._columns.get_loc('Close')] if 'Close' in self._columns else np.empty(0)
+        dates, _, log_returns = self._return_arrays()
+        return dates, log_returns
+
+    @staticmethod
+    def _compute_rolling(kind:str, x:np.ndarray, windows:list, start:int, stop:int) -> np.ndarray:
+        if kind == 'Mean':
+            return rolling.rolling_mean(x, windows, start, stop)
+        return rolling.rolling_std(x, windows, start, stop)
+
+    @_locked
+    def _rolling_values(self, kind:str, windows:list, start_date=None, end_date=None) -> tuple:
+        """
+        Takes the kind ('Mean' or 'Std'), the windows and a date range
+        Returns (dates, (windows x dates) values). Only the positions missing from the cache (and their warm-up)
+        are computed, all the windows missing the same positions in one pass
+        """
+        dates, x = self._rolling_source(kind)
+        i0, i1, _ = dates.slice_indexer(start_date, end_date).indices(len(dates))
+        i1 = max(i0, i1)
+
+        missing = {} # {(start, stop): windows}
+        for w in windows:
+            entry = self._rolling.get((kind, w))
+            if entry is None or i1 < entry[0] or i0 > entry[0] + len(entry[1]):
+                missing.setdefault((i0, i1), []).append(w)
+                continue
+            lo, hi = entry[0], entry[0] + len(entry[1])
+            if i0 < lo:
+                missing.setdefault((i0, lo), []).append(w)
+            if i1 > hi:
+                missing.setdefault((hi, i1), []).append(w)
+
+        for (a, b), ws in missing.items():
+            for w, values in zip(ws, self._compute_rolling(kind, x, ws, a, b)):
+                entry = self._rolling.get((kind, w))
+                if entry is None or b < entry[0] or a > entry[0] + len(entry[1]):
+                    entry = [a, values, None] # nothing to join (or far away) : the new range replaces it
+                elif b == entry[0]:
+                    entry = [a, np.concatenate([values, entry[1]]), entry[2]]
+                else:
+                    entry = [entry[0], np.concatenate([entry[1], values]), None]
+                entry[1].flags.writeable = False
+                self._rolling[(kind, w)] = entry
+
+        res = np.empty((len(windows), i1 - i0))
+        for k, w in enumerate(windows):
+            lo, values, _ = self._rolling[(kind, w)]
+            res[k] = values[i0 - lo:i1 - lo]
+        return dates[i0:i1], res
+
+    @timed()
     def rolling_mean(self, window:int=20, start_date=None, end_date=None):
         """
-        Takes a window size as parameter (default 20 days)
+        Takes a window size as parameter (default 20 days) and a date range (default the whole history)
         Returns the rolling mean of the prices
         """
-        res = self.prices.rolling(window).mean().rename(columns={'Price': 'Mean'})
-        if start_date:
-            res = res[res.index >= start_date]
-        if end_date:
-            res = res[res.index <= end_date]
-        return res
+        dates, values = self._rolling_values('Mean', [window], start_date, end_date)
+        return pd.DataFrame(values[0], index=dates, columns=['Mean'])
+
+    @timed()
+    def rolling_means(self, windows:list, start_date=None, end_date=None):
+        """
+        Takes several window sizes and a date range
+        Returns the rolling means of the prices, one column per window (computed in one pass)
+        """
+        windows = [int(w) for w in windows]
+        dates, values = self._rolling_values('Mean', windows, start_date, end_date)
+        return pd.DataFrame(values.T, index=dates, columns=windows)
 
-    def rolling_std(self, window:int=20):
+    @timed()
+    def rolling_std(self, window:int=20, start_date=None, end_date=None):
         """
-        Takes a window size as parameter (default 20 days)
-        Returns the rolling standard deviation of the prices
+        Takes a window size as parameter (default 20 days) and a date range (default the whole history)
+        Returns the rolling standard deviation of the log returns
         """
-        rolling_std_series = self.log_returns.rolling(window=window).std() 
-        rolling_std = rolling_std_series.to_frame(name='Std') 
-        return rolling_std
-        return rolling_std
-    
+        dates, values = self._rolling_values('Std', [window], start_date, end_date)
+        return pd.DataFrame(values[0], index=dates, columns=['Std'])
+
     # I'll try to do some EVT
+    @staticmethod
+    def _hill_curve(log_losses, max_k:int):
+        """
+        Takes the log losses sorted in decreasing order (1-D, or 2-D with 1 sample per row)
+        Returns ksi(k) for k = 2 ... max_k-1, from one cumulative sum instead of a loop over k
+        """
+        k = np.arange(2, max_k)
+        cumsum = np.cumsum(log_losses[..., :max_k - 1], axis=-1)
+        # ksi(k) = mean(log x_1..x_k) - log x_k
+        return cumsum[..., k - 1] / k - log_losses[..., k - 1]
+
+    @timed()
     def get_hill_estimator(self):
         """
         Returns the estimated ksi using the Hill estimator
@@ -58,29 +404,100 @@ class Asset:
         losses = -self.returns[self.returns < 0].dropna()
         if len(losses) < 10:
             return pd.Series(dtype='float64')
-        sorted_losses = np.sort(losses.values)[::-1]
+        log_losses = np.log(np.sort(losses.values)[::-1])
 
         # Then, for the k(n), we'll try different values, from 2 to 20% of the total count
-        hill_values = []
-        max_k = int(len(sorted_losses) * 0.2)
+        max_k = int(len(log_losses) * 0.2)
         k_values = range(2, max_k)
+        if len(k_values) == 0:
+            return pd.Series(dtype='float64')
 
-        for k in k_values:
-            selection = sorted_losses[:k]
-            threshold = sorted_losses[k-1]
-            
-            log_diff = np.log(selection) - np.log(threshold)
-            ksi = np.mean(log_diff) # The sum and division by k is here
-            hill_values.append(ksi)
+        return pd.Series(data=self._hill_curve(log_losses, max_k), index=k_values)
 
-        return pd.Series(data=hill_values, index=k_values)
+    @timed()
+    def get_hill_bootstrap(self, n_boot:int=200, confidence_level:float=0.95, seed:int=None, chunk_size:int=50):
+        """
+        Takes the number of resamples and the confidence level of the bands
+        Returns a DataFrame indexed by k with the Hill estimator ('Ksi') and its bootstrap bands ('Lower', 'Upper')
+        """
+        hill = self.get_hill_estimator()
+        if hill.empty:
+            return pd.DataFrame(columns=['Ksi', 'Lower', 'Upper'], dtype='float64')
+
+        losses = -self.returns[self.returns < 0].dropna().values
+        log_losses = np.log(losses)
+        n = len(log_losses)
+        max_k = int(n * 0.2)
+
+        # Resamples are done by chunks of rows, so memory stays (chunk_size x n)
+        rng = np.random.default_rng(seed)
+        curves = []
+        for start in range(0, n_boot, chunk_size):
+            b = min(chunk_size, n_boot - start)
+            samples = log_losses[rng.integers(0, n, size=(b, n))]
+            # Only the max_k biggest losses matter : partition, then sort these ones only
+            top = -np.partition(-samples, max_k - 1, axis=1)[:, :max_k]
+            top = -np.sort(-top, axis=1)
+            curves.append(self._hill_curve(top, max_k))
+        curves = np.vstack(curves)
+
+        alpha = 1 - confidence_level
+        lower, upper = np.quantile(curves, [alpha / 2, 1 - alpha / 2], axis=0)
+        return pd.DataFrame({'Ksi': hill.values, 'Lower': lower, 'Upper': upper}, index=hill.index)
+
+    def select_hill_k(self, hill:pd.Series=None, window:int=None):
+        """
+        Takes a Hill series (default : get_hill_estimator()) and the size of the stability window
+        Returns the k where the Hill plot is the most stable (lowest rolling std), a usual heuristic to pick k
+        """
+        if hill is None:
+            hill = self.get_hill_estimator()
+        if len(hill) < 3:
+            return None
+        if window is None:
+            window = max(5, len(hill) // 10)
+        window = min(window, len(hill))
+
+        # The first k are too noisy to be trusted, we start after one window
+        stability = hill.rolling(window, center=True).std().iloc[window:]
+        if stability.dropna().empty:
+            return int(hill.index[len(hill) // 2])
+        return int(stability.idxmin())
+
+    # GARCH
+    @timed()
+    @_locked
+    def garch(self, model:str='garch'):
+        """
+        Returns the GARCH(1,1) ('garch') or GJR-GARCH(1,1) ('gjr') fitted on the log returns.
+        Kept until new bars arrive, then the next fit starts from these parameters.
+        """
+        previous = self._garch.get(model)
+        if previous is not None and len(previous.returns) == len(self.log_returns):
+            return previous
+        fitted = GARCH(self.log_returns, model, periods_per_year=self.periods_per_year).fit(
+            x0=previous.params if previous is not None else None)
+        self._garch[model] = fitted
+        return fitted
+
+    # Monte Carlo risk
+    @timed()
+    def monte_carlo_risk(self, model:str='normal', n_scenarios:int=100_000, horizons:tuple=(1, 10),
+                         confidence_level:float=0.95, seed:int=None, n_jobs:int=1, **model_params):
+        """
+        Returns the simulated VaR and ES of the asset for each horizon (see classes/montecarlo.py)
+        """
+        return monte_carlo_risk(self.returns, model=model, n_scenarios=n_scenarios, horizons=horizons,
+                                confidence_level=confidence_level, seed=seed, n_jobs=n_jobs, **model_params)
 
     # Graphics
-    def candle_graph(self):
+    @timed()
+    def candle_graph(self, max_points:int=MAX_POINTS):
         """
         Returns a candle graph of the prices
+        (bars are merged into weekly, monthly... bars when there are more than max_points of them)
         """
-        data = self.history[['Open','High','Low','Close']]
+        data, bars_label = resample_ohlc(self.history[['Open','High','Low','Close']], max_points)
 
         fig = go.Figure()
         fig.add_trace(
@@ -97,6 +514,8 @@ class Asset:
         title_text = f"{self.ticker_symbol}"
         if self.start_date and self.end_date:
             title_text += f" ({self.start_date} - {self.end_date})"
+        if bars_label:
+            title_text += f" - {bars_label} bars"
 
         fig.update_layout(
             title=title_text,
@@ -106,17 +525,18 @@ class Asset:
         )
         return fig
 
-    def price_graph(self):
+    @timed()
+    def price_graph(self, max_points:int=MAX_POINTS):
         """
-        Returns a line graph of the prices
+        Returns a line graph of the prices (at most max_points points)
         """
-        data = self.prices
+        data = downsample_series(self.prices['Price'], max_points)
 
         fig = go.Figure()
         fig.add_trace(
             go.Scatter(
                 x=data.index,
-                y=data['Price'],
+                y=data.values,
                 mode='lines',
                 name=self.ticker_symbol
             )
@@ -136,28 +556,36 @@ class Asset:
 
     # Could merge add_rolling_mean and add_rolling_std into one method with an argument but for now it's ok
 
-    def add_rolling_mean(self, fig, w:int=20):
+    def add_rolling_mean(self, fig, w=20, max_points:int=MAX_POINTS, means:pd.DataFrame=None):
         """
-        Adds rolling mean to an existing figure
+        Adds rolling mean to an existing figure (w can be a list of windows : one line each, computed in one pass)
+        means : rolling_means(w) if already computed (the app passes its cached one)
         """
-        rolling_mean = self.rolling_mean(window=w)
-        
-        fig.add_trace(go.Scatter(
-            x=rolling_mean.index,
-            y=rolling_mean['Mean'],
-            mode='lines',
-            name=f'{w}-Day Rolling Mean'))
+        windows = [w] if np.isscalar(w) else list(w)
+        if means is None:
+            means = self.rolling_means(windows)
+        for window in means.columns:
+            rolling_mean = downsample_series(means[window], max_points)
+
+            fig.add_trace(go.Scatter(
+                x=rolling_mean.index,
+                y=rolling_mean.values,
+                mode='lines',
+                name=f'{window}-Day Rolling Mean'))
         return fig
 
-    def add_rolling_std(self, fig, w:int=20):
+    def add_rolling_std(self, fig, w:int=20, max_points:int=MAX_POINTS, std:pd.DataFrame=None):
         """
         Adds rolling standard deviation to an existing figure
+        std : rolling_std(w) if already computed (the app passes its cached one)
         """
-        rolling_std = self.rolling_std(window=w)
+        if std is None:
+            std = self.rolling_std(window=w)
+        rolling_std = downsample_series(std['Std'], max_points)
 
         fig.add_trace(go.Scatter(
             x=rolling_std.index,
-            y=rolling_std['Std'],
+            y=rolling_std.values,
             mode='lines',
             name=f'{w}-Day Rolling Std',
             yaxis='y2'))
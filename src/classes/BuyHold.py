@@ -1,4 +1,7 @@
 from classes.Asset import Asset
+from classes.Strategy import Strategy
+from classes.instrumentation import timed
+from classes.downsample import MAX_POINTS, downsample_series
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
@@ -10,6 +13,7 @@ But how to keep it up to date ? -> We'll have to make an update method in every
 
 Also, maybe we want every strategy to inherit from a base Strategy class (BuyHold actually) bc the metrics formula are always the same, we'll just have to change the returns and the prices and the start/end date will become lists.
 Every strategy is basically a BuyHold, but with a vector of start and end positions.
+-> Done : the strategies only give their positions, kernel.py turns them into equity, turnover, trades and costs (BuyHold = always 1).
 
 Btw, I'm constructing the strategy around 1 Asset (given the instructions), 
 So I assume, in the Backtesting part, we choose a list of tickers,
@@ -24,39 +28,47 @@ Let's say there's Asset-based strategies (buyhold, momentum...) and Portfolio-ba
 in order to advise the Portfolio-based strategies.
 """
 
-class BuyHold:
+class BuyHold(Strategy):
     # Constructor
-    def __init__(self, asset:Asset, start:str, end:str, cap:float=1000):
-        self.asset = asset
-        self.start_date = start
-        self.end_date = end
-        self.capital = cap
+    def __init__(self, asset:Asset, start:str, end:str, cap:float=1000, fee=None, slippage=None):
+        super().__init__(asset, start, end, cap, fee, slippage)
 
         self.returns = self.asset.returns.loc[self.start_date:self.end_date]
         self.log_returns = self.asset.log_returns.loc[self.start_date:self.end_date]
         self.prices = self.asset.prices.loc[self.start_date:self.end_date]
 
-    '''
+    # Positions : always invested
+    def compute_positions(self, dates, prices):
+        return np.ones(len(dates))
+
+    def next_positions(self, new_prices):
+        return np.ones(len(new_prices))
+
     # Update Method
     def update(self):
-        self.end_date=
-    '''
-    # Methods
-    def get_equity_curve(self):
         """
-        Returns the equity curve
+        Follows the new bars of the asset (call asset.update() first).
+        Extends prices, returns and the equity curve with the new dates only, and moves the end date.
+        Returns the number of bars added
         """
-        return self.prices['Price'] * self.capital / self.prices['Price'].iloc[0]
+        last_date = self.prices.index[-1]
+        n_new = super().update()
+        if n_new:
+            self.prices = pd.concat([self.prices, self.asset.prices.loc[self.asset.prices.index > last_date]])
+            self.returns = pd.concat([self.returns, self.asset.returns.loc[self.asset.returns.index > last_date]])
+            self.log_returns = pd.concat([self.log_returns, self.asset.log_returns.loc[self.asset.log_returns.index > last_date]])
+        return n_new
 
     # Graph
-    def capital_graph(self):
+    @timed()
+    def capital_graph(self, max_points:int=MAX_POINTS):
         """
-        Creates a graph that displays the capital over time, following the strategy
+        Creates a graph that displays the capital over time, following the strategy (at most max_points points)
         """
 
-        values = self.prices['Price'] * self.capital/self.prices['Price'].iloc[0]
-        start_val = values[0]
-        end_val = values[-1]
+        values = downsample_series(self.get_equity_curve(), max_points)
+        start_val = values.iloc[0]
+        end_val = values.iloc[-1]
         color = "#00C805" if end_val >= start_val else "#FF3B30"
 
         fig = go.Figure()
@@ -79,108 +91,3 @@ class BuyHold:
             hovermode="x unified"
         )
         return fig
-
-    # Metrics
-
-    def pnl(self):
-        """
-        Returns the PnL (value and pct)
-        """
-        equity = self.get_equity_curve()
-        start_val = equity.iloc[0]
-        end_val = equity.iloc[-1]
-
-        pnl_val = end_val - start_val
-        pnl_pct = (end_val - start_val) / start_val
-        return pnl_val, pnl_pct
-
-    def drawdown(self):
-        """
-        Returns the drawdown series and the max drawdown (tuple)
-        """
-        equity = self.get_equity_curve()
-        cummax = equity.cummax()
-        drawdown = (equity - cummax) / cummax
-        max_drawdown = drawdown.min()
-        return drawdown, max_drawdown
-
-    # Note : For the annualized volatility we always assume that vola at t and at t-1 are independent, however it's not true.
-    # Implementing GARCH model could be a good idea for better estimates.
-    # https://www.investopedia.com/terms/g/garch.asp
-    # https://cdn.prod.website-files.com/688125a82bfc6e536cc30914/689432dd1a3c31ee70d9398c_GARCH.pdf 
-
-    def annualized_volatility(self):
-        """
-        Returns the annualized volatility
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        return returns.std() * (252 ** 0.5)
-    
-    def downside_volatility(self):
-        """
-        Returns the annualized downside volatility
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        
-        negative_returns = returns[returns < 0]
-        downside_vol = negative_returns.std() * (252 ** 0.5)
-        return downside_vol
-
-    def sharpe(self, risk_free_rate:float=0.02):
-        """
-        Takes the risk free rate as parameter (default 2% ?)
-        Returns the Sharpe ratio
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-
-        excess_return = returns.mean()*252 - (risk_free_rate)
-        vol = self.annualized_volatility()
-
-        if vol == 0: return 0.0
-        return excess_return / vol
-    
-    def sortino(self, risk_free_rate:float=0.02):
-        """
-        Takes the risk free rate as parameter (default 2% ?)
-        Returns the Sortino ratio
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        
-        excess_return = returns.mean()*252 - (risk_free_rate)
-        down_vol = self.downside_volatility()
-        
-        if down_vol == 0: return 0.0
-        return excess_return / down_vol
-    
-    def historical_VaR(self, confidence_level:float=0.95):
-        """
-        Takes the confidence level as parameter (default 95%)
-        Returns the Value at Risk (for all the period between end and start date)
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        
-        if returns.empty: return 0.0
-
-        VaR = np.percentile(returns, (1 - confidence_level) * 100)
-        # T = len(self.returns) will actually use daily VaR so no vaR*(T**0.5)
-        return VaR
-
-    def historical_ES(self, confidence_level:float=0.95):
-        """
-        Takes the confidence level as parameter (default 95%)
-        Returns the Expected Shortfall (for all the period between end and start date)
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        
-        if returns.empty: return 0.0
-
-        VaR_threshold = np.percentile(returns, (1 - confidence_level) * 100)
-        ES = returns[returns <= VaR_threshold].mean()
-        # T = len(self.returns) same
-        return ES
\ No newline at end of file
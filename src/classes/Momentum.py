@@ -1,53 +1,151 @@
 import numpy as np
 import pandas as pd
 from classes.Asset import Asset
+from classes.Strategy import Strategy
+from classes.downsample import MAX_POINTS, downsample_series
+from classes.metrics import compute_metrics
+from classes.kernel import run_kernel
+from classes.instrumentation import timed
+from classes import rolling
 import plotly.graph_objects as go
 
-class Momentum:
+def momentum_signals(p:np.ndarray, t:np.ndarray, windows:np.ndarray) -> np.ndarray:
+    """
+    Takes prices p, the indices t of the dates to compute (consecutive) and the windows
+    Returns the (windows x dates) signals : 1 when the price is above its rolling mean.
+    The rolling means of every window come from one pass of the rolling engine, on the dates and their warm-up only.
+    """
+    if len(t) == 0:
+        return np.zeros((len(windows), 0))
+    means = rolling.rolling_mean(p, windows, int(t[0]), int(t[-1]) + 1)
+    return np.where(p[t][None, :] > means, 1.0, 0.0)
+
+
+class Momentum(Strategy):
     """
     This class is a Trade-based strategy, which will use rolling mean to determine best dates to buy and sell an Asset.
     """
     # Constructor
-    def __init__(self, asset:Asset, start:str, end:str, cap:float=1000):
-        self.asset = asset
-        self.start_date = start
-        self.end_date = end
-        self.capital = cap
-        self.positions = None
+    def __init__(self, asset:Asset, start:str, end:str, cap:float=1000, fee=None, slippage=None):
+        super().__init__(asset, start, end, cap, fee, slippage)
+        self.window = None
 
     # Method (Finding best trades)
     def define_positions(self,w:int=10):
-
-        prices = self.asset.prices.loc[self.start_date:self.end_date]
-        rolling_mean = self.asset.rolling_mean(w,start_date=self.start_date, end_date=self.end_date) 
-        signal = np.where(prices['Price']>rolling_mean['Mean'], 1.0, 0.0)
-
-        self.positions = pd.Series(data=signal, index=prices.index).shift(1) # shift so if we decide to buy at time t, at time t+1, we're (1) 
-        self.positions.fillna(0.0, inplace=True) # we have it bc we bought it just before the close 
-
-    def get_equity_curve(self):
-        if self.positions is None:
-            self.define_positions()
-        
-        prices = self.asset.prices.loc[self.start_date:self.end_date]['Price']
-        asset_returns = prices.pct_change()
-        strategy_returns = self.positions * asset_returns
-        
-        return self.capital * (1 + strategy_returns.fillna(0)).cumprod()
-
-    def capital_graph(self):
+        with self._lock:
+            self.window = w
+            self.positions = None
+            self._result = None
+            self._equity = None
+            return self.get_positions()
+
+    def compute_positions(self, dates, prices):
+        if self.window is None:
+            self.window = 10
+        rolling_mean = self.asset.rolling_mean(self.window, start_date=dates[0], end_date=dates[-1])
+        signal = np.where(prices > rolling_mean['Mean'].to_numpy(), 1.0, 0.0)
+
+        self._last_signal = signal[-1] if len(signal) else 0.0 # needed by update() to shift the next position
+        # shift so if we decide to buy at time t, at time t+1, we're (1)
+        # we have it bc we bought it just before the close
+        return np.concatenate([[0.0], signal[:-1]])
+
+    def next_positions(self, new_prices):
+        # The rolling mean of the asset is extended by Asset.update, we just read the new values
+        new_mean = self.asset.rolling_mean(self.window, start_date=new_prices.index[0])['Mean']
+        new_signal = np.where(new_prices > new_mean, 1.0, 0.0)
+
+        # Same shift as compute_positions : the position at t is the signal of t-1
+        positions = np.concatenate([[self._last_signal], new_signal[:-1]])
+        self._last_signal = new_signal[-1]
+        return positions
+
+    def _params(self) -> tuple:
+        return (self.window,)
+
+    # Parameter sweep
+    @timed()
+    def sweep(self, windows=range(1, 201), risk_free_rate:float=0.02, confidence_level:float=0.95, fee=None, slippage=None):
         """
-        Creates a graph that displays the capital over time, following the strategy
+        Takes the list of windows to try (default 1 to 200 days), fee and slippage default to the ones of the strategy
+        Returns a table of metrics (1 row per window) and a heatmap of the Sharpe ratio by window and year.
+        Every window is computed at once in a (windows x dates) matrix, the rolling means come from one pass of the rolling engine.
         """
+        windows = np.asarray(list(windows), dtype=int)
+        full = self.asset.prices['Price']
+        in_range = full.loc[self.start_date:self.end_date]
+        if in_range.empty or len(windows) == 0:
+            return pd.DataFrame(), go.Figure()
+
+        # We keep (max window - 1) prices before the start, so the first means are the same as on the full history
+        i0 = full.index.get_loc(in_range.index[0])
+        i1 = i0 + len(in_range)
+        lo = max(0, i0 - windows.max() + 1)
+        p = full.values[lo:i1].astype('float64')
+        t = np.arange(i0 - lo, i1 - lo)
+
+        signal = momentum_signals(p, t, windows)
+        positions = np.zeros_like(signal)
+        positions[:, 1:] = signal[:, :-1] # same shift as define_positions
+
+        asset_returns = np.zeros(len(t))
+        asset_returns[1:] = p[t[1:]] / p[t[:-1]] - 1
+        # Every window goes through the kernel at once (with the costs of the strategy)
+        res = run_kernel(asset_returns, positions, self.capital, fee or self.fee, slippage or self.slippage)
+        equity = res.equity
+        strategy_returns = equity / np.concatenate([np.full((len(windows), 1), self.capital), equity[:, :-1]], axis=1) - 1
+
+        periods_per_year = self.asset.periods_per_year
+        m = compute_metrics(equity, risk_free_rate, confidence_level, periods_per_year)
+        results = pd.DataFrame({
+            "PnL": m.pnl,
+            "PnL (%)": m.pnl_pct,
+            "Annualized Volatility": m.annualized_volatility,
+            "Sharpe Ratio": m.sharpe,
+            "Sortino Ratio": m.sortino,
+            "Max Drawdown": m.max_drawdown,
+            "VaR": m.VaR,
+            "Exp. Shortfall": m.ES,
+            "Trades": res.trades
+        }, index=pd.Index(windows, name="Window"))
+
+        # Sharpe by year, still vectorized on the windows
+        years = in_range.index.year
+        sharpe_by_year = []
+        for y in np.unique(years):
+            r = strategy_returns[:, years == y]
+            if r.shape[1] < 2:
+                sharpe_by_year.append(np.full(len(windows), np.nan))
+                continue
+            vol = r.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sharpe_by_year.append(np.where(vol == 0, 0.0, (r.mean(axis=1) * periods_per_year - risk_free_rate) / vol))
+
+        fig = go.Figure(go.Heatmap(
+            z=np.array(sharpe_by_year),
+            x=windows,
+            y=np.unique(years),
+            colorscale="RdYlGn",
+            zmid=0,
+            colorbar=dict(title="Sharpe")
+        ))
+        fig.update_layout(
+            title=f"Momentum Sharpe Ratio by Window ({self.asset.ticker_symbol})",
+            xaxis_title="Rolling Mean Window (Days)",
+            yaxis_title="Year",
+            template="plotly_dark"
+        )
+        return results, fig
 
-        self.define_positions()
-        prices = self.asset.prices.loc[self.start_date:self.end_date]['Price']
-        asset_returns = prices.pct_change()
-        strategy_returns = self.positions * asset_returns
-        values = self.capital * (1 + strategy_returns.fillna(0)).cumprod()
+    @timed()
+    def capital_graph(self, max_points:int=MAX_POINTS):
+        """
+        Creates a graph that displays the capital over time, following the strategy (at most max_points points)
+        """
 
-        start_val = values[0]
-        end_val = values[-1]
+        values = downsample_series(self.get_equity_curve(), max_points)
+        start_val = values.iloc[0]
+        end_val = values.iloc[-1]
         color = "#00C805" if end_val >= start_val else "#FF3B30"
 
         fig = go.Figure()
@@ -70,88 +168,3 @@ class Momentum:
             hovermode="x unified"
         )
         return fig
-
-    # Metrics
-    # Actually for most metrics we do practically the same as BuyHold, but adapt with equity curve. Inheritance could probably make this easier
-    # But not enough time now too much skiing
-    def pnl(self):
-        """
-        Returns the PnL (value and pct)
-        """
-        equity = self.get_equity_curve()
-        start_val = equity.iloc[0]
-        end_val = equity.iloc[-1]
-
-        pnl_val = end_val - start_val
-        pnl_pct = (end_val - start_val) / start_val
-        return pnl_val, pnl_pct
-    
-    def drawdown(self):
-        equity = self.get_equity_curve()
-        cummax = equity.cummax()
-        drawdown = (equity - cummax) / cummax
-        max_drawdown = drawdown.min()
-        return drawdown, max_drawdown
-    
-    def annualized_volatility(self):
-        """
-        Returns the annualized volatility of the strategy
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        return returns.std() * (252 ** 0.5)
-
-    def sharpe(self, risk_free_rate:float=0.02):
-        """
-        Returns the Sharpe ratio
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        excess_return = returns.mean() * 252 - risk_free_rate
-        vol = self.annualized_volatility()
-
-        if vol == 0:
-            return 0.0
-        return excess_return / vol
-
-    def sortino(self, risk_free_rate:float=0.02):
-        """
-        Returns the Sortino ratio (Penalizes only downside volatility)
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        negative_returns = returns[returns < 0]
-        downside_vol = negative_returns.std() * (252 ** 0.5)
-        excess_return = returns.mean() * 252 - risk_free_rate
-
-        if downside_vol == 0:
-            return 0.0
-        return excess_return / downside_vol
-
-    def historical_VaR(self, confidence_level:float=0.95):
-        """
-        Returns the Daily Value at Risk (95%)
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-
-        if returns.empty:
-            return 0.0
-        
-        sorted_returns = returns.sort_values()
-        VaR = np.percentile(sorted_returns, (1 - confidence_level) * 100)
-        return VaR
-
-    def historical_ES(self, confidence_level:float=0.95):
-        """
-        Returns the Daily Expected Shortfall (95%)
-        """
-        equity = self.get_equity_curve()
-        returns = equity.pct_change().dropna()
-        
-        if returns.empty:
-            return 0.0
-
-        VaR_threshold = np.percentile(returns, (1 - confidence_level) * 100)
-        ES = returns[returns <= VaR_threshold].mean()
-        return ES
\ No newline at end of file
@@ -0,0 +1,206 @@
+import threading
+import numpy as np
+import pandas as pd
+from classes.Asset import Asset
+from classes.metrics import StrategyMetrics, compute_metrics
+from classes.kernel import FeeModel, SlippageModel, KernelResult, run_kernel
+from classes.instrumentation import timed
+
+class Strategy:
+    """
+    Base class of the Asset-based strategies (BuyHold, Momentum...).
+    A strategy only has to give its positions, the shared kernel (kernel.py) turns them into equity, turnover,
+    trades and costs, and all the metrics are computed here in one pass and memoized.
+    The app shares strategy objects between sessions (ui/cache.py), so the memoized state is filled under a lock.
+    """
+    # Constructor
+    def __init__(self, asset:Asset, start:str, end:str, cap:float=1000,
+                 fee:FeeModel=None, slippage:SlippageModel=None):
+        self.asset = asset
+        self.start_date = start
+        self.end_date = end
+        self.capital = cap
+        self.fee = fee
+        self.slippage = slippage
+        self.positions = None # pd.Series, exposure held over each return
+        self._result = None # KernelResult, kept so update() only has to extend it
+        self._equity = None
+        self._metrics_cache = {}
+        self._lock = threading.RLock()
+
+    def compute_positions(self, dates:pd.DatetimeIndex, prices:np.ndarray) -> np.ndarray:
+        """
+        Takes the dates and prices of the backtest
+        Returns the positions (1 = invested, 0 = cash), positions[t] is held from the close of t-1 to the close of t
+        """
+        raise NotImplementedError
+
+    def next_positions(self, new_prices:pd.Series) -> np.ndarray:
+        """
+        Takes the prices after the end of the backtest
+        Returns the positions of these new dates (used by update(), default : recompute and keep the tail)
+        """
+        prices = self.asset.prices['Price'].loc[self.start_date:new_prices.index[-1]]
+        return self.compute_positions(prices.index, prices.to_numpy(dtype='float64'))[-len(new_prices):]
+
+    def get_positions(self) -> pd.Series:
+        with self._lock:
+            if self.positions is None:
+                dates, prices, _ = self.asset.price_slice(self.start_date, self.end_date)
+                self.positions = pd.Series(self.compute_positions(dates, prices), index=dates)
+            return self.positions
+
+    def _params(self) -> tuple:
+        """
+        Parameters that change the equity curve (ex : the window of Momentum), used in the memoization key
+        """
+        return ()
+
+    # Backtest
+
+    @timed()
+    def backtest(self) -> KernelResult:
+        """
+        Returns the kernel result (equity, turnover, trades, costs) of the strategy
+        """
+        with self._lock:
+            if self._result is None:
+                positions = self.get_positions()
+                _, _, returns = self.asset.price_slice(self.start_date, self.end_date)
+                self._result = run_kernel(returns, positions.values, self.capital, self.fee, self.slippage)
+                self._equity = None
+            return self._result
+
+    def get_equity_curve(self) -> pd.Series:
+        with self._lock:
+            if self._equity is None:
+                self._equity = pd.Series(self.backtest().equity, index=self.get_positions().index)
+            return self._equity
+
+    # Update Method
+    @timed()
+    def update(self):
+        """
+        Follows the new bars of the asset (call asset.update() first).
+        Extends the positions and the backtest with the new dates only, and moves the end date.
+        Returns the number of bars added
+        """
+        with self._lock:
+            positions = self.get_positions()
+            last_date = positions.index[-1]
+            all_prices = self.asset.prices['Price']
+            new_prices = all_prices.loc[all_prices.index > last_date]
+            if new_prices.empty:
+                return 0
+
+            new_positions = self.next_positions(new_prices)
+            self.positions = pd.concat([positions, pd.Series(new_positions, index=new_prices.index)])
+
+            if self._result is not None:
+                # The kernel goes on from the last equity and the last position
+                linked = all_prices.loc[all_prices.index >= last_date].iloc[:len(new_prices) + 1].to_numpy(dtype='float64')
+                new = run_kernel(linked[1:] / linked[:-1] - 1, new_positions, self._result.equity[-1],
+                                 self.fee, self.slippage, initial_position=positions.iloc[-1])
+                self._result = KernelResult(
+                    equity=np.concatenate([self._result.equity, new.equity]),
+                    turnover=np.concatenate([self._result.turnover, new.turnover]),
+                    trades=self._result.trades + new.trades,
+                    costs=np.concatenate([self._result.costs, new.costs])
+                )
+                self._equity = None
+
+            self.end_date = new_prices.index[-1]
+            return len(new_prices)
+
+    # Metrics
+
+    @timed()
+    def metrics(self, risk_free_rate:float=0.02, confidence_level:float=0.95) -> StrategyMetrics:
+        """
+        Takes the risk free rate and the confidence level as parameters
+        Returns every metric of the strategy (computed once per params, dates, confidence level and risk free rate)
+        """
+        with self._lock:
+            equity = self.get_equity_curve()
+            # The last date is in the key, so an update() gives new metrics
+            key = (self._params(), self.fee, self.slippage, str(self.start_date), str(self.end_date), len(equity),
+                   equity.index[-1] if len(equity) else None, confidence_level, risk_free_rate)
+
+            if key not in self._metrics_cache:
+                self._metrics_cache[key] = compute_metrics(equity.values, risk_free_rate, confidence_level,
+                                                           self.asset.periods_per_year)
+            return self._metrics_cache[key]
+
+    def pnl(self):
+        """
+        Returns the PnL (value and pct)
+        """
+        m = self.metrics()
+        return m.pnl, m.pnl_pct
+
+    def drawdown(self):
+        """
+        Returns the drawdown series and the max drawdown (tuple)
+        """
+        m = self.metrics()
+        return pd.Series(m.drawdown, index=self.get_equity_curve().index), m.max_drawdown
+
+    # Note : For the annualized volatility we always assume that vola at t and at t-1 are independent, however it's not true.
+    # The GARCH models of classes/garch.py (Asset.garch()) give the conditional volatility and its forecasts.
+    # https://www.investopedia.com/terms/g/garch.asp
+    # https://cdn.prod.website-files.com/688125a82bfc6e536cc30914/689432dd1a3c31ee70d9398c_GARCH.pdf
+
+    def annualized_volatility(self):
+        """
+        Returns the annualized volatility
+        """
+        return self.metrics().annualized_volatility
+
+    def downside_volatility(self):
+        """
+        Returns the annualized downside volatility
+        """
+        return self.metrics().downside_volatility
+
+    def sharpe(self, risk_free_rate:float=0.02):
+        """
+        Takes the risk free rate as parameter (default 2% ?)
+        Returns the Sharpe ratio
+        """
+        return self.metrics(risk_free_rate=risk_free_rate).sharpe
+
+    def sortino(self, risk_free_rate:float=0.02):
+        """
+        Takes the risk free rate as parameter (default 2% ?)
+        Returns the Sortino ratio
+        """
+        return self.metrics(risk_free_rate=risk_free_rate).sortino
+
+    def historical_VaR(self, confidence_level:float=0.95):
+        """
+        Takes the confidence level as parameter (default 95%)
+        Returns the Value at Risk (for all the period between end and start date)
+        """
+        # Daily VaR, so no VaR*(T**0.5)
+        return self.metrics(confidence_level=confidence_level).VaR
+
+    def historical_ES(self, confidence_level:float=0.95):
+        """
+        Takes the confidence level as parameter (default 95%)
+        Returns the Expected Shortfall (for all the period between end and start date)
+        """
+        return self.metrics(confidence_level=confidence_level).ES
+
+
+def run_strategies(strategies:list, fee:FeeModel=None, slippage:SlippageModel=None) -> KernelResult:
+    """
+    Takes strategies on the same asset and dates
+    Returns one KernelResult with a row per strategy : their positions are stacked and go through the kernel at once
+    """
+    first = strategies[0]
+    for strat in strategies[1:]:
+        if strat.asset is not first.asset or str(strat.start_date) != str(first.start_date) or str(strat.end_date) != str(first.end_date):
+            raise ValueError("The strategies must share the same asset and dates")
+    _, _, returns = first.asset.price_slice(first.start_date, first.end_date)
+    positions = np.vstack([strat.get_positions().values for strat in strategies])
+    return run_kernel(returns, positions, first.capital, fee, slippage)
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+"""
+Server-side downsampling for the charts.
+A chart is a few thousand pixels wide, so sending more points than that to the browser only makes
+the Plotly JSON heavier. Lines go through LTTB (keeps the visual shape) or min-max (keeps the extremes),
+candlesticks are resampled to coarser bars (weekly, monthly...) until they fit in the budget.
+"""
+
+MAX_POINTS = 2000 # default budget of points per trace
+
+# From the finest to the coarsest, the first one that fits in the budget is used
+OHLC_RULES = [
+    ('5min', '5-minute'), ('15min', '15-minute'), ('1h', 'hourly'), ('4h', '4-hour'),
+    ('1D', 'daily'), ('W', 'weekly'), ('ME', 'monthly'), ('QE', 'quarterly'), ('YE', 'yearly')
+]
+FIXED_RULES = {'5min', '15min', '1h', '4h', '1D'} # the others (weeks, months...) have no fixed duration
+
+
+def lttb(x:np.ndarray, y:np.ndarray, n_out:int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets
+    Returns the indices of the n_out points to keep (first and last always kept)
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    # Bucket edges for the n-2 middle points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Average point of each bucket, computed at once
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    avg_x = np.append(avg_x[1:], x[-1]) # the "next bucket" of the last bucket is the last point
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    # Each choice depends on the previous one, so this loop stays (one numpy op per bucket)
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y:np.ndarray, n_out:int) -> np.ndarray:
+    """
+    Keeps the min and the max of each bucket (n_out // 2 buckets), fully vectorized
+    Returns the sorted indices of the points to keep
+    """
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype='float64')
+    n_buckets = n_out // 2
+    size = n // n_buckets
+    # The points that don't fill the last bucket are kept as they are
+    body = y[:n_buckets * size].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    idx = np.concatenate([offsets + body.argmin(axis=1), offsets + body.argmax(axis=1), np.arange(n_buckets * size, n)])
+    return np.unique(np.concatenate([[0, n - 1], idx]))
+
+
+def downsample_series(series:pd.Series, max_points:int=MAX_POINTS, method:str='lttb') -> pd.Series:
+    """
+    Takes a Series indexed by date and a budget of points
+    Returns the Series with at most max_points points
+    """
+    series = series.dropna()
+    if max_points is None or len(series) <= max_points:
+        return series
+
+    if method == 'minmax':
+        keep = minmax(series.values, max_points)
+    else:
+        x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+        keep = lttb(x, series.values, max_points)
+    return series.iloc[keep]
+
+
+def resample_ohlc(data:pd.DataFrame, max_bars:int=MAX_POINTS):
+    """
+    Takes OHLC(V) bars and a budget of bars
+    Returns (bars, label) : the finest bars that fit in the budget, and their name ('weekly'...), label is None if unchanged
+    """
+    if max_bars is None or len(data) <= max_bars:
+        return data, None
+
+    agg = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
+    if 'Volume' in data.columns:
+        agg['Volume'] = 'sum'
+
+    # Only the rules coarser than the current bars are worth trying
+    step = pd.Timedelta(int(np.median(np.diff(data.index.asi8[:1000]))))
+    for rule, label in OHLC_RULES:
+        if rule in FIXED_RULES and pd.Timedelta(rule) <= step:
+            continue
+        bars = data[list(agg)].resample(rule).agg(agg).dropna(subset=['Close'])
+        if len(bars) <= max_bars:
+            break
+    return bars, label
+
+
+def aggregate_ohlcv(bars:pd.DataFrame, rule:str) -> pd.DataFrame:
+    """
+    Takes sorted OHLCV bars and a coarser fixed rule ('15min', '1h', '1D'...)
+    Returns the merged bars (first open, max high, min low, last close, summed volume), from NumPy reductions
+    on the contiguous groups instead of a pandas groupby. Empty periods (nights, week-ends) give no bar.
+    Days are cut at local midnight, intraday periods on the clock (a 1h bar of 9:30 is the 9:00 bar).
+    """
+    if bars.empty:
+        return bars.copy()
+    index = bars.index
+    step = pd.Timedelta(rule).value
+    if step >= pd.Timedelta('1D').value:
+        # Local wall clock, so a daily bar is a trading day and not a UTC day
+        local = (index.tz_localize(None) if index.tz is not None else index).asi8
+        labels = local - local % step
+        label_index = pd.DatetimeIndex(labels)
+        if index.tz is not None:
+            label_index = label_index.tz_localize(index.tz, ambiguous='NaT', nonexistent='shift_forward')
+    else:
+        labels = index.asi8 - index.asi8 % step
+        label_index = pd.DatetimeIndex(labels, tz='UTC').tz_convert(index.tz) if index.tz is not None else pd.DatetimeIndex(labels)
+
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1])
+    ends = np.append(starts[1:], len(labels)) - 1
+    out = {}
+    for col in bars.columns:
+        values = bars[col].to_numpy()
+        if col == 'Open':
+            out[col] = values[starts]
+        elif col == 'High' or col == 'Stock Splits':
+            out[col] = np.maximum.reduceat(values, starts)
+        elif col == 'Low':
+            out[col] = np.minimum.reduceat(values, starts)
+        elif col in ('Volume', 'Dividends'):
+            out[col] = np.add.reduceat(values, starts)
+        else: # Close and any other price column
+            out[col] = values[ends]
+    return pd.DataFrame(out, index=label_index[starts])
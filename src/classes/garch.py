@@ -0,0 +1,285 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+GARCH(1,1) and GJR-GARCH(1,1) volatility models, NumPy only.
+
+    sigma2[t] = omega + (alpha + gamma * 1{eps[t-1] < 0}) * eps[t-1]^2 + beta * sigma2[t-1]
+
+(gamma = 0 for the plain GARCH). omega comes from variance targeting : omega = var * (1 - persistence),
+so only alpha, (gamma), beta are estimated, by Nelder-Mead on the Gaussian likelihood.
+
+The recursion is linear in sigma2 : sigma2[t] = c[t] + beta * sigma2[t-1]. It is computed by blocks of B days,
+inside a block it's a matrix product with the matrix of the powers of beta, and only the last value of each
+block is carried to the next one (T / B scalar steps instead of T). The buffers are allocated once per fit
+and reused by every evaluation of the likelihood.
+"""
+
+BLOCK = 64
+
+
+# -------------------------------------------------------
+# VARIANCE RECURSION
+# -------------------------------------------------------
+
+class _Workspace:
+    """Buffers reused by every evaluation of the likelihood on the same data (nothing is allocated per evaluation)"""
+
+    def __init__(self, eps:np.ndarray, block:int = BLOCK):
+        self.eps = eps
+        self.eps2 = eps ** 2
+        self.n = len(eps)
+        self.block = block
+        self.n_blocks = -(-(self.n - 1) // block) if self.n > 1 else 0
+        # Lagged squared residuals, and the ones of the negative residuals (the leverage term)
+        self.eps2_lag = self.eps2[:-1].copy()
+        self.eps2_neg_lag = np.where(eps[:-1] < 0, self.eps2_lag, 0.0)
+        self.lags = np.subtract.outer(np.arange(block), np.arange(block)).astype(np.float64) # i - j (float : no cast buffer)
+        self.lower = self.lags >= 0
+        self.exponents = np.arange(1, block + 1, dtype=np.float64)
+        self.M = np.zeros((block, block)) # only the lower triangle is ever written, the rest stays 0
+        self.C = np.zeros((self.n_blocks, block))
+        self.P = np.zeros((self.n_blocks, block))
+        self.Q = np.zeros((self.n_blocks, block))
+        self.powers = np.zeros(block)
+        self.carry = np.zeros(self.n_blocks)
+        self.sigma2 = np.zeros(self.n)
+        self.tmp = np.zeros(max(self.n - 1, 1))
+        self.terms = np.zeros(self.n)
+        self.ratio = np.zeros(self.n)
+
+    def variance(self, omega:float, alpha:float, gamma:float, beta:float, sigma2_0:float) -> np.ndarray:
+        """Returns sigma2 (the buffer itself, copy it to keep it)"""
+        B, n = self.block, self.n
+        self.sigma2[0] = sigma2_0
+        if n == 1:
+            return self.sigma2
+
+        # c[t] = omega + (alpha + gamma 1{eps < 0}) eps2 for t = 1..n-1, padded with zeros to fill the last block
+        c = self.C.reshape(-1)
+        head = c[:n - 1]
+        np.multiply(self.eps2_lag, alpha, out=head)
+        np.multiply(self.eps2_neg_lag, gamma, out=self.tmp)
+        np.add(head, self.tmp, out=head)
+        np.add(head, omega, out=head)
+        c[n - 1:] = 0
+
+        # M[i, j] = beta^(i-j) under the diagonal
+        np.power(beta, self.lags, out=self.M, where=self.lower)
+        np.matmul(self.C, self.M.T, out=self.P)
+
+        # Carry the last value of each block into the next one
+        np.power(beta, self.exponents, out=self.powers)
+        prev = sigma2_0
+        for b in range(self.n_blocks):
+            self.carry[b] = prev
+            prev = self.P[b, -1] + self.powers[-1] * prev
+        np.matmul(self.carry[:, None], self.powers[None, :], out=self.Q) # outer product (np.multiply would buffer)
+        np.add(self.P, self.Q, out=self.P)
+
+        self.sigma2[1:] = self.P.reshape(-1)[:n - 1]
+        return self.sigma2
+
+    def neg_log_likelihood(self, omega, alpha, gamma, beta, sigma2_0) -> float:
+        sigma2 = self.variance(omega, alpha, gamma, beta, sigma2_0)
+        if sigma2.min() <= 0:
+            return np.inf
+        np.log(sigma2, out=self.terms)
+        np.divide(self.eps2, sigma2, out=self.ratio)
+        np.add(self.terms, self.ratio, out=self.terms)
+        return 0.5 * float(self.terms.sum())
+
+
+def variance_recursion(eps:np.ndarray, omega:float, alpha:float, gamma:float, beta:float, sigma2_0:float) -> np.ndarray:
+    """Returns the conditional variances of the residuals eps"""
+    return _Workspace(np.asarray(eps, dtype=np.float64)).variance(omega, alpha, gamma, beta, sigma2_0).copy()
+
+
+# -------------------------------------------------------
+# OPTIMIZER
+# -------------------------------------------------------
+
+def nelder_mead(f, x0:np.ndarray, step:float = 0.05, max_iter:int = 500, tol:float = 1e-8) -> tuple:
+    """
+    Minimizes f without gradient (standard coefficients)
+    Returns (x, f(x))
+    """
+    x0 = np.asarray(x0, dtype=np.float64)
+    n = len(x0)
+    simplex = np.vstack([x0, x0 + step * np.eye(n)])
+    values = np.array([f(x) for x in simplex])
+
+    for _ in range(max_iter):
+        order = np.argsort(values)
+        simplex, values = simplex[order], values[order]
+        if abs(values[-1] - values[0]) <= tol * (abs(values[0]) + tol):
+            break
+
+        centroid = simplex[:-1].mean(axis=0)
+        reflected = centroid + (centroid - simplex[-1])
+        f_r = f(reflected)
+        if f_r < values[0]:
+            expanded = centroid + 2 * (centroid - simplex[-1])
+            f_e = f(expanded)
+            simplex[-1], values[-1] = (expanded, f_e) if f_e < f_r else (reflected, f_r)
+        elif f_r < values[-2]:
+            simplex[-1], values[-1] = reflected, f_r
+        else:
+            # Contraction (outside if the reflection was better than the worst point, else inside)
+            contracted = centroid + 0.5 * ((reflected if f_r < values[-1] else simplex[-1]) - centroid)
+            f_c = f(contracted)
+            if f_c < min(f_r, values[-1]):
+                simplex[-1], values[-1] = contracted, f_c
+            else:
+                # Shrink towards the best point
+                simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+                values[1:] = [f(x) for x in simplex[1:]]
+
+    best = np.argmin(values)
+    return simplex[best], float(values[best])
+
+
+# -------------------------------------------------------
+# MODEL
+# -------------------------------------------------------
+
+class GARCH:
+    """
+    GARCH(1,1) (model='garch') or GJR-GARCH(1,1) (model='gjr') on daily log returns
+    """
+
+    def __init__(self, returns:pd.Series, model:str = 'garch', periods_per_year:int = 252):
+        if model not in ('garch', 'gjr'):
+            raise ValueError(f"Unknown model {model}")
+        self.returns = returns.dropna().astype('float64')
+        self.model = model
+        self.periods_per_year = periods_per_year
+        self.mu = float(self.returns.mean()) if len(self.returns) else 0.0
+        self.eps = self.returns.to_numpy() - self.mu
+        self.long_run_variance = float(np.var(self.eps)) if len(self.eps) else np.nan
+        self.params = None # {'omega', 'alpha', 'gamma', 'beta'}
+        self.nll = None
+        self._sigma2 = None
+
+    def _unpack(self, x) -> tuple:
+        if self.model == 'gjr':
+            alpha, gamma, beta = x
+        else:
+            (alpha, beta), gamma = x, 0.0
+        return alpha, gamma, beta
+
+    def fit(self, x0:dict | None = None, max_iter:int = 500):
+        """
+        Estimates the parameters. x0 (ex : the params of a previous fit) is the starting point
+        """
+        if len(self.eps) < 10:
+            raise ValueError("Not enough returns to fit a GARCH model")
+        ws = _Workspace(self.eps)
+        var = self.long_run_variance
+
+        def objective(x):
+            alpha, gamma, beta = self._unpack(x)
+            persistence = alpha + gamma / 2 + beta
+            if alpha < 0 or gamma < 0 or beta < 0 or persistence >= 0.9999 or alpha + gamma > 1:
+                return 1e10
+            return ws.neg_log_likelihood(var * (1 - persistence), alpha, gamma, beta, var)
+
+        start = x0 or {'alpha': 0.05, 'gamma': 0.05 if self.model == 'gjr' else 0.0, 'beta': 0.90}
+        keys = ['alpha', 'gamma', 'beta'] if self.model == 'gjr' else ['alpha', 'beta']
+        x, self.nll = nelder_mead(objective, [start[k] for k in keys], step=0.02, max_iter=max_iter)
+
+        alpha, gamma, beta = (float(v) for v in self._unpack(x))
+        self.params = {'omega': var * (1 - alpha - gamma / 2 - beta), 'alpha': alpha, 'gamma': gamma, 'beta': beta}
+        self._sigma2 = ws.variance(self.params['omega'], alpha, gamma, beta, var).copy()
+        return self
+
+    @property
+    def persistence(self) -> float:
+        p = self.params
+        return p['alpha'] + p['gamma'] / 2 + p['beta']
+
+    def conditional_volatility(self, annualized:bool = True) -> pd.Series:
+        """Returns the fitted volatility of each day"""
+        vol = np.sqrt(self._sigma2 * (self.periods_per_year if annualized else 1))
+        return pd.Series(vol, index=self.returns.index, name="GARCH Volatility")
+
+    def next_variance(self) -> float:
+        """Variance of tomorrow, known at today's close"""
+        p = self.params
+        e = self.eps[-1]
+        return p['omega'] + (p['alpha'] + p['gamma'] * (e < 0)) * e * e + p['beta'] * self._sigma2[-1]
+
+    def forecast(self, horizon:int = 10, annualized:bool = True) -> np.ndarray:
+        """
+        Returns the forecast volatility of each of the next `horizon` days
+        (mean reverts to the long run variance at the speed of the persistence)
+        """
+        steps = np.arange(horizon)
+        sigma2 = self.long_run_variance + self.persistence ** steps * (self.next_variance() - self.long_run_variance)
+        return np.sqrt(sigma2 * (self.periods_per_year if annualized else 1))
+
+    def VaR(self, confidence_level:float = 0.95, horizon:int = 1) -> tuple:
+        """
+        Filtered historical VaR and ES : quantile of the standardized residuals, scaled by the forecast volatility
+        of the next `horizon` days. Same convention as the historical metrics (negative returns)
+        """
+        z = self.eps / np.sqrt(self._sigma2)
+        q = np.percentile(z, (1 - confidence_level) * 100)
+        z_es = z[z <= q].mean()
+        scale = np.sqrt(np.sum(self.forecast(horizon, annualized=False) ** 2))
+        return self.mu * horizon + q * scale, self.mu * horizon + z_es * scale
+
+
+# -------------------------------------------------------
+# REFITS
+# -------------------------------------------------------
+
+def rolling_fit(returns:pd.Series, model:str = 'garch', window:int | None = None, step:int = 21,
+                min_obs:int = 250) -> tuple:
+    """
+    Refits the model every `step` days on the last `window` returns (None = expanding window),
+    each fit starting from the previous parameters.
+    Returns (params DataFrame indexed by refit date, out-of-sample daily volatility Series)
+    """
+    returns = returns.dropna().astype('float64')
+    n = len(returns)
+    params, oos = [], np.full(n, np.nan)
+    x0 = None
+
+    for t in range(min_obs, n, step):
+        lo = 0 if window is None else max(0, t - window)
+        g = GARCH(returns.iloc[lo:t], model).fit(x0=x0)
+        x0 = g.params
+        params.append({'Date': returns.index[t], **g.params, 'nll': g.nll})
+
+        # Filters the next days with the fitted parameters (only past returns are used for each day)
+        p = g.params
+        hi = min(t + step, n)
+        eps = returns.iloc[lo:hi].to_numpy() - g.mu
+        sigma2 = variance_recursion(eps, p['omega'], p['alpha'], p['gamma'], p['beta'], g.long_run_variance)
+        oos[t:hi] = np.sqrt(sigma2[t - lo:])
+
+    params_df = pd.DataFrame(params).set_index('Date') if params else pd.DataFrame()
+    return params_df, pd.Series(oos, index=returns.index, name="GARCH Volatility (out of sample)").dropna()
+
+
+def _fit_one(args):
+    ticker, returns, model, x0 = args
+    try:
+        return ticker, GARCH(returns, model).fit(x0=x0)
+    except Exception as e:
+        return ticker, e
+
+def fit_many(returns:dict, model:str = 'garch', n_jobs:int = 1, x0:dict | None = None) -> dict:
+    """
+    Takes {ticker: log returns}
+    Returns {ticker: fitted GARCH}, the tickers that fail are skipped. n_jobs > 1 fits in a process pool
+    """
+    tasks = [(t, r, model, x0) for t, r in returns.items()]
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_fit_one, tasks))
+    else:
+        results = [_fit_one(task) for task in tasks]
+    return {t: g for t, g in results if not isinstance(g, Exception)}
@@ -0,0 +1,228 @@
+import os
+import time
+import asyncio
+import threading
+import functools
+import itertools
+import contextvars
+from collections import deque
+import pandas as pd
+
+"""
+Lightweight instrumentation of the hot paths (Asset, strategies, Portfolio, store, news scraper, figures).
+
+Every timed call / cache lookup / download is one event (rerun, name, seconds, cache hit, bytes) in an in-process
+ring buffer (the last BUFFER_SIZE events), and is added to running totals for the Prometheus export.
+The Streamlit app tags the events with the rerun they belong to, so the debug panel shows a per-rerun breakdown.
+Events from pool threads started by a rerun are not tagged (the rerun id is not passed to the threads).
+
+Disabled by default (FIN_INSTRUMENTATION=1 enables it at startup) : a disabled decorator costs one flag check,
+a disabled span is a shared no-op object.
+"""
+
+BUFFER_SIZE = 10_000
+PROMETHEUS_PREFIX = "findash"
+
+_enabled = os.environ.get('FIN_INSTRUMENTATION', '0') not in ('', '0', 'false', 'False')
+_events = deque(maxlen=BUFFER_SIZE) # (timestamp, rerun, name, seconds, hit, nbytes), appends are thread safe
+_totals = {}                        # {name: [calls, seconds, hits, misses, bytes]}, since the start of the process
+_totals_lock = threading.Lock()
+_rerun = contextvars.ContextVar('rerun', default=None)
+_rerun_ids = itertools.count(1)
+_reruns = deque(maxlen=200)         # (rerun id, label, timestamp)
+
+
+def enable(on:bool = True):
+    global _enabled
+    _enabled = on
+
+def is_enabled() -> bool:
+    return _enabled
+
+def clear():
+    """Empties the ring buffer and the totals"""
+    _events.clear()
+    _reruns.clear()
+    with _totals_lock:
+        _totals.clear()
+
+
+# -------------------------------------------------------
+# RECORDING
+# -------------------------------------------------------
+
+def record(name:str, seconds:float = 0.0, hit:bool | None = None, nbytes:int = 0):
+    """Adds one event (a timed call, a cache lookup with hit=True/False, a download of nbytes...)"""
+    if not _enabled:
+        return
+    _events.append((time.time(), _rerun.get(), name, seconds, hit, nbytes))
+    with _totals_lock:
+        total = _totals.get(name)
+        if total is None:
+            total = _totals[name] = [0, 0.0, 0, 0, 0]
+        total[0] += 1
+        total[1] += seconds
+        if hit is True:
+            total[2] += 1
+        elif hit is False:
+            total[3] += 1
+        total[4] += nbytes
+
+
+class _Span:
+    __slots__ = ('name', 'start', 'hit', 'nbytes')
+
+    def __init__(self, name:str):
+        self.name = name
+        self.hit = None
+        self.nbytes = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, self.hit, self.nbytes)
+        return False
+
+
+class _NoSpan:
+    """What span() gives when disabled : nothing is measured, hit / nbytes can still be set"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name:str):
+    """
+    Context manager timing a block : with span("figure.build") as s: ...
+    s.hit and s.nbytes can be set inside the block
+    """
+    return _Span(name) if _enabled else _NO_SPAN
+
+def timed(name:str | None = None):
+    """
+    Decorator timing every call of a function or method (coroutine functions too).
+    The name defaults to Class.method
+    """
+    def decorator(f):
+        label = name or f.__qualname__
+
+        if asyncio.iscoroutinefunction(f):
+            @functools.wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await f(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await f(*args, **kwargs)
+                finally:
+                    record(label, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# -------------------------------------------------------
+# RERUNS (Streamlit)
+# -------------------------------------------------------
+
+def start_rerun(label:str = "") -> int:
+    """Tags the next events of this thread (a Streamlit rerun) with a new rerun id, returned"""
+    rerun = next(_rerun_ids)
+    _rerun.set(rerun)
+    _reruns.append((rerun, label, time.time()))
+    return rerun
+
+def current_rerun() -> int | None:
+    return _rerun.get()
+
+
+# -------------------------------------------------------
+# REPORTS
+# -------------------------------------------------------
+
+def events(rerun:int | None = None) -> pd.DataFrame:
+    """Returns the events of the ring buffer (of one rerun if given), oldest first"""
+    rows = list(_events)
+    if rerun is not None:
+        rows = [e for e in rows if e[1] == rerun]
+    df = pd.DataFrame(rows, columns=['time', 'rerun', 'name', 'seconds', 'hit', 'bytes'])
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    return df
+
+def summary(rerun:int | None = None) -> pd.DataFrame:
+    """Returns one row per name : calls, total and mean time, cache hits / misses and bytes (slowest first)"""
+    df = events(rerun)
+    if df.empty:
+        return pd.DataFrame(columns=['calls', 'total (s)', 'mean (ms)', 'max (ms)', 'hits', 'misses', 'bytes'])
+    g = df.groupby('name')
+    table = pd.DataFrame({
+        'calls': g.size(),
+        'total (s)': g['seconds'].sum(),
+        'mean (ms)': g['seconds'].mean() * 1e3,
+        'max (ms)': g['seconds'].max() * 1e3,
+        'hits': g['hit'].apply(lambda h: int((h == True).sum())),
+        'misses': g['hit'].apply(lambda h: int((h == False).sum())),
+        'bytes': g['bytes'].sum(),
+    })
+    return table.sort_values('total (s)', ascending=False)
+
+def reruns() -> pd.DataFrame:
+    """Returns the last reruns : page, start and the time spent in the page"""
+    df = events()
+    # The page span contains the other events, so it is the time of the rerun
+    pages = df[df['name'].str.startswith('page:')]
+    totals = pages.groupby('rerun')['seconds'].sum() if not pages.empty else pd.Series(dtype='float64')
+    rows = [{'rerun': r, 'page': label, 'start': pd.to_datetime(ts, unit='s'), 'page (s)': totals.get(r, float('nan'))}
+            for r, label, ts in _reruns]
+    return pd.DataFrame(rows, columns=['rerun', 'page', 'start', 'page (s)']).set_index('rerun')
+
+def _label(value:str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus() -> str:
+    """Returns the totals since the start of the process in the Prometheus text format"""
+    with _totals_lock:
+        totals = {name: list(t) for name, t in _totals.items()}
+    metrics = [
+        ('calls_total', 0, "Number of timed calls / cache lookups / downloads"),
+        ('seconds_total', 1, "Wall time spent in the call, in seconds"),
+        ('cache_hits_total', 2, "Cache lookups that found the value"),
+        ('cache_misses_total', 3, "Cache lookups that had to compute or download the value"),
+        ('bytes_fetched_total', 4, "Bytes downloaded"),
+    ]
+    lines = []
+    for suffix, i, help_text in metrics:
+        metric = f"{PROMETHEUS_PREFIX}_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, t in sorted(totals.items()):
+            value = f"{t[i]:.6f}" if i == 1 else str(t[i])
+            lines.append(f'{metric}{{name="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def export_prometheus(path:str):
+    """Writes to_prometheus() to path (temp file + rename, for the node exporter textfile collector)"""
+    with open(path + '.tmp', 'w') as f:
+        f.write(to_prometheus())
+    os.replace(path + '.tmp', path)
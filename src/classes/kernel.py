@@ -0,0 +1,96 @@
+import numpy as np
+from dataclasses import dataclass
+
+"""
+Backtest kernel shared by every Asset-based strategy.
+A strategy only gives its positions (exposure held over each return, 1 = fully invested, 0 = cash),
+the kernel turns them into equity, turnover, trades and costs with NumPy.
+Several strategies on the same asset are a (strategies x dates) matrix of positions : one call for all of them.
+
+Timing : positions[t] is held from the close of t-1 to the close of t, so the trade positions[t] - positions[t-1]
+is done at the close of t-1, and pays its costs before the return of t.
+"""
+
+@dataclass(frozen=True)
+class FeeModel:
+    rate: float = 0.0   # fraction of the traded value (0.001 = 10 bps)
+    fixed: float = 0.0  # currency per trade
+
+    def proportional(self, traded:np.ndarray, returns:np.ndarray) -> np.ndarray:
+        return self.rate * traded
+
+
+@dataclass(frozen=True)
+class SlippageModel:
+    bps: float = 0.0             # constant slippage, in bps of the traded value
+    vol_multiplier: float = 0.0  # + vol_multiplier * daily volatility (rolling, known at the trade)
+    vol_window: int = 20
+
+    def proportional(self, traded:np.ndarray, returns:np.ndarray) -> np.ndarray:
+        cost = self.bps / 10000
+        if self.vol_multiplier:
+            cost = cost + self.vol_multiplier * rolling_volatility(returns, self.vol_window)
+        return cost * traded
+
+
+@dataclass(frozen=True)
+class KernelResult:
+    equity: np.ndarray    # (strategies x dates) or (dates,) for one strategy
+    turnover: np.ndarray  # |position change| at each date
+    trades: np.ndarray    # number of position changes
+    costs: np.ndarray     # costs paid at each date, in currency
+
+
+def rolling_volatility(returns:np.ndarray, window:int) -> np.ndarray:
+    """
+    Std of the `window` returns before each date (0 while there is not enough history), from cumulative sums
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    c1 = np.concatenate([[0.0], np.cumsum(r)])
+    c2 = np.concatenate([[0.0], np.cumsum(r * r)])
+    t = np.arange(len(r))
+    lo = np.maximum(t - window, 0)
+    n = t - lo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (c1[t] - c1[lo]) / n
+        var = ((c2[t] - c2[lo]) - n * mean ** 2) / (n - 1)
+    return np.where(n >= 2, np.sqrt(np.maximum(var, 0)), 0.0)
+
+
+def run_kernel(returns:np.ndarray, positions:np.ndarray, capital:float = 1000, fee:FeeModel | None = None,
+               slippage:SlippageModel | None = None, initial_position=0.0) -> KernelResult:
+    """
+    Takes the asset returns (dates,) (returns[t] = close t-1 to close t, 0 for the first date)
+    and the positions (dates,) or (strategies x dates)
+    initial_position is the position held before the first date (to extend a backtest)
+    Returns the KernelResult, same shape as positions
+    """
+    returns = np.nan_to_num(np.asarray(returns, dtype=np.float64))
+    positions = np.asarray(positions, dtype=np.float64)
+    single = positions.ndim == 1
+    P = np.atleast_2d(positions)
+    previous = np.broadcast_to(np.asarray(initial_position, dtype=np.float64), (P.shape[0],))
+
+    traded = np.abs(np.diff(P, axis=1, prepend=previous[:, None]))
+    proportional = np.zeros_like(P)
+    for model in (fee, slippage):
+        if model is not None:
+            proportional += model.proportional(traded, returns)
+    fixed = (fee.fixed if fee is not None else 0.0) * (traded > 0)
+
+    # E[t] = (E[t-1] - fixed[t]) * (1 - proportional[t]) * (1 + P[t] r[t]) = a[t] * (E[t-1] - fixed[t])
+    a = (1 - proportional) * (1 + P * returns)
+    G = np.cumprod(a, axis=1)
+    if fee is not None and fee.fixed:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            equity = G * (capital - np.cumsum(np.where(fixed > 0, a * fixed / G, 0.0), axis=1))
+    else:
+        equity = capital * G
+
+    before = np.concatenate([np.full((P.shape[0], 1), capital), equity[:, :-1]], axis=1)
+    costs = fixed + (before - fixed) * proportional
+    trades = (traded > 0).sum(axis=1)
+
+    if single:
+        return KernelResult(equity[0], traded[0], trades[0], costs[0])
+    return KernelResult(equity, traded, trades, costs)
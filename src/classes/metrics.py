@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+"""
+Metrics engine shared by every strategy.
+The returns are computed once from the equity curve, then every metric comes out of the same NumPy pass.
+Works on a single equity curve (1-D) or on a matrix of curves (one per row), metrics are then arrays.
+"""
+
+@dataclass(frozen=True)
+class StrategyMetrics:
+    pnl: float
+    pnl_pct: float
+    annualized_volatility: float
+    downside_volatility: float
+    sharpe: float
+    sortino: float
+    max_drawdown: float
+    VaR: float
+    ES: float
+    drawdown: np.ndarray  # drawdown series, same length as the equity curve
+
+
+def infer_periods_per_year(index:pd.DatetimeIndex) -> float:
+    """
+    Takes the dates of the bars
+    Returns the number of bars in a year, used to annualize : 252 for daily stocks, 365 for crypto (bars on week-ends),
+    bars per session x trading days for intraday bars (78 x 252 for 5 minute stocks), 52 for weekly bars...
+    """
+    if len(index) < 2:
+        return 252
+    local = index.tz_localize(None) if index.tz is not None else index
+    stamps = np.sort(local.asi8)
+    # Integer day numbers (the screener calls this for every ticker, so no pandas date arithmetic)
+    days = stamps // 86_400_000_000_000
+    new_day = np.empty(len(days), dtype=bool)
+    new_day[0] = True
+    new_day[1:] = days[1:] != days[:-1]
+    unique_days = days[new_day]
+    # Markets open on week-ends (crypto) trade every day of the year (1970-01-01, day 0, was a Thursday)
+    trading_days = 365 if (((unique_days + 3) % 7) >= 5).mean() >= 0.2 else 252
+
+    step = np.median(np.diff(stamps)) / 86_400e9 # median gap between bars, in days
+    if step < 1:
+        # Intraday : the median number of bars per session, so half days don't count
+        bars_per_day = np.diff(np.append(np.flatnonzero(new_day), len(days)))
+        return float(np.median(bars_per_day) * trading_days)
+    if step < 2: # daily, with gaps only on closed days
+        return trading_days
+    # Weekly, monthly... bars
+    return float(round(365.25 / step))
+
+
+def compute_metrics(equity, risk_free_rate:float=0.02, confidence_level:float=0.95, periods_per_year:int=252) -> StrategyMetrics:
+    """
+    Takes an equity curve (or a 2-D array of equity curves, time on the last axis)
+    Returns all the metrics of the strategy, in one pass
+    """
+    equity = np.asarray(equity, dtype='float64')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = equity[..., 1:] / equity[..., :-1] - 1
+        n = returns.shape[-1]
+
+        # PnL
+        start_val = equity[..., 0]
+        end_val = equity[..., -1]
+        pnl = end_val - start_val
+        pnl_pct = pnl / start_val
+
+        # Drawdown
+        cummax = np.maximum.accumulate(equity, axis=-1)
+        drawdown = (equity - cummax) / cummax
+        max_drawdown = drawdown.min(axis=-1)
+
+        # Volatility (ddof=1 like pandas)
+        mean = returns.mean(axis=-1) if n else np.full(equity.shape[:-1], np.nan)
+        vol = returns.std(axis=-1, ddof=1) * np.sqrt(periods_per_year) if n > 1 else np.full(equity.shape[:-1], np.nan)
+
+        # Downside volatility : std of the negative returns only (masked, so it stays vectorized on 2-D)
+        neg = returns < 0
+        n_neg = neg.sum(axis=-1)
+        neg_mean = np.where(neg, returns, 0).sum(axis=-1) / n_neg
+        neg_var = np.where(neg, (returns - neg_mean[..., None]) ** 2, 0).sum(axis=-1) / (n_neg - 1)
+        down_vol = np.where(n_neg > 1, np.sqrt(neg_var), np.nan) * np.sqrt(periods_per_year)
+
+        # Ratios (0 when there is no volatility at all)
+        excess_return = mean * periods_per_year - risk_free_rate
+        sharpe = np.where(vol == 0, 0.0, excess_return / vol)
+        sortino = np.where(down_vol == 0, 0.0, excess_return / down_vol)
+
+        # Historical VaR and ES
+        if n:
+            VaR = np.percentile(returns, (1 - confidence_level) * 100, axis=-1)
+            tail = returns <= VaR[..., None]
+            ES = np.where(tail, returns, 0).sum(axis=-1) / tail.sum(axis=-1)
+        else:
+            VaR = np.zeros(equity.shape[:-1])
+            ES = np.zeros(equity.shape[:-1])
+
+    return StrategyMetrics(
+        pnl=pnl[()],
+        pnl_pct=pnl_pct[()],
+        annualized_volatility=vol[()],
+        downside_volatility=down_vol[()],
+        sharpe=sharpe[()],
+        sortino=sortino[()],
+        max_drawdown=max_drawdown[()],
+        VaR=VaR[()],
+        ES=ES[()],
+        drawdown=drawdown
+    )
@@ -0,0 +1,215 @@
+import math
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Monte Carlo VaR / ES for an asset or a portfolio.
+
+Models of the daily returns :
+- 'normal' : multivariate normal, correlated with the Cholesky factor of the covariance
+- 'student_t' : multivariate Student-t (same covariance, fatter tails)
+- 'filtered_bootstrap' : filtered historical simulation, the days of history are standardized by their
+  EWMA volatility, drawn with replacement (whole rows, so the correlations are kept) and rescaled by today's volatility
+
+The scenarios are generated in chunks and each chunk only sends back what VaR and ES need (the left tail) :
+- up to MAX_TAIL tail values per horizon ((1 - confidence_level) * n_scenarios), the k smallest returns seen so far
+  are kept and the quantile is exact. Memory : O(chunk + (1 - cl) * n)
+- above, a fixed histogram of HIST_BINS bins (counts and sums, placed on a pilot run) is filled instead and the
+  quantile is interpolated inside its bin (error below one bin width). Memory : O(chunk + HIST_BINS), whatever n
+Each chunk has its own seeded generator, so the result is the same with or without the process pool.
+Same conventions as the historical metrics : VaR and ES are returns (negative numbers).
+"""
+
+MAX_FLOATS = 2_000_000 # budget of simulated numbers per chunk (16 MB)
+MAX_TAIL = 250_000     # tail values kept per horizon for the exact quantile (2 MB), a histogram above
+HIST_BINS = 1 << 16
+PILOT = 20_000         # scenarios simulated to place the histogram
+
+
+class MonteCarloEngine:
+    """
+    Takes the daily returns (DataFrame dates x assets, or a Series for a single asset) and the weights
+    """
+
+    def __init__(self, returns, weights=None, model:str = 'normal', df:float = 5, ewma_lambda:float = 0.94):
+        if isinstance(returns, pd.Series):
+            returns = returns.to_frame()
+        R = np.ascontiguousarray(returns.dropna().to_numpy(dtype=np.float64))
+        n = R.shape[1]
+        if model not in ('normal', 'student_t', 'filtered_bootstrap'):
+            raise ValueError(f"Unknown model {model}")
+        if model == 'student_t' and df <= 2:
+            raise ValueError("df must be > 2 (the variance is infinite otherwise)")
+
+        self.model = model
+        self.df = df
+        self.weights = np.full(n, 1 / n) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.mean = R.mean(axis=0)
+
+        if model == 'filtered_bootstrap':
+            # EWMA variance (RiskMetrics), sigma2[t] is known at the close of day t-1
+            centered = R - self.mean
+            sigma2 = np.empty_like(R)
+            sigma2[0] = centered.var(axis=0)
+            for t in range(1, len(R)):
+                sigma2[t] = ewma_lambda * sigma2[t - 1] + (1 - ewma_lambda) * centered[t - 1] ** 2
+            self.residuals = centered / np.sqrt(sigma2)
+            self.sigma = np.sqrt(ewma_lambda * sigma2[-1] + (1 - ewma_lambda) * centered[-1] ** 2)
+        else:
+            cov = np.atleast_2d(np.cov(R, rowvar=False))
+            # Small jitter : a singular covariance (ex : duplicated asset) still has a factor
+            self.chol = np.linalg.cholesky(cov + 1e-12 * np.eye(n))
+
+    def simulate(self, rng:np.random.Generator, n_paths:int, horizon:int) -> np.ndarray:
+        """Returns (paths x horizon x assets) daily returns"""
+        n = len(self.mean)
+        if self.model == 'filtered_bootstrap':
+            rows = rng.integers(0, len(self.residuals), size=(n_paths, horizon))
+            return self.mean + self.residuals[rows] * self.sigma
+
+        shocks = rng.standard_normal((n_paths, horizon, n)) @ self.chol.T
+        if self.model == 'student_t':
+            # Normal / sqrt(chi2 / df), rescaled so the covariance stays the same
+            chi2 = rng.chisquare(self.df, size=(n_paths, horizon, 1))
+            shocks *= np.sqrt((self.df - 2) / chi2)
+        return self.mean + shocks
+
+    def portfolio_returns(self, rng:np.random.Generator, n_paths:int, horizons:tuple) -> np.ndarray:
+        """Returns (horizons x paths) portfolio returns over each horizon (each asset compounds on its own)"""
+        daily = self.simulate(rng, n_paths, max(horizons))
+        growth = np.cumprod(1 + daily, axis=1)
+        idx = np.asarray(horizons) - 1
+        return (growth[:, idx, :] @ self.weights).T - 1
+
+    def _map(self, chunk, tasks:list, n_jobs:int):
+        """Results of chunk(engine, *task) for every task, in order (in a process pool if n_jobs > 1)"""
+        if n_jobs <= 1:
+            yield from (chunk(self, *task) for task in tasks)
+            return
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(self,)) as pool:
+            yield from pool.map(_worker, [(chunk, task) for task in tasks], chunksize=max(1, len(tasks) // (4 * n_jobs)))
+
+    def run(self, n_scenarios:int = 100_000, horizons:tuple = (1, 10), confidence_level:float = 0.95,
+            seed:int | None = None, chunk_size:int | None = None, n_jobs:int = 1) -> pd.DataFrame:
+        """
+        Returns a DataFrame indexed by horizon (days) with the VaR and the ES of the portfolio
+        n_jobs > 1 simulates the chunks in a process pool
+        """
+        horizons = tuple(sorted(set(int(h) for h in horizons)))
+        if chunk_size is None:
+            chunk_size = max(1, MAX_FLOATS // (max(horizons) * len(self.mean)))
+        chunk_size = min(chunk_size, n_scenarios)
+        sizes = [chunk_size] * (n_scenarios // chunk_size)
+        if n_scenarios % chunk_size:
+            sizes.append(n_scenarios % chunk_size)
+
+        # np.percentile interpolates between the sorted values at floor(pos) and floor(pos) + 1
+        pos = (1 - confidence_level) * (n_scenarios - 1)
+        k = min(int(pos) + 2, n_scenarios)
+
+        # One more child for the pilot of the histogram, the chunks get the same seeds either way
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes) + 1)
+        if k <= MAX_TAIL:
+            tasks = [(s, size, horizons, k) for s, size in zip(seeds, sizes)]
+            tail = np.empty((len(horizons), 0))
+            for chunk_tail in self._map(_simulate_chunk, tasks, n_jobs):
+                tail = _merge_tails(tail, chunk_tail, k)
+            VaR, ES = _tail_risk(tail, pos)
+        else:
+            pilot = self.portfolio_returns(np.random.default_rng(seeds[-1]), min(PILOT, n_scenarios), horizons)
+            lo, hi = pilot.min(axis=1), pilot.max(axis=1)
+            lo = lo - (hi - lo) # room for worse returns than the pilot ones
+            tasks = [(s, size, horizons, lo, hi) for s, size in zip(seeds, sizes)]
+            counts = sums = 0
+            for chunk_counts, chunk_sums in self._map(_histogram_chunk, tasks, n_jobs):
+                counts, sums = counts + chunk_counts, sums + chunk_sums
+            VaR, ES = _histogram_risk(counts, sums, lo, hi, pos)
+
+        return pd.DataFrame({'VaR': VaR, 'ES': ES}, index=pd.Index(horizons, name='Horizon (days)'))
+
+
+# -------------------------------------------------------
+# CHUNKS (top level functions, so the process pool can pickle them)
+# -------------------------------------------------------
+
+def _simulate_chunk(engine:MonteCarloEngine, seed, size:int, horizons:tuple, k:int) -> np.ndarray:
+    """Returns the k smallest portfolio returns of the chunk, for each horizon"""
+    rng = np.random.default_rng(seed)
+    rets = engine.portfolio_returns(rng, size, horizons)
+    if rets.shape[1] > k:
+        rets = np.partition(rets, k - 1, axis=1)[:, :k]
+    return rets
+
+def _merge_tails(tail:np.ndarray, chunk_tail:np.ndarray, k:int) -> np.ndarray:
+    merged = np.concatenate([tail, chunk_tail], axis=1)
+    if merged.shape[1] > k:
+        merged = np.partition(merged, k - 1, axis=1)[:, :k]
+    return merged
+
+def _tail_risk(tail:np.ndarray, pos:float) -> tuple:
+    """Exact VaR and ES from the k smallest returns (np.percentile interpolation)"""
+    tail.sort(axis=1)
+    lo = int(pos)
+    frac = pos - lo
+    hi = min(lo + 1, tail.shape[1] - 1)
+    VaR = tail[:, lo] + frac * (tail[:, hi] - tail[:, lo])
+    # All the returns below the VaR are in the tail buffer
+    below = tail <= VaR[:, None]
+    ES = np.where(below, tail, 0).sum(axis=1) / below.sum(axis=1)
+    return VaR, ES
+
+def _histogram_chunk(engine:MonteCarloEngine, seed, size:int, horizons:tuple, lo:np.ndarray, hi:np.ndarray) -> tuple:
+    """
+    Returns the (horizons x HIST_BINS + 2) counts and sums of the portfolio returns of the chunk, on HIST_BINS bins
+    between lo and hi (bin 0 : below lo, last bin : above hi)
+    """
+    rng = np.random.default_rng(seed)
+    rets = engine.portfolio_returns(rng, size, horizons)
+    counts = np.empty((len(horizons), HIST_BINS + 2))
+    sums = np.empty_like(counts)
+    for i, r in enumerate(rets):
+        width = (hi[i] - lo[i]) / HIST_BINS
+        idx = np.clip(np.floor((r - lo[i]) / width) + 1, 0, HIST_BINS + 1).astype(np.intp)
+        counts[i] = np.bincount(idx, minlength=HIST_BINS + 2)
+        sums[i] = np.bincount(idx, weights=r, minlength=HIST_BINS + 2)
+    return counts, sums
+
+def _histogram_risk(counts:np.ndarray, sums:np.ndarray, lo:np.ndarray, hi:np.ndarray, pos:float) -> tuple:
+    """VaR and ES from the histograms, the returns of a bin being spread evenly over it"""
+    VaR, ES = np.empty(len(counts)), np.empty(len(counts))
+    for i in range(len(counts)):
+        width = (hi[i] - lo[i]) / HIST_BINS
+        cum = np.cumsum(counts[i])
+        b = int(np.searchsorted(cum, pos, side='right')) # bin of the sorted return number pos
+        before = cum[b - 1] if b else 0.0
+        if b == 0:
+            # Below every bin (should not happen, the pilot leaves room) : the mean of these returns
+            VaR[i] = ES[i] = sums[i, 0] / counts[i, 0]
+            continue
+        left = lo[i] + (b - 1) * width
+        VaR[i] = left + (pos - before + 0.5) / counts[i, b] * width
+        share = min(1.0, (VaR[i] - left) / width) * counts[i, b] # returns of the bin below the VaR
+        ES[i] = (sums[i, :b].sum() + share * (left + VaR[i]) / 2) / (before + share)
+    return VaR, ES
+
+_worker_engine = None
+
+def _init_worker(engine:MonteCarloEngine):
+    # The engine (covariance, residuals...) is sent once per process instead of once per chunk
+    global _worker_engine
+    _worker_engine = engine
+
+def _worker(job):
+    chunk, task = job
+    return chunk(_worker_engine, *task)
+
+
+def monte_carlo_risk(returns, weights=None, model:str = 'normal', n_scenarios:int = 100_000, horizons:tuple = (1, 10),
+                     confidence_level:float = 0.95, seed:int | None = None, n_jobs:int = 1, **model_params) -> pd.DataFrame:
+    """
+    Shortcut : builds the engine and runs it
+    """
+    engine = MonteCarloEngine(returns, weights, model=model, **model_params)
+    n_jobs = min(n_jobs, max(1, math.ceil(n_scenarios / 10_000))) # a pool is not worth it for small runs
+    return engine.run(n_scenarios, horizons, confidence_level, seed=seed, n_jobs=n_jobs)
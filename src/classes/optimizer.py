@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+"""
+Portfolio optimization with NumPy only (long-only, fully invested weights).
+
+- min variance / mean-variance points : projected gradient (FISTA) on the simplex
+- efficient frontier : mean-variance problems for a grid of risk aversions, each solve warm-started
+  from the previous solution, then all the weight vectors are evaluated at once (matrix products)
+- max Sharpe : best point of the frontier, refined with a finer frontier between its two neighbours
+- risk parity : Newton method on the convex formulation of Spinu (2013)
+"""
+
+# -------------------------------------------------------
+# SOLVERS
+# -------------------------------------------------------
+
+def project_simplex(V:np.ndarray) -> np.ndarray:
+    """
+    Euclidean projection of each row of V on {w >= 0, sum(w) = 1} (sort based, Duchi et al. 2008)
+    """
+    V = np.atleast_2d(V)
+    n = V.shape[1]
+    U = -np.sort(-V, axis=1)
+    css = np.cumsum(U, axis=1) - 1
+    ind = np.arange(1, n + 1)
+    cond = U - css / ind > 0
+    rho = n - np.argmax(cond[:, ::-1], axis=1) # last index where cond is True
+    theta = css[np.arange(len(V)), rho - 1] / rho
+    return np.maximum(V - theta[:, None], 0)
+
+
+def solve_mean_variance(cov:np.ndarray, mu:np.ndarray, return_weight:float = 0.0, w0:np.ndarray | None = None,
+                        step:float | None = None, max_iter:int = 5000, tol:float = 1e-9) -> np.ndarray:
+    """
+    Minimizes 0.5 * w'.cov.w - return_weight * mu'.w on the simplex (return_weight = 0 : min variance)
+    w0 is the starting point (warm start), step is 1 / largest eigenvalue of cov
+    """
+    n = len(cov)
+    if step is None:
+        step = 1 / np.linalg.eigvalsh(cov)[-1]
+    lin = return_weight * mu
+    w = project_simplex(np.full(n, 1 / n) if w0 is None else w0)[0]
+    z, t = w.copy(), 1.0
+
+    for _ in range(max_iter):
+        w_next = project_simplex(z - step * (cov @ z - lin))[0]
+        if np.max(np.abs(w_next - w)) < tol:
+            w = w_next
+            break
+        # Restart the momentum when it goes against the descent (O'Donoghue & Candes), else Nesterov step
+        if (z - w_next) @ (w_next - w) > 0:
+            t = 1.0
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        z = w_next + (t - 1) / t_next * (w_next - w)
+        w, t = w_next, t_next
+    return w
+
+
+def solve_risk_parity(cov:np.ndarray, budget:np.ndarray | None = None, max_iter:int = 100, tol:float = 1e-12) -> np.ndarray:
+    """
+    Equal (or budgeted) risk contributions : minimizes 0.5 * y'.cov.y - sum(b * log(y)), then w = y / sum(y)
+    """
+    n = len(cov)
+    b = np.full(n, 1 / n) if budget is None else np.asarray(budget, dtype=float) / np.sum(budget)
+    y = 1 / np.sqrt(np.diag(cov))
+    y *= np.sqrt(1 / (y @ cov @ y)) # good scale to start
+
+    def objective(v):
+        return 0.5 * v @ cov @ v - b @ np.log(v)
+
+    for _ in range(max_iter):
+        grad = cov @ y - b / y
+        hess = cov + np.diag(b / y**2)
+        direction = np.linalg.solve(hess, grad)
+        # Backtracking : stay positive and decrease the objective
+        s = 1.0
+        while np.any(y - s * direction <= 0) or objective(y - s * direction) > objective(y) - 1e-4 * s * grad @ direction:
+            s /= 2
+            if s < 1e-12:
+                break
+        y = y - s * direction
+        if grad @ direction / 2 < tol:
+            break
+    return y / y.sum()
+
+
+def evaluate_weights(W:np.ndarray, mu:np.ndarray, cov:np.ndarray, risk_free_rate:float = 0.02) -> pd.DataFrame:
+    """
+    Takes a (candidates x assets) matrix of weights
+    Returns the return, volatility and Sharpe ratio of every candidate, computed at once
+    """
+    W = np.atleast_2d(W)
+    ret = W @ mu
+    vol = np.sqrt(np.einsum('ij,ij->i', W @ cov, W))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(vol > 0, (ret - risk_free_rate) / vol, 0.0)
+    return pd.DataFrame({'Return': ret, 'Volatility': vol, 'Sharpe': sharpe})
+
+
+def frontier_return_weights(mu:np.ndarray, cov:np.ndarray, n_points:int = 100) -> np.ndarray:
+    """
+    Returns the n_points weights given to the return in the mean-variance problems :
+    0 (min variance) then log spaced up to a value where only the return matters
+    """
+    # Scale of the problem : the return term and the variance term are comparable around 1 / scale
+    scale = max(np.ptp(mu), 1e-12) / np.mean(np.diag(cov))
+    return np.concatenate([[0.0], np.geomspace(1e-3 / scale, 1e3 / scale, n_points - 1)])
+
+
+def efficient_frontier_weights(mu:np.ndarray, cov:np.ndarray, return_weights:np.ndarray, w0:np.ndarray | None = None) -> np.ndarray:
+    """
+    Returns a (points x assets) matrix of frontier weights, one per return weight (sorted increasingly).
+    Each solve starts from the previous solution, so it only has a few iterations to do.
+    """
+    step = 1 / np.linalg.eigvalsh(cov)[-1]
+    W = np.empty((len(return_weights), len(mu)))
+    w = w0
+    for i, rw in enumerate(return_weights):
+        w = solve_mean_variance(cov, mu, rw, w0=w, step=step)
+        W[i] = w
+    return W
+
+
+# -------------------------------------------------------
+# PORTFOLIO INTERFACE
+# -------------------------------------------------------
+
+class PortfolioOptimizer:
+    """
+    Optimizer working on the cached statistics of a Portfolio
+    """
+
+    def __init__(self, portfolio, freq:float | None = None, risk_free_rate:float = 0.02):
+        self.portfolio = portfolio
+        self.freq = freq or portfolio.periods_per_year # None : inferred from the dates of the portfolio
+        self.risk_free_rate = risk_free_rate
+        self.tickers = list(portfolio.mean_returns(self.freq).index)
+        self.mu = portfolio.mean_returns(self.freq).values
+        self.cov = portfolio.covariance_matrix(self.freq).values
+        self._frontier = None
+
+    def _as_dict(self, w:np.ndarray) -> dict:
+        return {t: float(x) for t, x in zip(self.tickers, w)}
+
+    def min_variance(self) -> dict:
+        """Returns the long-only minimum variance weights"""
+        return self._as_dict(solve_mean_variance(self.cov, self.mu, 0.0))
+
+    def risk_parity(self) -> dict:
+        """Returns the equal risk contribution weights"""
+        return self._as_dict(solve_risk_parity(self.cov))
+
+    def efficient_frontier(self, n_points:int = 100) -> pd.DataFrame:
+        """
+        Returns the frontier : one row per point, with Return, Volatility, Sharpe and the weights of every asset
+        """
+        if self._frontier is None or len(self._frontier) != n_points:
+            return_weights = frontier_return_weights(self.mu, self.cov, n_points)
+            W = efficient_frontier_weights(self.mu, self.cov, return_weights)
+            stats = evaluate_weights(W, self.mu, self.cov, self.risk_free_rate)
+            self._frontier = pd.concat([stats, pd.DataFrame(W, columns=self.tickers)], axis=1)
+            self._frontier.insert(0, 'Return Weight', return_weights)
+        return self._frontier
+
+    def max_sharpe(self, n_points:int = 100, n_refine:int = 20) -> dict:
+        """
+        Returns the long-only max Sharpe weights : best point of the frontier,
+        then a finer frontier between its two neighbours (warm-started from the left one)
+        """
+        frontier = self.efficient_frontier(n_points)
+        i = int(frontier['Sharpe'].values.argmax())
+        lo, hi = max(i - 1, 0), min(i + 1, n_points - 1)
+
+        rw = frontier['Return Weight'].values
+        fine = np.linspace(rw[lo], rw[hi], n_refine)
+        W = efficient_frontier_weights(self.mu, self.cov, fine, w0=frontier[self.tickers].values[lo])
+        stats = evaluate_weights(W, self.mu, self.cov, self.risk_free_rate)
+        return self._as_dict(W[int(stats['Sharpe'].values.argmax())])
+
+    def frontier_graph(self, n_points:int = 100, current_weights:dict | None = None):
+        """
+        Returns the graph of the efficient frontier (and of the current portfolio if its weights are given)
+        """
+        frontier = self.efficient_frontier(n_points)
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=frontier['Volatility'],
+            y=frontier['Return'],
+            mode='lines+markers',
+            marker=dict(size=4, color=frontier['Sharpe'], colorscale='Viridis', showscale=True, colorbar=dict(title="Sharpe")),
+            name='Efficient Frontier'
+        ))
+
+        for name, weights, symbol in [("Min Variance", self.min_variance(), 'diamond'),
+                                      ("Max Sharpe", self.max_sharpe(n_points), 'star'),
+                                      ("Risk Parity", self.risk_parity(), 'square'),
+                                      ("Current", current_weights, 'x')]:
+            if weights is None:
+                continue
+            w = np.array([weights[t] for t in self.tickers])
+            stats = evaluate_weights(w, self.mu, self.cov, self.risk_free_rate).iloc[0]
+            fig.add_trace(go.Scatter(
+                x=[stats['Volatility']],
+                y=[stats['Return']],
+                mode='markers',
+                marker=dict(size=12, symbol=symbol),
+                name=name
+            ))
+
+        fig.update_layout(
+            title="Efficient Frontier (long only)",
+            xaxis_title="Annualized Volatility",
+            yaxis_title="Annualized Return",
+            xaxis_tickformat=".0%",
+            yaxis_tickformat=".0%",
+            template="plotly_dark"
+        )
+        return fig
@@ -4,9 +4,24 @@
 
 
 
+import time
+import threading
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from .Asset import Asset
+from .rebalancing import backtest_rebalancing, RebalanceResult
+from .montecarlo import monte_carlo_risk
+from .metrics import infer_periods_per_year
+from .instrumentation import timed
+from load_data.price_store import get_default_store
+
+
+# Loads of add_assets that timed out and may still run : {(store id, ticker): Future}.
+# A thread can't be killed, it ends when its download returns (bounded by the provider timeout, 10s per request
+# for Yahoo) and holds the store lock of the ticker until then, so the ticker is not loaded again meanwhile.
+_timed_out_loads = {}
+_timed_out_guard = threading.Lock()
 
 
 class Portfolio:
@@ -14,19 +29,129 @@ class Portfolio:
     Simple multi-asset portfolio built from the Asset class.
     """
 
-    def __init__(self, name : str= "Default Portfolio"):
+    def __init__(self, name : str= "Default Portfolio", store=None):
         self.name = name
+        self.store = store    # PriceStore used to load the assets (None = shared store)
         self.assets = {}      # {ticker: Asset}
         self.weights = {}     # {ticker: weight}
+        # Aligned returns, built once and only rebuilt when the assets change
+        self._dates = None    # DatetimeIndex of the common dates
+        self._R = None        # (dates x assets) contiguous float64 matrix
+        self._tickers = None  # column order of _R
+        self._stats = None    # mean, cov, std, corr computed from _R
 
     # -------------------------------------------------------
     # ASSET MANAGEMENT
     # -------------------------------------------------------
 
-    def add_asset(self, ticker: str, weight: float | None = None):
-        """Adds an asset to the portfolio"""
-        self.assets[ticker] = Asset(ticker)
+    def add_asset(self, ticker: str, weight: float | None = None, asset: Asset | None = None):
+        """Adds an asset to the portfolio (an already loaded Asset can be given)"""
+        self.assets[ticker] = asset if asset is not None else Asset(ticker, store=self.store)
         self.weights[ticker] = weight
+        self._invalidate()
+
+    @timed()
+    def add_assets(self, tickers: list[str], weights: dict[str, float] | None = None,
+                   max_workers: int = 8, timeout: float = 30) -> dict[str, str]:
+        """
+        Adds several assets at once, their histories are loaded concurrently.
+        A ticker that fails or takes more than `timeout` seconds is skipped, the others are still added.
+        Returns the failures {ticker: reason}, with the error of the store (HTTP error, bad ticker...) when there is one.
+        The download of a timed out ticker goes on in the background until the provider gives up (see _timed_out_loads) :
+        asking the ticker again meanwhile fails at once instead of waiting for it.
+        """
+        weights = weights or {}
+        failures = {}
+        loaded = {}
+        started = {}
+        store = self.store if self.store is not None else get_default_store()
+
+        def load(t):
+            started[t] = time.monotonic()
+            # Through the store and not Asset(), which keeps an empty history on errors : the reason is kept
+            bars = store.get_history(t)
+            if bars.empty:
+                return None
+            return Asset.from_bars(t, bars, store=store)
+
+        to_load = []
+        with _timed_out_guard:
+            for t in tickers:
+                previous = _timed_out_loads.get((id(store), t))
+                if previous is not None and not previous.done():
+                    failures[t] = "Previous download timed out and is still running"
+                    continue
+                _timed_out_loads.pop((id(store), t), None)
+                to_load.append(t)
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {pool.submit(load, t): t for t in to_load}
+        pending = set(futures)
+        # Hard limit too, in case every worker is stuck and the last tickers never start
+        hard_deadline = time.monotonic() + timeout * (len(to_load) // max_workers + 2)
+
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[futures[f]] + timeout for f in pending if futures[f] in started]
+            wait_for = min(deadlines + [now + 0.1]) - now
+            done, pending = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+            for f in done:
+                t = futures[f]
+                try:
+                    asset = f.result()
+                except Exception as e:
+                    failures[t] = f"{type(e).__name__} : {e}" if str(e) else type(e).__name__
+                    continue
+                if asset is None:
+                    failures[t] = "No data"
+                    continue
+                loaded[t] = asset
+
+            # Per-ticker timeout, counted from the moment its download started
+            now = time.monotonic()
+            for f in list(pending):
+                t = futures[f]
+                if (t in started and now - started[t] > timeout) or now > hard_deadline:
+                    failures[t] = f"Timeout after {timeout}s"
+                    pending.discard(f)
+                    if f.running():
+                        with _timed_out_guard:
+                            _timed_out_loads[(id(store), t)] = f
+
+        # Don't wait for the threads that timed out (the ones not started yet are cancelled)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        # Same order as the tickers given, whatever the order of completion
+        for t in tickers:
+            if t in loaded:
+                self.assets[t] = loaded[t]
+                self.weights[t] = weights.get(t)
+        self._invalidate()
+        return failures
+
+    @timed()
+    def update(self, new_bars: dict | None = None) -> int:
+        """
+        Updates every asset (new_bars: {ticker: DataFrame}, None = ask the store)
+        and appends only the new aligned returns. Returns the number of new dates.
+        """
+        new_bars = new_bars or {}
+        for t, asset in self.assets.items():
+            asset.update(new_bars.get(t))
+
+        if self._R is None:
+            return 0
+
+        last_date = self._dates[-1]
+        new_list = [asset.returns.loc[asset.returns.index > last_date].rename(t)
+                    for t, asset in self.assets.items()]
+        new_rows = pd.concat(new_list, axis=1, join="inner").dropna()
+        if not new_rows.empty:
+            self._dates = self._dates.append(new_rows.index)
+            self._R = np.ascontiguousarray(np.vstack([self._R, new_rows[self._tickers].to_numpy(dtype=np.float64)]))
+            self._stats = None
+        return len(new_rows)
 
     def set_equal_weights(self):
         n = len(self.assets)
@@ -53,17 +178,45 @@ class Portfolio:
     # INTERNAL HELPERS
     # -------------------------------------------------------
 
-    def _returns_df(self) -> pd.DataFrame:
-        
-        returns_list = []
+    def _invalidate(self):
+        """Called when the assets change : the aligned matrix has to be rebuilt"""
+        self._dates = None
+        self._R = None
+        self._tickers = None
+        self._stats = None
+
+    @timed()
+    def _aligned(self):
+        """Returns (dates, returns matrix, tickers), aligned once on the common dates"""
+        if self._R is None:
+            returns_list = []
 
-        for ticker, asset in self.assets.items():
-            r = asset.returns.rename(ticker)
-            returns_list.append(r)
+            for ticker, asset in self.assets.items():
+                r = asset.returns.rename(ticker)
+                returns_list.append(r)
 
-        # Aligns all returns on common dates
-        df = pd.concat(returns_list, axis=1, join="inner").dropna()
-        return df
+            # Aligns all returns on common dates
+            df = pd.concat(returns_list, axis=1, join="inner").dropna()
+            self._dates = df.index
+            self._tickers = list(df.columns)
+            self._R = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+        return self._dates, self._R, self._tickers
+
+    def _statistics(self) -> dict:
+        """Mean, covariance, std and correlation of the returns (not annualized) and the periods per year, computed once"""
+        if self._stats is None:
+            dates, R, _ = self._aligned()
+            mean = R.mean(axis=0)
+            centered = R - mean
+            cov = centered.T @ centered / (len(R) - 1)
+            std = np.sqrt(np.diag(cov))
+            self._stats = {'mean': mean, 'cov': cov, 'std': std, 'corr': cov / np.outer(std, std),
+                           'periods_per_year': infer_periods_per_year(dates)}
+        return self._stats
+
+    def _returns_df(self) -> pd.DataFrame:
+        dates, R, tickers = self._aligned()
+        return pd.DataFrame(R, index=dates, columns=tickers, copy=False)
 
     def _weights_vector(self, columns):
         """Returns a numpy array of weights aligned with DataFrame columns"""
@@ -77,30 +230,49 @@ class Portfolio:
     # METRICS
     # -------------------------------------------------------
 
+    @property
+    def periods_per_year(self) -> float:
+        """Number of return periods in a year, inferred from the common dates (the default freq)"""
+        return self._statistics()['periods_per_year']
+
+    def mean_returns(self, freq=None) -> pd.Series:
+        freq = freq or self.periods_per_year
+        _, _, tickers = self._aligned()
+        return pd.Series(self._statistics()['mean'] * freq, index=tickers)
+
+    def covariance_matrix(self, freq=None) -> pd.DataFrame:
+        freq = freq or self.periods_per_year
+        _, _, tickers = self._aligned()
+        return pd.DataFrame(self._statistics()['cov'] * freq, index=tickers, columns=tickers)
+
     def correlation_matrix(self) -> pd.DataFrame:
-        df = self._returns_df()
-        return df.corr()
+        _, _, tickers = self._aligned()
+        return pd.DataFrame(self._statistics()['corr'], index=tickers, columns=tickers)
 
     def portfolio_returns(self) -> pd.Series:
-        df = self._returns_df()
-        w = self._weights_vector(df.columns)
-        port_ret = df.dot(w)
-        port_ret.name = "portfolio_return"
-        return port_ret
+        dates, R, tickers = self._aligned()
+        w = self._weights_vector(tickers)
+        # New weights only cost this matrix-vector product
+        return pd.Series(R @ w, index=dates, name="portfolio_return")
 
-    def portfolio_volatility(self, freq=252) -> float:
-        port_ret = self.portfolio_returns()
-        return float(np.sqrt(freq) * port_ret.std())
+    def portfolio_volatility(self, freq=None) -> float:
+        freq = freq or self.periods_per_year
+        _, _, tickers = self._aligned()
+        w = self._weights_vector(tickers)
+        # Same as the std of the portfolio returns, but from the cached covariance
+        return float(np.sqrt(freq * (w @ self._statistics()['cov'] @ w)))
 
-    def diversification_ratio(self, freq=252) -> float:
-        df = self._returns_df()
-        cov = df.cov() * freq              
-        stds = df.std() * np.sqrt(freq)     
+    def diversification_ratio(self, freq=None) -> float:
+        freq = freq or self.periods_per_year
+        _, _, tickers = self._aligned()
+        stats = self._statistics()
+        cov = stats['cov'] * freq
+        stds = stats['std'] * np.sqrt(freq)
 
-        w = self._weights_vector(df.columns)
+        w = self._weights_vector(tickers)
 
         num = np.sum(w * stds)             
-        denom = np.sqrt(w.T @ cov.values @ w)
+        denom = np.sqrt(w.T @ cov @ w)
 
         return float(num / denom)
 
@@ -110,3 +282,25 @@ class Portfolio:
         value = initial_capital * (1 + port_ret).cumprod()
         value.name = "portfolio_value"
         return value
+
+    @timed()
+    def backtest(self, policy="monthly", threshold=0.05, cost=0.001, initial_capital=10000) -> RebalanceResult:
+        """
+        Backtest with the weights drifting between rebalances and proportional costs at each rebalance
+        (portfolio_value is the 'daily' policy without costs)
+        """
+        dates, R, tickers = self._aligned()
+        w = self._weights_vector(tickers)
+        return backtest_rebalancing(R, dates, tickers, w, policy=policy, threshold=threshold,
+                                    cost=cost, initial_capital=initial_capital)
+
+    @timed()
+    def monte_carlo_risk(self, model="normal", n_scenarios=100_000, horizons=(1, 10),
+                         confidence_level=0.95, seed=None, n_jobs=1, **model_params) -> pd.DataFrame:
+        """
+        Simulated VaR and ES of the portfolio for each horizon (see montecarlo.py)
+        """
+        _, _, tickers = self._aligned()
+        return monte_carlo_risk(self._returns_df(), self._weights_vector(tickers), model=model,
+                                n_scenarios=n_scenarios, horizons=horizons, confidence_level=confidence_level,
+                                seed=seed, n_jobs=n_jobs, **model_params)
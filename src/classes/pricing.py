@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+European / American option pricing with NumPy only, vectorized over whole chains.
+
+Every function broadcasts its arguments : S, K, T, r, sigma, q can be scalars or arrays
+(ex : K of shape (1, n_strikes) and T of shape (n_expiries, 1) give a strike x expiry surface).
+kind is 'call' or 'put' (or an array of them). T is in years, rates are continuous.
+
+- Black-Scholes prices and Greeks (closed form), the normal cdf is the double precision
+  approximation of Hart (1968) as written by West (2005), so no scipy is needed
+- Cox-Ross-Rubinstein tree, European or American, one vector of N+1 values per contract
+- Monte Carlo for European options, antithetic draws and the discounted stock as control variate,
+  in seeded chunks (optionally in a process pool)
+- Implied volatility of a whole chain at once (Newton steps, bisection when Newton leaves the bracket)
+"""
+
+# -------------------------------------------------------
+# NORMAL DISTRIBUTION
+# -------------------------------------------------------
+
+def norm_pdf(x):
+    return np.exp(-0.5 * np.square(x)) / np.sqrt(2 * np.pi)
+
+def norm_cdf(x):
+    """Cumulative normal, Hart's double precision algorithm (West 2005), error < 1e-14"""
+    x = np.asarray(x, dtype=np.float64)
+    a = np.abs(x)
+    e = np.exp(-0.5 * a * a)
+
+    # |x| < 7.07 : rational approximation
+    num = ((((((3.52624965998911e-02 * a + 0.700383064443688) * a + 6.37396220353165) * a + 33.912866078383) * a
+            + 112.079291497871) * a + 221.213596169931) * a + 220.206867912376)
+    den = (((((((8.83883476483184e-02 * a + 1.75566716318264) * a + 16.064177579207) * a + 86.7807322029461) * a
+             + 296.564248779674) * a + 637.333633378831) * a + 793.826512519948) * a + 440.413735824752)
+    small = e * num / den
+
+    # Otherwise : continued fraction
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cf = a + 1 / (a + 2 / (a + 3 / (a + 4 / (a + 0.65))))
+        large = e / cf / 2.506628274631
+
+    tail = np.where(a < 7.07106781186547, small, np.where(a > 37, 0.0, large))
+    return np.where(x > 0, 1 - tail, tail)
+
+
+def _is_call(kind):
+    return np.asarray(kind) == 'call'
+
+
+# -------------------------------------------------------
+# BLACK-SCHOLES
+# -------------------------------------------------------
+
+def _d1_d2(S, K, T, r, sigma, q):
+    vol_sqrt_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma ** 2) * T) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+def black_scholes(S, K, T, r, sigma, q=0.0, kind='call'):
+    """Returns the Black-Scholes price(s)"""
+    S, K, T, sigma = (np.asarray(v, dtype=np.float64) for v in (S, K, T, sigma))
+    d1, d2 = _d1_d2(S, K, T, r, sigma, q)
+    df_q, df_r = np.exp(-q * T), np.exp(-r * T)
+    call = S * df_q * norm_cdf(d1) - K * df_r * norm_cdf(d2)
+    # Put-call parity
+    return np.where(_is_call(kind), call, call - S * df_q + K * df_r)
+
+def bs_greeks(S, K, T, r, sigma, q=0.0, kind='call') -> dict:
+    """
+    Returns {price, delta, gamma, vega, theta, rho}
+    vega and rho for 1.00 of vol / rate, theta per year
+    """
+    S, K, T, sigma = (np.asarray(v, dtype=np.float64) for v in (S, K, T, sigma))
+    call = _is_call(kind)
+    d1, d2 = _d1_d2(S, K, T, r, sigma, q)
+    df_q, df_r = np.exp(-q * T), np.exp(-r * T)
+    Nd1, Nd2, pdf = norm_cdf(d1), norm_cdf(d2), norm_pdf(d1)
+    sqrt_t = np.sqrt(T)
+
+    call_price = S * df_q * Nd1 - K * df_r * Nd2
+    price = np.where(call, call_price, call_price - S * df_q + K * df_r)
+    delta = np.where(call, df_q * Nd1, df_q * (Nd1 - 1))
+    gamma = df_q * pdf / (S * sigma * sqrt_t)
+    vega = S * df_q * pdf * sqrt_t
+    common = -S * df_q * pdf * sigma / (2 * sqrt_t)
+    theta = np.where(call,
+                     common - r * K * df_r * Nd2 + q * S * df_q * Nd1,
+                     common + r * K * df_r * (1 - Nd2) - q * S * df_q * (1 - Nd1))
+    rho = np.where(call, K * T * df_r * Nd2, -K * T * df_r * (1 - Nd2))
+    return {'price': price, 'delta': delta, 'gamma': gamma, 'vega': vega, 'theta': theta, 'rho': rho}
+
+
+# -------------------------------------------------------
+# BINOMIAL TREE
+# -------------------------------------------------------
+
+def crr_price(S, K, T, r, sigma, q=0.0, kind='call', steps:int = 500, american:bool = False):
+    """
+    Cox-Ross-Rubinstein tree. The contracts are priced together, each one only keeps
+    the N+1 values of the current step (backward induction in place)
+    """
+    S, K, T, sigma, call = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (S, K, T, sigma)), _is_call(kind))
+    shape = S.shape
+    S, K, T, sigma, call = (v.reshape(-1, 1) for v in (S, K, T, sigma, call))
+
+    dt = T / steps
+    u = np.exp(sigma * np.sqrt(dt))
+    d = 1 / u
+    p = (np.exp((r - q) * dt) - d) / (u - d)
+    disc = np.exp(-r * dt)
+    log_u = np.log(u)
+
+    def payoff(spot):
+        return np.where(call, np.maximum(spot - K, 0), np.maximum(K - spot, 0))
+
+    # Terminal nodes : S * u^(2j - N)
+    j = np.arange(steps + 1)
+    V = payoff(S * np.exp(log_u * (2 * j - steps)))
+
+    for i in range(steps - 1, -1, -1):
+        V[:, :i + 1] = disc * (p * V[:, 1:i + 2] + (1 - p) * V[:, :i + 1])
+        if american:
+            np.maximum(V[:, :i + 1], payoff(S * np.exp(log_u * (2 * j[:i + 1] - i))), out=V[:, :i + 1])
+    return V[:, 0].reshape(shape)
+
+
+# -------------------------------------------------------
+# MONTE CARLO
+# -------------------------------------------------------
+
+MAX_FLOATS = 2_000_000 # draws x contracts per chunk
+
+def _mc_chunk(args) -> np.ndarray:
+    """Returns the sums (n, X, Y, XX, XY, YY) of one chunk, for each contract"""
+    seed, n_pairs, S, K, T, r, sigma, q, call = args
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n_pairs, 1))
+    drift = (r - q - 0.5 * sigma ** 2) * T
+    vol = sigma * np.sqrt(T)
+    disc = np.exp(-r * T)
+
+    up = S * np.exp(drift + vol * z)
+    down = S * np.exp(drift - vol * z)
+    payoff = lambda s: np.where(call, np.maximum(s - K, 0), np.maximum(K - s, 0))
+    # One sample = the average of the antithetic pair
+    Y = disc * 0.5 * (payoff(up) + payoff(down))
+    X = disc * 0.5 * (up + down)
+    return np.stack([np.full(Y.shape[1], n_pairs, dtype=np.float64), X.sum(0), Y.sum(0),
+                     (X * X).sum(0), (X * Y).sum(0), (Y * Y).sum(0)])
+
+def mc_price(S, K, T, r, sigma, q=0.0, kind='call', n_paths:int = 200_000, seed:int | None = None,
+             n_jobs:int = 1, control_variate:bool = True) -> tuple:
+    """
+    European Monte Carlo price, the same draws for all the contracts
+    Returns (prices, standard errors)
+    """
+    S, K, T, sigma, call = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (S, K, T, sigma)), _is_call(kind))
+    shape = S.shape
+    S, K, T, sigma, call = (v.reshape(1, -1) for v in (S, K, T, sigma, call))
+
+    n_pairs = max(1, n_paths // 2)
+    chunk = max(1, min(n_pairs, MAX_FLOATS // S.shape[1]))
+    sizes = [chunk] * (n_pairs // chunk) + ([n_pairs % chunk] if n_pairs % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, size, S, K, T, r, sigma, q, call) for s, size in zip(seeds, sizes)]
+
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            sums = sum(pool.map(_mc_chunk, tasks))
+    else:
+        sums = sum(_mc_chunk(t) for t in tasks)
+
+    n, sx, sy, sxx, sxy, syy = sums
+    mx, my = sx / n, sy / n
+    var_x = sxx / n - mx ** 2
+    var_y = syy / n - my ** 2
+    cov_xy = sxy / n - mx * my
+    if control_variate:
+        # E[X] is known : the discounted forward
+        beta = np.where(var_x > 0, cov_xy / np.where(var_x > 0, var_x, 1), 0.0)
+        price = my - beta * (mx - (S * np.exp(-q * T))[0])
+        var = var_y - beta * cov_xy
+    else:
+        price, var = my, var_y
+    stderr = np.sqrt(np.maximum(var, 0) / n)
+    return price.reshape(shape), stderr.reshape(shape)
+
+
+# -------------------------------------------------------
+# IMPLIED VOLATILITY
+# -------------------------------------------------------
+
+def implied_vol(price, S, K, T, r, q=0.0, kind='call', tol:float = 1e-10, max_iter:int = 100,
+                low:float = 1e-4, high:float = 5.0):
+    """
+    Implied volatilities of a whole chain. Newton steps on the vega, and a bisection step
+    each time Newton goes out of the bracket. NaN when the price is outside the no-arbitrage bounds.
+    """
+    price, S, K, T, call = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (price, S, K, T)), _is_call(kind))
+    shape = price.shape
+    price, S, K, T, call = (v.reshape(-1) for v in (price, S, K, T, call))
+    kind_arr = np.where(call, 'call', 'put')
+
+    df_q, df_r = S * np.exp(-q * T), K * np.exp(-r * T)
+    lower = np.where(call, np.maximum(df_q - df_r, 0), np.maximum(df_r - df_q, 0))
+    upper = np.where(call, df_q, df_r)
+    valid = (price > lower) & (price < upper) & (T > 0)
+
+    lo = np.full(len(price), low)
+    hi = np.full(len(price), high)
+    # Start : approximation of Manaster-Koehler, clipped
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.clip(np.sqrt(2 * np.abs(np.log(S / K) + (r - q) * T) / T), 0.05, 2.0)
+    sigma = np.where(np.isfinite(sigma), sigma, 0.3)
+    active = valid.copy()
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        g = bs_greeks(S[idx], K[idx], T[idx], r, sigma[idx], q, kind_arr[idx])
+        diff = g['price'] - price[idx]
+        # Relative tolerance : the far out-of-the-money prices are tiny
+        done = np.abs(diff) <= tol * price[idx]
+        active[idx[done]] = False
+
+        # Bracket update
+        too_high = diff > 0
+        hi[idx] = np.where(too_high, sigma[idx], hi[idx])
+        lo[idx] = np.where(too_high, lo[idx], sigma[idx])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sigma[idx] - diff / g['vega']
+        bisect = (lo[idx] + hi[idx]) / 2
+        ok = np.isfinite(newton) & (newton > lo[idx]) & (newton < hi[idx])
+        step = np.where(ok, newton, bisect)
+        # Stops when the volatility doesn't move anymore (or the bracket can't shrink anymore)
+        stalled = (np.abs(step - sigma[idx]) < 1e-14) | (hi[idx] - lo[idx] < 1e-14)
+        sigma[idx] = np.where(done, sigma[idx], step)
+        active[idx[stalled]] = False
+
+    return np.where(valid, sigma, np.nan).reshape(shape)
+
+
+# -------------------------------------------------------
+# CHAINS
+# -------------------------------------------------------
+
+def price_surface(S:float, strikes, expiries, r:float, sigma:float, q:float = 0.0, kind:str = 'call') -> dict:
+    """
+    Takes strikes and expiries (years)
+    Returns the Greeks dict, each one an (expiries x strikes) DataFrame
+    """
+    K = np.asarray(strikes, dtype=np.float64)[None, :]
+    T = np.asarray(expiries, dtype=np.float64)[:, None]
+    greeks = bs_greeks(S, K, T, r, sigma, q, kind)
+    return {name: pd.DataFrame(values, index=pd.Index(np.ravel(expiries), name='Expiry'),
+                               columns=pd.Index(np.ravel(strikes), name='Strike'))
+            for name, values in greeks.items()}
+
+
+def asset_inputs(asset, window:int | None = None, periods_per_year:float | None = None) -> tuple:
+    """
+    Returns (spot, volatility) of an Asset : the last close and the annualized volatility
+    of the last `window` log returns (None : one year of bars, the periods per year of the asset)
+    """
+    periods_per_year = periods_per_year or asset.periods_per_year
+    window = window or int(periods_per_year)
+    spot = float(asset.prices['Price'].iloc[-1])
+    vol = float(asset.log_returns.iloc[-window:].std() * np.sqrt(periods_per_year))
+    return spot, vol
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+"""
+Rebalancing backtest of a multi-asset portfolio, with proportional transaction costs.
+
+Between two rebalances the holdings are not touched, so the weights drift with the prices.
+Every day of a segment comes from the cumulative log returns of the segment (one array operation),
+and the segments are chained with a cumulative product. The only Python loop is over the rebalances
+of the threshold policy, where the next rebalance depends on the drift since the previous one.
+"""
+
+POLICIES = ['daily', 'monthly', 'quarterly', 'yearly', 'threshold', 'never']
+
+
+@dataclass(frozen=True)
+class RebalanceResult:
+    value: pd.Series            # portfolio value, net of costs
+    weights: pd.DataFrame       # drifted weights at the end of each day (before rebalancing)
+    turnover: pd.Series         # sum of |weight traded| at each rebalance (indexed by the rebalance date)
+    costs: pd.Series            # costs paid at each rebalance, in currency
+
+    @property
+    def n_rebalances(self) -> int:
+        return len(self.turnover)
+
+    @property
+    def total_costs(self) -> float:
+        return float(self.costs.sum())
+
+
+def calendar_starts(dates:pd.DatetimeIndex, policy:str) -> np.ndarray:
+    """
+    Returns the indices of the days starting a new segment : first day of each month / quarter / year
+    (the portfolio is rebalanced at the close of the day before)
+    """
+    if policy == 'daily':
+        return np.arange(len(dates))
+    if policy == 'never':
+        return np.array([0])
+    months = dates.year.to_numpy() * 12 + dates.month.to_numpy() - 1
+    period = {'monthly': months, 'quarterly': months // 3, 'yearly': months // 12}[policy]
+    return np.concatenate([[0], np.flatnonzero(np.diff(period)) + 1])
+
+
+def threshold_starts(L:np.ndarray, w:np.ndarray, threshold:float, block:int = 64) -> np.ndarray:
+    """
+    Takes the cumulative log returns L (with a row of zeros first) and the target weights
+    Returns the segment starts : a rebalance happens at the close of the first day where
+    a weight drifted more than `threshold` away from its target
+    """
+    T = len(L) - 1
+    starts = [0]
+    s = 0
+    while s < T:
+        # The next rebalance is searched in blocks that grow, so a long quiet period costs few operations
+        size = block
+        found = None
+        lo = s
+        while lo < T:
+            hi = min(lo + size, T)
+            gw = w * np.exp(L[lo + 1:hi + 1] - L[s])
+            drift = np.abs(gw / gw.sum(axis=1, keepdims=True) - w).max(axis=1)
+            over = np.flatnonzero(drift > threshold)
+            if len(over):
+                found = lo + over[0]
+                break
+            lo, size = hi, size * 2
+        if found is None or found + 1 >= T:
+            break
+        s = found + 1
+        starts.append(s)
+    return np.array(starts)
+
+
+def backtest_rebalancing(R:np.ndarray, dates:pd.DatetimeIndex, tickers:list, weights:np.ndarray,
+                         policy:str = 'monthly', threshold:float = 0.05, cost:float = 0.001,
+                         initial_capital:float = 10000) -> RebalanceResult:
+    """
+    Takes the aligned (dates x assets) returns, the target weights and a rebalancing policy
+    ('daily', 'monthly', 'quarterly', 'yearly', 'threshold' or 'never'),
+    cost is the proportional cost of the traded value (0.001 = 10 bps).
+    The initial purchase is free, only the rebalances pay costs.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy}, choose among {POLICIES}")
+    R = np.asarray(R, dtype='float64')
+    w = np.asarray(weights, dtype='float64')
+    T = len(R)
+
+    # L[t] = log growth of each asset from the start to the close of day t-1
+    L = np.zeros((T + 1, R.shape[1]))
+    np.cumsum(np.log1p(R), axis=0, out=L[1:])
+
+    starts = threshold_starts(L, w, threshold) if policy == 'threshold' else calendar_starts(dates, policy)
+    ends = np.append(starts[1:] - 1, T - 1)
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, T)))
+
+    # Growth of the holdings since the start of their segment
+    gw = w * np.exp(L[1:] - L[starts[seg]])
+    growth = gw.sum(axis=1)
+    drifted = gw / growth[:, None]
+
+    # Rebalancing back to w at the close of each segment end (except the last one)
+    turnover = np.abs(drifted[ends[:-1]] - w).sum(axis=1)
+    kept = 1 - cost * turnover
+    # Value at the start of each segment, after the costs
+    start_value = initial_capital * np.cumprod(np.concatenate([[1.0], growth[ends[:-1]] * kept]))
+    value = start_value[seg] * growth
+    paid = start_value[:-1] * growth[ends[:-1]] * cost * turnover
+
+    rebalance_dates = dates[ends[:-1]]
+    return RebalanceResult(
+        value=pd.Series(value, index=dates, name="portfolio_value"),
+        weights=pd.DataFrame(drifted, index=dates, columns=tickers),
+        turnover=pd.Series(turnover, index=rebalance_dates, name="turnover"),
+        costs=pd.Series(paid, index=rebalance_dates, name="costs")
+    )
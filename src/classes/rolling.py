@@ -0,0 +1,360 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+"""
+Rolling statistics engine : mean, std, min, max, EWMA and z-score.
+
+Batch (NumPy arrays) : only the asked positions [start, stop) are computed, from the (window - 1) values before
+start (the warm-up) and never from the whole history. Several windows come out as a (windows x positions) matrix,
+for the chart overlays and the Momentum signals.
+    - mean : differences of one cumulative sum of the segment, shared by all the windows
+    - var / std : the add / remove recursion of pandas rolling (a sum of squares would cancel on prices)
+    - min / max : van Herk / Gil-Werman, the prefix and suffix extremes of blocks of `window` values
+    - EWMA : the warm-up is the number of values after which the first one weighs less than `tol`
+
+Live (one value at a time) : RollingWindow and EWMA keep a state updated in O(1) per new bar
+(Welford add / remove for the mean and variance, monotonic deques for the min and max).
+Both give the same numbers as pandas rolling(window) / ewm(adjust=False), NaN until the window is full.
+"""
+
+STATS = ('mean', 'std', 'var', 'min', 'max', 'zscore')
+
+
+def _as_windows(windows) -> np.ndarray:
+    windows = np.atleast_1d(np.asarray(windows, dtype=int))
+    if (windows < 1).any():
+        raise ValueError("Windows must be >= 1")
+    return windows
+
+def _bounds(n:int, start:int, stop:int | None) -> tuple:
+    stop = n if stop is None else min(stop, n)
+    return max(0, start), stop
+
+
+# -------------------------------------------------------
+# BATCH
+# -------------------------------------------------------
+
+def _segment(x:np.ndarray, windows:np.ndarray, start:int, stop:int) -> tuple:
+    """Returns (lo, seg) : the values from the warm-up of the longest window before start, up to stop"""
+    lo = max(0, start - int(windows.max()) + 1)
+    return lo, np.asarray(x[lo:stop], dtype='float64') # float32 bars : only the segment is converted
+
+def rolling_mean(x, windows, start:int = 0, stop:int | None = None) -> np.ndarray:
+    """
+    (windows x positions) rolling means of x on [start, stop), NaN where the window is not full.
+    One cumulative sum of the segment (around its first value) is shared by all the windows
+    """
+    x = np.asarray(x)
+    windows = _as_windows(windows)
+    start, stop = _bounds(len(x), start, stop)
+    out = np.full((len(windows), max(0, stop - start)), np.nan)
+    if stop <= start:
+        return out
+    lo, seg = _segment(x, windows, start, stop)
+    if np.isnan(seg).any():
+        # A hole would spread to every later sum : pandas skips it window by window
+        s = pd.Series(seg)
+        for i, w in enumerate(windows):
+            out[i] = s.rolling(int(w)).mean().to_numpy()[start - lo:]
+        return out
+
+    ref = seg[0]
+    c = np.empty(len(seg) + 1)
+    c[0] = 0.0
+    np.cumsum(seg - ref, out=c[1:])
+    for i, w in enumerate(windows):
+        w = int(w)
+        if w == 1:
+            # The value itself, exactly (the signals compare it to the price)
+            out[i] = seg[start - lo:]
+            continue
+        first = max(start, lo + w - 1) # first position with a full window
+        if first >= stop:
+            continue
+        a, b = first - lo + 1, stop - lo + 1 # c[j] - c[j - w] is the sum of the window ending at j - 1
+        out[i, first - start:] = ref + (c[a:b] - c[a - w:b - w]) / w
+    return out
+
+def rolling_var(x, windows, start:int = 0, stop:int | None = None, ddof:int = 1) -> np.ndarray:
+    """
+    (windows x positions) rolling variances of x on [start, stop), NaN where the window is not full.
+    Computed on the warm-up + range only, with the add / remove recursion of pandas (no cancellation)
+    """
+    x = np.asarray(x)
+    windows = _as_windows(windows)
+    start, stop = _bounds(len(x), start, stop)
+    out = np.full((len(windows), max(0, stop - start)), np.nan)
+    if stop <= start:
+        return out
+    lo, seg = _segment(x, windows, start, stop)
+    s = pd.Series(seg)
+    for i, w in enumerate(windows):
+        out[i] = s.iloc[max(0, start - lo - int(w) + 1):].rolling(int(w)).var(ddof=ddof).to_numpy()[-(stop - start):]
+    return out
+
+def rolling_std(x, windows, start:int = 0, stop:int | None = None, ddof:int = 1) -> np.ndarray:
+    """(windows x positions) rolling standard deviations of x on [start, stop)"""
+    return np.sqrt(rolling_var(x, windows, start, stop, ddof))
+
+def rolling_moments(x, windows, start:int = 0, stop:int | None = None, ddof:int = 1) -> tuple:
+    """Returns (mean, var) as (windows x positions) matrices"""
+    return rolling_mean(x, windows, start, stop), rolling_var(x, windows, start, stop, ddof)
+
+def _sliding_extreme(x:np.ndarray, window:int, ufunc, fill:float) -> np.ndarray:
+    """Extreme of every full window of x (len(x) - window + 1 values), in O(n) whatever the window"""
+    n = len(x)
+    n_blocks = -(-n // window)
+    padded = np.full(n_blocks * window, fill)
+    padded[:n] = x
+    blocks = padded.reshape(n_blocks, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    t = np.arange(window - 1, n)
+    return ufunc(suffix[t - window + 1], prefix[t])
+
+def rolling_extreme(x, windows, start:int = 0, stop:int | None = None, kind:str = 'max') -> np.ndarray:
+    """(windows x positions) rolling max (kind='max') or min (kind='min') of x on [start, stop)"""
+    x = np.asarray(x)
+    windows = _as_windows(windows)
+    start, stop = _bounds(len(x), start, stop)
+    ufunc, fill = (np.maximum, -np.inf) if kind == 'max' else (np.minimum, np.inf)
+    out = np.full((len(windows), max(0, stop - start)), np.nan)
+    for i, w in enumerate(windows):
+        lo = max(0, start - w + 1)
+        seg = np.asarray(x[lo:stop], dtype='float64')
+        if len(seg) < w:
+            continue
+        values = _sliding_extreme(seg, int(w), ufunc, fill) # values[j] ends at position lo + j + w - 1
+        first = lo + w - 1
+        out[i, max(first, start) - start:] = values[max(0, start - first):]
+    return out
+
+def ewma_warmup(alpha:float, tol:float = 1e-10) -> int:
+    """Number of values before the first one weighs less than tol in the EWMA"""
+    if alpha >= 1:
+        return 0
+    return int(math.ceil(math.log(tol) / math.log(1 - alpha)))
+
+def span_to_alpha(span:float) -> float:
+    return 2 / (span + 1)
+
+def ewma(x, span:float | None = None, alpha:float | None = None, start:int = 0, stop:int | None = None,
+         tol:float = 1e-10) -> np.ndarray:
+    """
+    Exponentially weighted mean of x on [start, stop) (like pandas ewm(adjust=False), seeded ewma_warmup values
+    before start, so the result matches the one on the whole history up to tol)
+    """
+    alpha = alpha if alpha is not None else span_to_alpha(span)
+    x = np.asarray(x)
+    start, stop = _bounds(len(x), start, stop)
+    lo = max(0, start - ewma_warmup(alpha, tol))
+    seg = pd.Series(x[lo:stop], dtype='float64').ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return seg[start - lo:]
+
+def rolling_zscore(x, windows, start:int = 0, stop:int | None = None, ddof:int = 1) -> np.ndarray:
+    """(windows x positions) distance of each value to its rolling mean, in rolling standard deviations"""
+    x = np.asarray(x)
+    mean, var = rolling_moments(x, windows, start, stop, ddof)
+    start, stop = _bounds(len(x), start, stop)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (x[start:stop].astype('float64')[None, :] - mean) / np.sqrt(var)
+
+def rolling(x, stat:str, windows, start:int = 0, stop:int | None = None) -> np.ndarray:
+    """One of STATS, (windows x positions)"""
+    if stat == 'mean':
+        return rolling_mean(x, windows, start, stop)
+    if stat == 'std':
+        return rolling_std(x, windows, start, stop)
+    if stat == 'var':
+        return rolling_var(x, windows, start, stop)
+    if stat in ('min', 'max'):
+        return rolling_extreme(x, windows, start, stop, stat)
+    if stat == 'zscore':
+        return rolling_zscore(x, windows, start, stop)
+    raise ValueError(f"Unknown statistic {stat}, expected one of {STATS}")
+
+
+# -------------------------------------------------------
+# LIVE
+# -------------------------------------------------------
+
+class RollingWindow:
+    """
+    Statistics of the last `window` values, updated in O(1) per appended value.
+    Mean and variance : Welford, adding the new value and removing the one leaving the window
+    (recomputed exactly every RESYNC values so the rounding can't drift on long streams).
+    Min and max : monotonic deques of (position, value).
+    """
+    RESYNC = 1 << 16
+    __slots__ = ('window', 'ddof', '_values', '_n', '_mean', '_m2', '_min', '_max', '_count')
+
+    def __init__(self, window:int, ddof:int = 1):
+        if window < 1:
+            raise ValueError("The window must be >= 1")
+        self.window = window
+        self.ddof = ddof
+        self._values = deque(maxlen=window)
+        self._n = 0        # number of values appended so far
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = deque()
+        self._max = deque()
+        self._count = 0    # appends since the last exact recomputation
+
+    @classmethod
+    def from_values(cls, values, window:int, ddof:int = 1):
+        """A window already fed with the last `window` of values (the warm-up of a live series)"""
+        state = cls(window, ddof)
+        for v in np.asarray(values, dtype='float64')[-window:]:
+            state.append(float(v))
+        return state
+
+    def append(self, x:float):
+        x = float(x)
+        values = self._values
+        if len(values) == self.window:
+            # Slide : x comes in, the oldest value leaves
+            old = values[0]
+            values.append(x)
+            old_mean = self._mean
+            self._mean += (x - old) / self.window
+            self._m2 += (x - old) * (x - self._mean + old - old_mean)
+            if self._m2 < 0:
+                self._m2 = 0.0
+        else:
+            values.append(x)
+            delta = x - self._mean
+            self._mean += delta / len(values)
+            self._m2 += delta * (x - self._mean)
+
+        i = self._n
+        self._n += 1
+        # The deques keep the candidates only : decreasing values for the max, increasing for the min
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((i, x))
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((i, x))
+        oldest = self._n - self.window
+        if self._max[0][0] < oldest:
+            self._max.popleft()
+        if self._min[0][0] < oldest:
+            self._min.popleft()
+
+        self._count += 1
+        if self._count >= self.RESYNC:
+            self._resync()
+
+    def extend(self, values):
+        for v in values:
+            self.append(v)
+
+    def _resync(self):
+        a = np.fromiter(self._values, dtype='float64', count=len(self._values))
+        self._mean = float(a.mean())
+        self._m2 = float(((a - self._mean) ** 2).sum())
+        self._count = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self._values) == self.window
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.full else np.nan
+
+    @property
+    def var(self) -> float:
+        return self._m2 / (self.window - self.ddof) if self.full and self.window > self.ddof else np.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var) if self.full and self.window > self.ddof else np.nan
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self.full else np.nan
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self.full else np.nan
+
+    def zscore(self, x:float | None = None) -> float:
+        """Distance of x (default the last value) to the window mean, in standard deviations"""
+        x = self._values[-1] if x is None else x
+        std = self.std
+        return (x - self.mean) / std if std and not math.isnan(std) else np.nan
+
+
+class EWMA:
+    """Exponentially weighted mean and variance, O(1) per value (same recursion as pandas ewm(adjust=False))"""
+    __slots__ = ('alpha', 'mean', 'var', '_started')
+
+    def __init__(self, span:float | None = None, alpha:float | None = None):
+        self.alpha = alpha if alpha is not None else span_to_alpha(span)
+        self.mean = np.nan
+        self.var = 0.0
+        self._started = False
+
+    def append(self, x:float):
+        x = float(x)
+        if not self._started:
+            self.mean, self._started = x, True
+            return
+        delta = x - self.mean
+        self.mean += self.alpha * delta
+        self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+
+    def extend(self, values):
+        for v in values:
+            self.append(v)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+
+class RollingStats:
+    """
+    Several live windows (and EWMA spans) on the same stream : one append updates all of them.
+    snapshot() returns {('mean', 20): value, ('ewma', 12): value...}
+    """
+
+    def __init__(self, windows=(), spans=(), ddof:int = 1):
+        self.windows = {int(w): RollingWindow(int(w), ddof) for w in windows}
+        self.spans = {s: EWMA(span=s) for s in spans}
+
+    @classmethod
+    def from_values(cls, values, windows=(), spans=(), ddof:int = 1, tol:float = 1e-10):
+        """Live stats already warmed up on the end of values (window - 1 values, or the EWMA warm-up)"""
+        stats = cls((), (), ddof)
+        values = np.asarray(values, dtype='float64')
+        stats.windows = {int(w): RollingWindow.from_values(values, int(w), ddof) for w in windows}
+        for s in spans:
+            ewm = EWMA(span=s)
+            ewm.extend(values[-(ewma_warmup(ewm.alpha, tol) + 1):])
+            stats.spans[s] = ewm
+        return stats
+
+    def append(self, x:float):
+        for state in self.windows.values():
+            state.append(x)
+        for state in self.spans.values():
+            state.append(x)
+
+    def extend(self, values):
+        for v in values:
+            self.append(v)
+
+    def snapshot(self) -> dict:
+        res = {}
+        for w, state in self.windows.items():
+            res.update({('mean', w): state.mean, ('std', w): state.std, ('min', w): state.min,
+                        ('max', w): state.max, ('zscore', w): state.zscore()})
+        for s, state in self.spans.items():
+            res[('ewma', s)] = state.mean
+        return res
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from load_data.price_store import PriceStore, get_default_store
+from classes.metrics import infer_periods_per_year
+
+"""
+Universe screener : risk metrics of hundreds of tickers in one NumPy pass.
+The prices come from the local store as one wide matrix (dates x tickers), no Asset / Strategy objects are built.
+
+The tickers don't all have the same history (IPOs, crypto trading on week-ends...), so the matrix has holes.
+Every return is computed between two valid prices of the same column, and every metric is masked :
+a column only uses its own observations. The returns are sorted once per column, the sorted matrix
+gives the VaR, the ES and the Hill estimator together.
+The annualization too : periods per year are inferred per column from its own dates (365 for crypto, intraday...).
+"""
+
+COLUMNS = ['Last Price', 'Annualized Return', 'Annualized Volatility', 'Sharpe Ratio', 'Sortino Ratio',
+           'Max Drawdown', 'VaR', 'ES', 'Hill Ksi', 'Momentum 12-1', 'Momentum Score', 'Observations']
+
+
+def matrix_returns(prices:np.ndarray) -> np.ndarray:
+    """
+    Takes a (dates x tickers) price matrix with NaN holes
+    Returns the simple returns (dates - 1 x tickers), each one from the previous valid price of its column
+    """
+    valid = ~np.isnan(prices)
+    # Row of the last valid price, carried forward (forward fill without pandas)
+    rows = np.where(valid, np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = np.take_along_axis(prices, rows, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid[1:], prices[1:] / filled[:-1] - 1, np.nan)
+
+
+def _sorted_quantile(sorted_returns:np.ndarray, n:np.ndarray, q:float) -> np.ndarray:
+    """Quantile of each column of an ascending sorted matrix (NaN last), linear interpolation like np.percentile"""
+    position = np.maximum(n - 1, 0) * q
+    lo = np.floor(position).astype(int)
+    hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+    cols = np.arange(sorted_returns.shape[1])
+    low, high = sorted_returns[lo, cols], sorted_returns[hi, cols]
+    return np.where(n > 0, low + (position - lo) * (high - low), np.nan)
+
+
+def _hill(sorted_returns:np.ndarray, fraction:float) -> np.ndarray:
+    """
+    Hill estimator of each column, on the k = fraction * (number of losses) biggest losses
+    (same estimator as Asset.get_hill_estimator, for a single k)
+    """
+    n_losses = (sorted_returns < 0).sum(axis=0)
+    k = (fraction * n_losses).astype(int)
+    max_k = int(k.max()) if len(k) else 0
+    if max_k < 2:
+        return np.full(sorted_returns.shape[1], np.nan)
+
+    # The biggest losses are the first rows of the ascending sort
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_losses = np.log(-sorted_returns[:max_k])
+    cols = np.arange(sorted_returns.shape[1])
+    idx = np.maximum(k - 1, 0)
+    cumsum = np.cumsum(np.where(np.arange(max_k)[:, None] < k, log_losses, 0.0), axis=0)
+    # ksi(k) = mean(log x_1..x_k) - log x_k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ksi = cumsum[idx, cols] / k - log_losses[idx, cols]
+    return np.where(k >= 2, ksi, np.nan)
+
+
+def column_periods_per_year(prices:pd.DataFrame) -> np.ndarray:
+    """Number of bars in a year of each column, inferred from the dates where it has a price"""
+    valid = prices.notna().to_numpy()
+    index = pd.DatetimeIndex(prices.index)
+    index = index.tz_localize(None) if index.tz is not None else index # local dates, converted once
+    known = {} # columns with the same dates (most of them) are inferred once
+    res = np.empty(valid.shape[1])
+    for j in range(valid.shape[1]):
+        key = np.packbits(valid[:, j]).tobytes()
+        if key not in known:
+            known[key] = infer_periods_per_year(index[valid[:, j]])
+        res[j] = known[key]
+    return res
+
+
+def screen(prices:pd.DataFrame, risk_free_rate:float = 0.02, confidence_level:float = 0.95,
+           periods_per_year=None, hill_fraction:float = 0.1, momentum_months:int = 12,
+           skip_months:int = 1) -> pd.DataFrame:
+    """
+    Takes a (dates x tickers) price matrix
+    Returns one row of metrics per ticker (same conventions as the strategies metrics : VaR / ES are returns,
+    drawdown is negative). Momentum 12-1 is the return from 12 months ago to 1 month ago,
+    the Momentum Score is this return divided by the annualized volatility.
+    periods_per_year : one value, one per ticker, or None to infer it for each ticker from its dates
+    """
+    if prices.empty:
+        return pd.DataFrame(columns=COLUMNS, dtype='float64')
+    if periods_per_year is None:
+        periods_per_year = column_periods_per_year(prices)
+    periods_per_year = np.broadcast_to(np.asarray(periods_per_year, dtype=np.float64), (prices.shape[1],))
+    P = prices.to_numpy(dtype=np.float64)
+    R = matrix_returns(P)
+    valid = ~np.isnan(R)
+    n = valid.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Moments
+        mean = np.where(valid, R, 0).sum(axis=0) / n
+        dev = np.where(valid, R - mean, 0)
+        vol = np.sqrt((dev ** 2).sum(axis=0) / (n - 1)) * np.sqrt(periods_per_year)
+
+        neg = valid & (R < 0)
+        n_neg = neg.sum(axis=0)
+        neg_mean = np.where(neg, R, 0).sum(axis=0) / n_neg
+        neg_var = np.where(neg, (R - neg_mean) ** 2, 0).sum(axis=0) / (n_neg - 1)
+        down_vol = np.where(n_neg > 1, np.sqrt(neg_var), np.nan) * np.sqrt(periods_per_year)
+
+        excess_return = mean * periods_per_year - risk_free_rate
+        sharpe = np.where(vol == 0, 0.0, excess_return / vol)
+        sortino = np.where(down_vol == 0, 0.0, excess_return / down_vol)
+
+        # Drawdown on the prices (the NaN holes are skipped by fmax)
+        cummax = np.fmax.accumulate(P, axis=0)
+        max_drawdown = np.nanmin(np.where(np.isnan(P), np.nan, P / cummax - 1), axis=0)
+
+        # Tail : one sort (NaN go last) for VaR, ES and Hill
+        S = np.sort(R, axis=0)
+        VaR = _sorted_quantile(S, n, 1 - confidence_level)
+        tail = S <= VaR
+        ES = np.where(tail, S, 0).sum(axis=0) / tail.sum(axis=0)
+        ksi = _hill(S, hill_fraction)
+
+        # Momentum, on the last price known at each date
+        filled = prices.ffill()
+        end = prices.index[-1]
+        recent = filled.asof(end - pd.DateOffset(months=skip_months)).to_numpy(dtype=np.float64)
+        past = filled.asof(end - pd.DateOffset(months=momentum_months)).to_numpy(dtype=np.float64)
+        # No momentum when the history doesn't go back far enough
+        cutoff = prices.index.searchsorted(end - pd.DateOffset(months=momentum_months), side='right')
+        long_enough = ~np.isnan(P[:cutoff]).all(axis=0)
+        momentum = np.where(long_enough, recent / past - 1, np.nan)
+        score = momentum / vol
+
+    table = pd.DataFrame({
+        'Last Price': filled.iloc[-1].to_numpy(dtype=np.float64),
+        'Annualized Return': mean * periods_per_year,
+        'Annualized Volatility': vol,
+        'Sharpe Ratio': sharpe,
+        'Sortino Ratio': sortino,
+        'Max Drawdown': max_drawdown,
+        'VaR': VaR,
+        'ES': ES,
+        'Hill Ksi': ksi,
+        'Momentum 12-1': momentum,
+        'Momentum Score': score,
+        'Observations': n,
+    }, index=prices.columns)
+    table.index.name = 'Ticker'
+    return table
+
+
+def screen_universe(tickers:list | None = None, start_date=None, end_date=None, store:PriceStore | None = None,
+                    min_observations:int = 20, **kwargs) -> pd.DataFrame:
+    """
+    Loads the prices of the universe from the store cache (None = every cached ticker) and screens them.
+    The tickers with less than min_observations returns are dropped. kwargs go to screen()
+    (the periods per year are inferred per ticker unless given)
+    """
+    store = store if store is not None else get_default_store()
+    prices = store.load_matrix(tickers, 'Close', start_date, end_date)
+    table = screen(prices, **kwargs)
+    return table[table['Observations'] >= min_observations]
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from classes.kernel import FeeModel, SlippageModel, run_kernel
+from classes.metrics import compute_metrics
+from classes.Momentum import momentum_signals
+
+"""
+Walk-forward backtest of the Momentum strategy.
+The history is split into folds : the window is chosen on the train part (best Sharpe among the candidates)
+and only evaluated on the test part that follows, so every reported metric is out of sample.
+
+The folds are independent, so they can run in a process pool. The prices are put once in shared memory,
+each worker maps them (no copy, no pickling of the array per task) and only receives the indices of its fold.
+Nothing is random : the result doesn't depend on the number of processes.
+"""
+
+def walk_forward_folds(n:int, train:int, test:int, step:int | None = None, anchored:bool = False) -> list:
+    """
+    Takes the number of dates and the train / test sizes (in dates)
+    Returns [(train_start, train_end, test_end), ...] (ends excluded, the test starts at train_end).
+    anchored = True : every train part starts at 0 (expanding window)
+    """
+    step = step or test
+    folds = []
+    train_end = train
+    while train_end < n:
+        test_end = min(train_end + test, n)
+        folds.append((0 if anchored else train_end - train, train_end, test_end))
+        train_end += step
+    return folds
+
+
+def evaluate_fold(prices:np.ndarray, fold:tuple, windows:np.ndarray, capital:float = 1000,
+                  fee:FeeModel | None = None, slippage:SlippageModel | None = None,
+                  risk_free_rate:float = 0.02, periods_per_year:float = 252) -> dict:
+    """
+    Chooses the best window on the train part and tests it on the next dates
+    Returns the fold results and the out-of-sample equity
+    """
+    a, b, c = fold
+    # Every window of the train part at once (same positions and kernel as Momentum.sweep)
+    lo = max(0, a - windows.max() + 1)
+    t = np.arange(a, b) - lo
+    p = prices[lo:b]
+    positions = np.zeros((len(windows), len(t)))
+    positions[:, 1:] = momentum_signals(p, t, windows)[:, :-1]
+    returns = np.zeros(len(t))
+    returns[1:] = p[t[1:]] / p[t[:-1]] - 1
+    train = compute_metrics(run_kernel(returns, positions, capital, fee, slippage).equity, risk_free_rate,
+                            periods_per_year=periods_per_year)
+    sharpe = np.nan_to_num(train.sharpe, nan=-np.inf)
+    best = int(np.argmax(sharpe)) # first best : the smallest window on ties
+
+    # Test : the position of the first test date comes from the signal of the last train date
+    lo = max(0, b - 1 - windows[best] + 1)
+    t = np.arange(b - 1, c) - lo
+    p = prices[lo:c]
+    signal = momentum_signals(p, t, windows[best:best + 1])[0]
+    test_returns = p[t[1:]] / p[t[:-1]] - 1
+    equity = run_kernel(test_returns, signal[:-1], capital, fee, slippage).equity
+    test = compute_metrics(np.concatenate([[capital], equity]), risk_free_rate, periods_per_year=periods_per_year)
+
+    return {
+        'window': int(windows[best]),
+        'train_sharpe': float(train.sharpe[best]),
+        'test_pnl_pct': float(test.pnl_pct),
+        'test_sharpe': float(test.sharpe),
+        'test_volatility': float(test.annualized_volatility),
+        'test_max_drawdown': float(test.max_drawdown),
+        'buy_hold_pct': float(prices[c - 1] / prices[b - 1] - 1),
+        'equity': equity / capital, # growth of 1 over the test dates
+    }
+
+
+# -------------------------------------------------------
+# PROCESS POOL (top level functions, so they can be pickled)
+# -------------------------------------------------------
+
+_shared = {}
+
+def _attach(name:str, shape:tuple):
+    # The workers share the resource tracker of the parent, which owns the block and unlinks it
+    shm = shared_memory.SharedMemory(name=name)
+    _shared['shm'] = shm
+    _shared['prices'] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+def _fold_task(args) -> dict:
+    fold, windows, capital, fee, slippage, risk_free_rate, periods_per_year = args
+    return evaluate_fold(_shared['prices'], fold, windows, capital, fee, slippage, risk_free_rate, periods_per_year)
+
+
+class WalkForward:
+    """
+    Walk-forward runner on an Asset (train / test sizes in trading days)
+    """
+
+    def __init__(self, asset, train:int = 756, test:int = 126, step:int | None = None, anchored:bool = False,
+                 windows=range(5, 201, 5), capital:float = 1000, fee:FeeModel | None = None,
+                 slippage:SlippageModel | None = None, risk_free_rate:float = 0.02):
+        self.asset = asset
+        self.train = train
+        self.test = test
+        self.step = step
+        self.anchored = anchored
+        self.windows = np.asarray(list(windows), dtype=int)
+        self.capital = capital
+        self.fee = fee
+        self.slippage = slippage
+        self.risk_free_rate = risk_free_rate
+
+    def run(self, n_jobs:int = 1) -> tuple:
+        """
+        Returns (one row per fold DataFrame, out-of-sample equity Series stitched over the test parts)
+        """
+        prices = np.ascontiguousarray(self.asset.prices['Price'].to_numpy(dtype=np.float64))
+        dates = self.asset.prices.index
+        folds = walk_forward_folds(len(prices), self.train, self.test, self.step, self.anchored)
+        if not folds:
+            return pd.DataFrame(), pd.Series(dtype='float64')
+        params = (self.windows, self.capital, self.fee, self.slippage, self.risk_free_rate, self.asset.periods_per_year)
+
+        if n_jobs > 1 and len(folds) > 1:
+            shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+            try:
+                np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach, initargs=(shm.name, prices.shape)) as pool:
+                    results = list(pool.map(_fold_task, [(fold, *params) for fold in folds]))
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            results = [evaluate_fold(prices, fold, *params) for fold in folds]
+
+        rows, curves = [], []
+        for (a, b, c), res in zip(folds, results):
+            growth = res.pop('equity')
+            rows.append({
+                'Train Start': dates[a], 'Test Start': dates[b], 'Test End': dates[c - 1],
+                'Window': res['window'],
+                'Train Sharpe': res['train_sharpe'],
+                'Test PnL (%)': res['test_pnl_pct'],
+                'Test Sharpe': res['test_sharpe'],
+                'Test Volatility': res['test_volatility'],
+                'Test Max Drawdown': res['test_max_drawdown'],
+                'Buy and Hold (%)': res['buy_hold_pct'],
+            })
+            # With step < test the test parts overlap : only the dates not covered yet are kept
+            curves.append(pd.Series(growth, index=dates[b:c]))
+
+        equity, level = [], self.capital
+        covered = None
+        for curve in curves:
+            if covered is not None:
+                before = curve[curve.index <= covered]
+                curve = curve[curve.index > covered]
+                if curve.empty:
+                    continue
+                if not before.empty:
+                    curve = curve / before.iloc[-1] # growth since the last date already covered
+            equity.append(curve * level)
+            level = float(equity[-1].iloc[-1])
+            covered = curve.index[-1]
+
+        return pd.DataFrame(rows), pd.concat(equity).rename("Walk-forward equity")
@@ -1,38 +1,45 @@
 import requests
 from bs4 import BeautifulSoup
-import pandas as pd
-from datetime import datetime 
-import time
+from datetime import datetime
+import asyncio
 import os
+import sys
 
-def scrape_news():
-    # Scraping
-    url = "https://finviz.com/news.ashx?v=3"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'} # To bypass the Just a moment, cookies window
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # Parsing
-    links = []
-    titles = []
-    tickers = []
-    data = []
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')) # so it can be launched as a script
+from load_data.news_store import NewsStore
+from classes.instrumentation import timed, record
 
-    scan_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+NEWS_URLS = ["https://finviz.com/news.ashx?v=3"]
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'} # To bypass the Just a moment, cookies window
+
+_store = None
+
+def get_store() -> NewsStore:
+    """Shared news store (created on first use)"""
+    global _store
+    if _store is None:
+        _store = NewsStore()
+    return _store
+
+@timed()
+def parse_news(html:str, scan_time:str) -> list[dict]:
+    """
+    Takes the HTML of the Finviz news page (works on saved pages too)
+    Returns the list of news {date, tickers, title, link}
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    data = []
 
     for e in soup.find_all('tr', class_='news_table-row'):
 
-        # Links
+        # Links and titles
         subsoup_links = e.find('a', class_='nn-tab-link')
+        if subsoup_links is None:
+            continue
         link = subsoup_links.get('href')
         if (link[0] == '/'): # Sometimes the links begin with '/' bc the news website is finviz
             link = f"https://finviz.com{link}"
-        links.append(link)
-
-        # Titles
-        subsoup_titles = e.find('a', class_='nn-tab-link')
-        title = subsoup_titles.get_text()
-        titles.append(title)
+        title = subsoup_links.get_text()
 
         # Tickers
         subsoup_tickers = e.find_all('a', class_='stock-news-label')
@@ -41,7 +48,6 @@ def scrape_news():
             ticker_text = ticker_class.get('href')
             ticker = ticker_text.split('=')[1]
             tickers_list.append(ticker)
-        tickers.append(tickers_list)
 
         row = {
                 'date': scan_time,
@@ -50,35 +56,90 @@ def scrape_news():
                 'link': link
             }
         data.append(row)
-    
-    # Put data to csv
-    df = pd.DataFrame(data)
-    filepath = 'src/data/news_data.csv'
-    header_mode = not os.path.exists(filepath) # So we make only one header
-    df.to_csv(filepath, mode='a', index=False, header=header_mode)
+    return data
+
+@timed()
+def fetch_page(url:str, etag:str | None = None, last_modified:str | None = None):
+    """
+    Conditional GET : if the page didn't change since the last response, the server answers 304 without the body.
+    Returns (status, html, etag, last_modified)
+    """
+    headers = dict(HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = requests.get(url, headers=headers, timeout=15)
+    record("news.download", nbytes=len(response.content), hit=response.status_code == 304)
+    return response.status_code, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified')
 
+@timed()
+async def scrape_news_async(store:NewsStore | None = None, urls:list[str] = NEWS_URLS, fetcher=fetch_page) -> int:
+    """
+    Scrapes every url at the same time and stores the news not seen yet.
+    fetcher can be replaced (ex : a function reading saved HTML fixtures).
+    Returns the number of new news
+    """
+    store = store or get_store()
+    scan_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    async def scrape(url):
+        etag, last_modified = store.get_validators(url)
+        # requests is blocking, so each request runs in a thread
+        status, html, new_etag, new_last_modified = await asyncio.to_thread(fetcher, url, etag, last_modified)
+        if status == 304:
+            return []
+        if status != 200:
+            print(f"Error while scraping {url} : HTTP {status}")
+            return []
+        store.set_validators(url, new_etag, new_last_modified)
+        return parse_news(html, scan_time)
+
+    results = await asyncio.gather(*(scrape(url) for url in urls), return_exceptions=True)
+
+    rows = []
+    for url, res in zip(urls, results):
+        if isinstance(res, Exception):
+            print(f"Error while scraping {url} : {res}")
+        else:
+            rows.extend(res)
+    # Unique link in the store : the headlines already seen are ignored
+    return store.insert(rows)
+
+def scrape_news() -> int:
+    """
+    Synchronous version of scrape_news_async
+    """
+    return asyncio.run(scrape_news_async())
+
+@timed()
 def get_latest_news(n=5):
     """
     Returns the news scraped on Finviz
     """
-    file_path = 'src/data/news_data.csv'
+    return get_store().latest(n)
 
-    if not os.path.exists(file_path):
-        return pd.DataFrame() 
-    else:
-        df = pd.read_csv(file_path)
-        df = df.iloc[::-1] # get the latest news first
-        return df.head(n)
+async def run_forever(interval:float = 3600):
+    """
+    Scrapes every `interval` seconds. The next run is planned from the previous planned time, so it doesn't drift.
+    """
+    loop = asyncio.get_running_loop()
+    next_run = loop.time()
+    while True:
+        try:
+            new_count = await scrape_news_async()
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} : {new_count} new news")
+        except Exception as e:
+            print(f"Error while scraping : {e}")
+        next_run += interval
+        await asyncio.sleep(max(0.0, next_run - loop.time()))
 
 # In order to launch it on cmd, will use KeyboardInterrupt to stop it
 # python src/load_data/news_scraper.py
 if __name__ == "__main__":
     print("Scraper launched, Ctrl+C to stop")
     try:
-        while True:
-            scrape_news()
-            print(f"Next time at : {datetime.now().hour + 1}h)")
-            time.sleep(3600)
+        asyncio.run(run_forever())
 
     except KeyboardInterrupt:
-        print("Scraper stopped (KeyboardInterrupt)")
\ No newline at end of file
+        print("Scraper stopped (KeyboardInterrupt)")
@@ -0,0 +1,111 @@
+import os
+import ast
+import json
+import sqlite3
+from contextlib import contextmanager
+import pandas as pd
+
+"""
+SQLite store of the scraped news.
+The link is unique, so scraping the same headlines again does nothing, and the latest news
+are read through the index on date instead of loading the whole history.
+"""
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'news.db')
+LEGACY_CSV_PATH = os.path.join(DATA_DIR, 'news_data.csv') # old append-only file, imported once
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    tickers TEXT NOT NULL,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS idx_news_date ON news (date DESC, id DESC);
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT
+);
+"""
+
+
+class NewsStore:
+    """
+    Indexed store of the news (one row per link)
+    """
+
+    def __init__(self, path:str = DEFAULT_DB_PATH, legacy_csv:str | None = LEGACY_CSV_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as con:
+            con.executescript(SCHEMA)
+        if legacy_csv and os.path.exists(legacy_csv) and self.count() == 0:
+            self.import_csv(legacy_csv)
+
+    @contextmanager
+    def _connect(self):
+        # A new connection per call : Streamlit threads and the scraper can use the store at the same time
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            con.execute("PRAGMA journal_mode=WAL") # readers don't wait for the writer
+            with con: # commit (or rollback) at the end
+                yield con
+        finally:
+            con.close()
+
+    def insert(self, rows:list[dict]) -> int:
+        """
+        Takes rows {date, tickers, title, link}
+        Returns the number of new news (the links already stored are skipped)
+        """
+        values = [(r['date'], json.dumps(list(r['tickers'])), r['title'], r['link']) for r in rows]
+        with self._connect() as con:
+            before = con.total_changes
+            con.executemany("INSERT OR IGNORE INTO news (date, tickers, title, link) VALUES (?, ?, ?, ?)", values)
+            return con.total_changes - before
+
+    def latest(self, n:int = 5) -> pd.DataFrame:
+        """
+        Returns the n latest news (top-N read on the date index)
+        """
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT date, tickers, title, link FROM news ORDER BY date DESC, id DESC LIMIT ?", (n,)
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=['date', 'tickers', 'title', 'link'])
+        df['tickers'] = df['tickers'].map(json.loads)
+        return df
+
+    def count(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+
+    def import_csv(self, path:str) -> int:
+        """
+        Imports the old news_data.csv (duplicates are dropped by the unique link)
+        """
+        df = pd.read_csv(path)
+        rows = []
+        for _, r in df.iterrows():
+            try:
+                tickers = ast.literal_eval(r['tickers']) if isinstance(r['tickers'], str) else []
+            except (ValueError, SyntaxError):
+                tickers = []
+            rows.append({'date': r['date'], 'tickers': tickers, 'title': r['title'], 'link': r['link']})
+        return self.insert(rows)
+
+    # Conditional requests : we keep the validators of the last response of each url
+
+    def get_validators(self, url:str) -> tuple:
+        """Returns (etag, last_modified) of the last response for this url"""
+        with self._connect() as con:
+            row = con.execute("SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)).fetchone()
+        return row if row else (None, None)
+
+    def set_validators(self, url:str, etag:str | None, last_modified:str | None):
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO http_cache (url, etag, last_modified) VALUES (?, ?, ?)",
+                        (url, etag, last_modified))
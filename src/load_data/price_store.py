@@ -0,0 +1,406 @@
+import os
+import json
+import tempfile
+import threading
+import contextlib
+import time
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from classes.instrumentation import span
+try:
+    import fcntl
+except ImportError: # Windows : only the threads of one process are serialized
+    fcntl = None
+
+"""
+Local OHLCV store, so that we stop downloading the whole history on every Streamlit rerun.
+
+Layout on disk (one partition per ticker, and one sub-partition per intraday interval) :
+    src/data/prices/ticker=SPY/data.parquet              -> the daily bars
+    src/data/prices/ticker=SPY/meta.json                 -> the date range already covered by the provider
+    src/data/prices/ticker=SPY/interval=5m/data.parquet  -> the 5 minute bars (float32, see below)
+    src/data/prices/ticker=SPY/interval=5m/meta.json
+
+The covered range is not the same thing as the first/last bar (week-ends, holidays...),
+so we keep it on the side. That way we only ask the provider for what's really missing.
+
+Several processes write the store (the app, the refresh daemon, the report pool) : a partition is refreshed under
+a lock file (src/data/prices/.locks/) on top of the thread lock, and the files are written to unique temp names
+before being renamed, so a reader or another writer never sees a half written file.
+
+Only the base intervals are stored : coarser bars (15m, 1h...) are derived from them by Asset.bars().
+Intraday histories are long, so their prices and volumes are kept as float32 (7 significant digits,
+far below the tick size of a price, and returns are still computed in float64).
+"""
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'prices')
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+DAILY = '1d'
+# Intraday intervals and how far back Yahoo serves them (days)
+INTRADAY_LOOKBACK = {'1m': 7, '2m': 59, '5m': 59, '15m': 59, '30m': 59, '1h': 729}
+INTERVALS = list(INTRADAY_LOOKBACK) + [DAILY]
+
+
+# -------------------------------------------------------
+# PROVIDERS
+# -------------------------------------------------------
+
+class PriceProvider:
+    """
+    Interface of a price source. A provider only has to return an OHLCV DataFrame indexed by date,
+    for start <= date < end. start=None means "from the first available bar".
+    interval is one of INTERVALS ('1d' by default)
+    """
+    def fetch(self, ticker:str, start=None, end=None, interval:str = DAILY) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """
+    Default provider, based on yfinance
+    """
+    def __init__(self, timeout:float=10):
+        self.timeout = timeout
+
+    def fetch(self, ticker:str, start=None, end=None, interval:str = DAILY) -> pd.DataFrame:
+        import yfinance as yf # Imported here so the store can run without yfinance (fixtures)
+
+        yf_ticker = yf.Ticker(ticker)
+        if interval != DAILY:
+            # Yahoo refuses intraday bars older than its lookback
+            oldest = datetime.date.today() - datetime.timedelta(days=INTRADAY_LOOKBACK[interval])
+            start = oldest if start is None else max(_as_day(start), oldest)
+            if end is not None and _as_day(end) <= start:
+                return pd.DataFrame(columns=OHLCV_COLUMNS)
+            return yf_ticker.history(start=start, end=end, interval=interval, auto_adjust=True, timeout=self.timeout)
+        if start is None and end is None:
+            return yf_ticker.history(period="max", auto_adjust=True, timeout=self.timeout)
+        if start is None:
+            start = "1900-01-01" # yfinance goes back to the first bar anyway
+        return yf_ticker.history(start=start, end=end, auto_adjust=True, timeout=self.timeout)
+
+
+class FixtureProvider(PriceProvider):
+    """
+    Provider working on local data only (no network), for tests and offline runs.
+    Takes either a dict {ticker: DataFrame} or a folder of <ticker>.csv files.
+    Intraday bars are given as {(ticker, interval): DataFrame} or <ticker>_<interval>.csv files.
+    latency (seconds, or {ticker: seconds}) is added to every fetch, to simulate a slow network.
+    """
+    def __init__(self, frames:dict | None = None, folder:str | None = None, latency:float | dict = 0.0):
+        self.frames = dict(frames) if frames else {}
+        self.folder = folder
+        self.latency = latency
+        self.calls = [] # (ticker, start, end) of every fetch, to check what has been asked
+
+    def _load(self, ticker:str, interval:str = DAILY) -> pd.DataFrame:
+        key = ticker if interval == DAILY else (ticker, interval)
+        if key not in self.frames and self.folder:
+            name = ticker if interval == DAILY else f"{ticker}_{interval}"
+            path = os.path.join(self.folder, f"{name}.csv")
+            if os.path.exists(path):
+                self.frames[key] = pd.read_csv(path, index_col=0, parse_dates=True)
+        return self.frames.get(key, pd.DataFrame(columns=OHLCV_COLUMNS))
+
+    def fetch(self, ticker:str, start=None, end=None, interval:str = DAILY) -> pd.DataFrame:
+        self.calls.append((ticker, start, end) if interval == DAILY else (ticker, start, end, interval))
+        delay = self.latency.get(ticker, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay:
+            time.sleep(delay)
+        df = self._load(ticker, interval)
+        if df.empty:
+            return df.copy()
+        if start is not None:
+            df = df[df.index >= _as_timestamp(start, df.index.tz)]
+        if end is not None:
+            df = df[df.index < _as_timestamp(end, df.index.tz)]
+        return df.copy()
+
+
+# -------------------------------------------------------
+# HELPERS
+# -------------------------------------------------------
+
+def _as_timestamp(date, tz=None) -> pd.Timestamp:
+    """Converts a date (str, date, Timestamp) to a Timestamp in the timezone of the index"""
+    ts = pd.Timestamp(date)
+    if tz is not None:
+        ts = ts.tz_localize(tz) if ts.tzinfo is None else ts.tz_convert(tz)
+    elif ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts
+
+def _compact(bars:pd.DataFrame) -> pd.DataFrame:
+    """float32 copy of the numeric columns (intraday bars)"""
+    numeric = bars.select_dtypes('number').columns
+    return bars.astype({c: 'float32' for c in numeric})
+
+def _as_day(date) -> datetime.date | None:
+    """Normalizes any date input to a datetime.date (None stays None)"""
+    if date is None:
+        return None
+    return pd.Timestamp(date).date()
+
+
+# -------------------------------------------------------
+# STORE
+# -------------------------------------------------------
+
+class PriceStore:
+    """
+    Parquet cache sitting between Asset and the provider.
+    """
+
+    def __init__(self, path:str = DEFAULT_STORE_PATH, provider:PriceProvider | None = None, max_age:float = 300,
+                 warm_only:bool = False, stale_after:float = 6 * 3600):
+        self.path = path
+        self.provider = provider if provider is not None else YahooProvider()
+        self.max_age = max_age # seconds before asking again for the latest bars
+        # warm_only : the refresh daemon keeps the cache up to date, a cached partition is read as is and only
+        # refreshed here when the daemon didn't touch it for stale_after seconds (daemon down, ticker not watched).
+        # A ticker never cached is still downloaded.
+        self.warm_only = warm_only
+        self.stale_after = stale_after
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, ticker:str, interval:str = DAILY) -> threading.Lock:
+        # One lock per partition, so different tickers can be loaded in parallel
+        with self._locks_guard:
+            return self._locks.setdefault((ticker, interval), threading.Lock())
+
+    @contextlib.contextmanager
+    def _partition_lock(self, ticker:str, interval:str = DAILY):
+        """
+        Holds a partition for a read-merge-write : the thread lock of this process, then an exclusive flock
+        on the lock file of the partition, so other processes wait instead of writing over the merged bars
+        """
+        with self._lock(ticker, interval):
+            if fcntl is None:
+                yield
+                return
+            folder = os.path.join(self.path, '.locks')
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, f"{ticker}_{interval}.lock"), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _partition(self, ticker:str, interval:str = DAILY) -> str:
+        folder = os.path.join(self.path, f"ticker={ticker}")
+        return folder if interval == DAILY else os.path.join(folder, f"interval={interval}")
+
+    def _read(self, ticker:str, interval:str = DAILY):
+        """Returns (bars, meta) of a partition, (None, None) if nothing is cached"""
+        folder = self._partition(ticker, interval)
+        data_path = os.path.join(folder, 'data.parquet')
+        meta_path = os.path.join(folder, 'meta.json')
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            return pd.read_parquet(data_path), meta
+        except Exception as e:
+            # A broken partition is just a cache miss
+            print(f"Error while reading the cache of {ticker} : {e}")
+            return None, None
+
+    @staticmethod
+    def _replace(path:str, write):
+        """Calls write(temp path) on a temp file unique to this writer, next to path, then renames it to path"""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _write(self, ticker:str, bars:pd.DataFrame | None, meta:dict, interval:str = DAILY):
+        """
+        Writes to a temp file then renames, so readers never see a half written file.
+        bars=None only updates the meta. Called under _partition_lock
+        """
+        folder = self._partition(ticker, interval)
+        os.makedirs(folder, exist_ok=True)
+        data_path = os.path.join(folder, 'data.parquet')
+        meta_path = os.path.join(folder, 'meta.json')
+
+        def write_meta(path):
+            with open(path, 'w') as f:
+                json.dump(meta, f)
+
+        if bars is not None:
+            self._replace(data_path, lambda path: bars.to_parquet(path, engine='pyarrow'))
+        self._replace(meta_path, write_meta)
+
+    def _missing_ranges(self, meta:dict | None, start, end) -> list:
+        """
+        Compares the requested range with the covered one.
+        Returns the list of (start, end) to ask the provider (start=None means from inception)
+        """
+        if meta is None:
+            return [(start, end)]
+
+        cov_start = _as_day(meta['start'])
+        cov_end = _as_day(meta['end'])
+        missing = []
+
+        if cov_start is not None and (start is None or start < cov_start):
+            missing.append((start, cov_start))
+        if end > cov_end:
+            # Today's bars are asked again at most every max_age seconds, else every rerun would hit the provider
+            age = datetime.datetime.now().timestamp() - meta.get('fetched_at', 0)
+            if self.warm_only:
+                if age >= self.stale_after:
+                    missing.append((cov_end, end))
+            elif cov_end < datetime.date.today() or age >= self.max_age:
+                missing.append((cov_end, end))
+        return missing
+
+    def get_history(self, ticker:str, start_date=None, end_date=None, interval:str = DAILY) -> pd.DataFrame:
+        """
+        Returns the OHLCV bars of the ticker between start_date (included) and end_date (excluded),
+        reading the cache first and fetching only the missing part from the provider.
+        No dates means the full history. interval is one of INTERVALS, intraday bars are float32.
+        """
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown interval {interval}, expected one of {INTERVALS}")
+        start = _as_day(start_date)
+        today = datetime.date.today()
+        end = _as_day(end_date) if end_date is not None else today + datetime.timedelta(days=1)
+
+        with self._partition_lock(ticker, interval), span("PriceStore.get_history") as timing:
+            bars, meta = self._read(ticker, interval)
+            missing = self._missing_ranges(meta, start, end)
+            timing.hit = not missing
+
+            if missing:
+                new_parts = [self.provider.fetch(ticker, s, e, interval=interval) for s, e in missing]
+                new_parts = [p for p in new_parts if p is not None and not p.empty]
+                timing.nbytes = int(sum(p.memory_usage(index=True).sum() for p in new_parts))
+
+                if new_parts:
+                    parts = ([bars] if bars is not None else []) + new_parts
+                    bars = pd.concat(parts)
+                    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+                    if interval != DAILY:
+                        bars = _compact(bars)
+
+                # The covered range grows, but never up to today : today's bar is not final yet
+                old_start = _as_day(meta['start']) if meta else start
+                old_end = _as_day(meta['end']) if meta else end
+                new_start = None if (start is None or old_start is None) else min(start, old_start)
+                new_end = min(max(end, old_end), today)
+                new_meta = {
+                    'start': None if new_start is None else new_start.isoformat(),
+                    'end': new_end.isoformat(),
+                    'fetched_at': datetime.datetime.now().timestamp()
+                }
+                if bars is not None and not bars.empty:
+                    self._write(ticker, bars if new_parts else None, new_meta, interval)
+
+        if bars is None or bars.empty:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+        res = bars
+        if start is not None:
+            res = res[res.index >= _as_timestamp(start, res.index.tz)]
+        res = res[res.index < _as_timestamp(end, res.index.tz)]
+        return res
+
+    def tickers(self) -> list:
+        """Returns the list of the tickers already cached"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(d.split('=', 1)[1] for d in os.listdir(self.path) if d.startswith('ticker='))
+
+    def _read_column(self, ticker:str, column:str, interval:str = DAILY):
+        """
+        Reads one column of a cached partition (only that column is decoded)
+        Returns (days as datetime64[D], values), None if the ticker is not cached
+        """
+        data_path = os.path.join(self._partition(ticker, interval), 'data.parquet')
+        if not os.path.exists(data_path):
+            return None
+        try:
+            # ParquetFile reads the file directly (pd.read_parquet would scan the folder as a ticker=... dataset)
+            table = pq.ParquetFile(data_path).read(columns=[column], use_pandas_metadata=True)
+            index_name = table.schema.pandas_metadata['index_columns'][0]
+            values = table.column(column).to_numpy().astype('float64')
+            dates = pd.DatetimeIndex(table.column(index_name).to_pandas())
+        except Exception as e:
+            print(f"Error while reading the cache of {ticker} : {e}")
+            return None
+        if not len(values):
+            return None
+        # Daily bars of different markets (timezones, week-ends) are aligned on the calendar day
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        return dates.to_numpy().astype('datetime64[D]'), values
+
+    def load_matrix(self, tickers:list | None = None, column:str = 'Close', start_date=None, end_date=None,
+                    max_workers:int = 8) -> pd.DataFrame:
+        """
+        Returns one wide matrix (dates x tickers) of a column, read from the cache only : nothing is downloaded,
+        the tickers that are not cached are left out. None = every cached ticker.
+        The partitions are read in threads (the parquet reader releases the GIL).
+        """
+        tickers = self.tickers() if tickers is None else list(dict.fromkeys(tickers))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            parts = [(t, p) for t, p in zip(tickers, pool.map(lambda t: self._read_column(t, column), tickers))
+                     if p is not None]
+        if not parts:
+            return pd.DataFrame(dtype='float64')
+
+        # Union of the days, then every column is written at its rows (no pandas alignment, one column at a time)
+        days = np.unique(np.concatenate([d for _, (d, _) in parts]))
+        if start_date is not None:
+            days = days[days >= np.datetime64(_as_day(start_date), 'D')]
+        if end_date is not None:
+            days = days[days < np.datetime64(_as_day(end_date), 'D')]
+        matrix = np.full((len(days), len(parts)), np.nan)
+        for j, (_, (d, values)) in enumerate(parts):
+            rows = np.searchsorted(days, d)
+            inside = (rows < len(days)) & (days[np.minimum(rows, len(days) - 1)] == d) if len(days) else rows < 0
+            matrix[rows[inside], j] = values[inside] # a duplicated day keeps its last bar
+        return pd.DataFrame(matrix, index=pd.DatetimeIndex(days.astype('datetime64[ns]')), columns=[t for t, _ in parts])
+
+    def prefetch(self, tickers:list, max_workers:int = 8) -> dict:
+        """
+        Makes sure the full history of every ticker is in the cache (downloads only what's missing)
+        Returns the failures {ticker: reason}
+        """
+        def load(t):
+            try:
+                return t, None if not self.get_history(t).empty else "No data"
+            except Exception as e:
+                return t, str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return {t: reason for t, reason in pool.map(load, tickers) if reason is not None}
+
+
+# Shared store, used by Asset when no store is given
+_default_store = None
+
+def get_default_store() -> PriceStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = PriceStore()
+    return _default_store
+
+def set_default_store(store:PriceStore):
+    """Replaces the shared store (ex : a store with a FixtureProvider for tests)"""
+    global _default_store
+    _default_store = store
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import datetime
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')) # so it can be launched as a script
+from load_data.price_store import PriceStore, DAILY, INTERVALS
+from load_data.news_store import NewsStore
+from load_data.news_scraper import scrape_news_async
+
+"""
+Background process keeping the local stores warm, so the Streamlit workers only read data already on disk.
+
+Every job (the bars of one ticker at one interval, the news feed) runs on its own fixed schedule :
+the next run is planned from the previous planned time (no drift), plus a random jitter so the jobs don't all
+hit Yahoo at the same second. A failing job is retried with an exponential backoff (jittered too),
+and at most max_concurrency jobs run at the same time.
+
+The daemon writes a status file (src/data/refresh_status.json) after every job and on a heartbeat :
+last refresh, duration, failures and next run of every job. The app reads it to know if the daemon is alive,
+and then stops refreshing the cached tickers itself (PriceStore warm_only).
+
+python src/load_data/refresh_daemon.py --tickers AAPL,MSFT,SPY --intervals 1d,5m
+"""
+
+STATUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'refresh_status.json')
+HEARTBEAT = 30 # seconds between two writes of the status file when nothing runs
+
+
+@dataclass
+class Job:
+    """A refresh on a fixed schedule. run is a coroutine function, it raises when the refresh failed"""
+    name: str
+    run: Callable[[], Awaitable]
+    interval: float             # seconds between two planned runs
+    jitter: float = 0.1         # each run starts up to jitter * interval after its planned time
+    timeout: float = 120        # a run taking longer counts as a failure
+    backoff: float = 30         # first retry delay after a failure, doubled at each new failure
+    max_backoff: float = 3600
+    # State, shown in the status file
+    planned: float = 0.0        # loop time of the next planned run (without jitter)
+    runs: int = 0
+    failures: int = 0           # consecutive failures, 0 after a success
+    last_attempt: str | None = None
+    last_success: str | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+    next_run: str | None = None
+    result: object = field(default=None, repr=False)
+
+    def status(self) -> dict:
+        return {'interval': self.interval, 'runs': self.runs, 'failures': self.failures,
+                'last_attempt': self.last_attempt, 'last_success': self.last_success,
+                'last_duration': self.last_duration, 'last_error': self.last_error,
+                'next_run': self.next_run, 'result': self.result}
+
+
+def _now() -> str:
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# -------------------------------------------------------
+# JOBS
+# -------------------------------------------------------
+
+def price_job(store:PriceStore, ticker:str, interval:str = DAILY, every:float = 300, **kwargs) -> Job:
+    """Refreshes the bars of the ticker in the store (only the missing ones are downloaded)"""
+    async def run():
+        # The store and the provider are blocking, so the refresh runs in a thread
+        bars = await asyncio.to_thread(store.get_history, ticker, None, None, interval)
+        if bars.empty:
+            raise RuntimeError("No data")
+        return str(bars.index[-1])
+    return Job(f"prices:{ticker}:{interval}", run, every, **kwargs)
+
+def news_job(store:NewsStore, every:float = 3600, **kwargs) -> Job:
+    """Scrapes the news feed into the news store"""
+    async def run():
+        return await scrape_news_async(store)
+    return Job("news", run, every, **kwargs)
+
+
+# -------------------------------------------------------
+# SCHEDULER
+# -------------------------------------------------------
+
+class RefreshDaemon:
+    """
+    Runs the jobs forever (or for `duration` seconds), at most max_concurrency at a time
+    """
+
+    def __init__(self, jobs:list[Job], max_concurrency:int = 4, status_path:str | None = STATUS_PATH,
+                 seed:int | None = None):
+        self.jobs = jobs
+        self.max_concurrency = max_concurrency
+        self.status_path = status_path
+        self.started_at = None
+        self.running = False
+        self._rng = random.Random(seed)
+        self._semaphore = None
+
+    def _delay_after_failure(self, job:Job) -> float:
+        # Exponential backoff, with a jitter so the failing jobs don't retry all together
+        delay = min(job.max_backoff, job.backoff * 2 ** (job.failures - 1))
+        return delay * self._rng.uniform(0.5, 1.0)
+
+    async def _run_job(self, job:Job):
+        loop = asyncio.get_running_loop()
+        # The first runs are spread over the jitter window, not all at startup
+        wake = job.planned + self._rng.uniform(0, job.jitter * job.interval)
+        while True:
+            delay = max(0.0, wake - loop.time())
+            job.next_run = (datetime.datetime.now() + datetime.timedelta(seconds=delay)).strftime("%Y-%m-%d %H:%M:%S")
+            await asyncio.sleep(delay)
+
+            async with self._semaphore:
+                job.last_attempt = _now()
+                start = loop.time()
+                try:
+                    # A thread can't be killed : after a timeout it ends in the background, the slot is freed anyway
+                    job.result = await asyncio.wait_for(job.run(), job.timeout)
+                    error = None
+                except Exception as e:
+                    error = f"{type(e).__name__} : {e}" if str(e) else type(e).__name__
+                job.last_duration = round(loop.time() - start, 4)
+            job.runs += 1
+
+            if error is None:
+                job.failures = 0
+                job.last_success = job.last_attempt
+                job.last_error = None
+                # Next planned time from the previous one (no drift), the runs missed while failing are skipped
+                job.planned += job.interval
+                while job.planned <= loop.time():
+                    job.planned += job.interval
+                wake = job.planned + self._rng.uniform(0, job.jitter * job.interval)
+            else:
+                job.failures += 1
+                job.last_error = error
+                print(f"{_now()} : {job.name} failed ({job.failures} in a row) : {error}")
+                wake = loop.time() + self._delay_after_failure(job)
+            self.write_status()
+
+    async def _heartbeat(self):
+        while True:
+            self.write_status()
+            await asyncio.sleep(HEARTBEAT)
+
+    def status(self) -> dict:
+        return {'pid': os.getpid(), 'running': self.running, 'started_at': self.started_at, 'heartbeat': _now(),
+                'heartbeat_every': HEARTBEAT,
+                'max_concurrency': self.max_concurrency, 'jobs': {job.name: job.status() for job in self.jobs}}
+
+    def write_status(self):
+        if self.status_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.status_path)), exist_ok=True)
+            with open(self.status_path + '.tmp', 'w') as f:
+                json.dump(self.status(), f, indent=1, default=str)
+            os.replace(self.status_path + '.tmp', self.status_path)
+        except Exception as e:
+            print(f"Error while writing the status file : {e}")
+
+    async def run(self, duration:float | None = None):
+        loop = asyncio.get_running_loop()
+        self.started_at = _now()
+        self.running = True
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        for job in self.jobs:
+            job.planned = loop.time()
+        tasks = [asyncio.create_task(self._run_job(job)) for job in self.jobs]
+        tasks.append(asyncio.create_task(self._heartbeat()))
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.running = False
+            self.write_status()
+
+
+# -------------------------------------------------------
+# STATUS (read by the app)
+# -------------------------------------------------------
+
+def read_status(path:str = STATUS_PATH) -> dict | None:
+    """Returns the last status written by the daemon, None if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def daemon_alive(status:dict | None, tolerance:float = 3) -> bool:
+    """True if the daemon is running and wrote its status less than tolerance heartbeats ago"""
+    if not status or not status.get('running') or 'heartbeat' not in status:
+        return False
+    heartbeat = datetime.datetime.strptime(status['heartbeat'], "%Y-%m-%d %H:%M:%S")
+    silence = (datetime.datetime.now() - heartbeat).total_seconds()
+    return silence <= tolerance * status.get('heartbeat_every', HEARTBEAT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keeps the price and news stores warm for the app")
+    parser.add_argument('--tickers', default="AAPL,MSFT,GOOGL", help="Comma separated watchlist")
+    parser.add_argument('--config', help="JSON file with a 'tickers' list (the report config works)")
+    parser.add_argument('--intervals', default=DAILY, help=f"Comma separated bar intervals, among {INTERVALS}")
+    parser.add_argument('--price-every', type=float, default=300, help="Seconds between two refreshes of a ticker")
+    parser.add_argument('--news-every', type=float, default=3600, help="Seconds between two scrapes of the news")
+    parser.add_argument('--max-concurrency', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    tickers = args.tickers.split(',')
+    if args.config:
+        with open(args.config) as f:
+            tickers = json.load(f)['tickers']
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    intervals = [i.strip() for i in args.intervals.split(',') if i.strip()]
+
+    # max_age=0 : every run asks the provider for the latest bars
+    store = PriceStore(max_age=0)
+    jobs = [price_job(store, t, i, args.price_every) for t in tickers for i in intervals]
+    jobs.append(news_job(NewsStore(), args.news_every))
+
+    print(f"Refresh daemon launched ({len(jobs)} jobs), Ctrl+C to stop")
+    try:
+        asyncio.run(RefreshDaemon(jobs, args.max_concurrency).run())
+    except KeyboardInterrupt:
+        print("Refresh daemon stopped (KeyboardInterrupt)")
+
+
+# python src/load_data/refresh_daemon.py
+if __name__ == "__main__":
+    main()
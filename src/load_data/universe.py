@@ -0,0 +1,59 @@
+import os
+import json
+import requests
+from bs4 import BeautifulSoup
+
+"""
+Ticker universes for the screener.
+The S&P 500 list is scraped from Wikipedia once, then read from src/data/universe/sp500.json.
+"""
+
+SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'universe')
+
+
+def parse_sp500(html:str) -> list[str]:
+    """
+    Takes the HTML of the Wikipedia page
+    Returns the tickers of the constituents table, in the Yahoo format (BRK.B -> BRK-B)
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', id='constituents')
+    if table is None:
+        return []
+    tickers = []
+    for row in table.find_all('tr')[1:]:
+        cell = row.find('td')
+        if cell is not None:
+            tickers.append(cell.get_text(strip=True).replace('.', '-'))
+    return tickers
+
+
+def sp500_tickers(refresh:bool = False, timeout:float = 10) -> list[str]:
+    """
+    Returns the S&P 500 tickers (local copy, downloaded if missing or refresh=True).
+    An empty list if there is no local copy and the download fails.
+    """
+    path = os.path.join(UNIVERSE_PATH, 'sp500.json')
+    if os.path.exists(path) and not refresh:
+        with open(path) as f:
+            return json.load(f)
+
+    try:
+        response = requests.get(SP500_URL, headers=HEADERS, timeout=timeout)
+        response.raise_for_status()
+        tickers = parse_sp500(response.text)
+    except Exception as e:
+        print(f"Error while downloading the S&P 500 list : {e}")
+        tickers = []
+
+    if tickers:
+        os.makedirs(UNIVERSE_PATH, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(tickers, f)
+        os.replace(path + '.tmp', path)
+    elif os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return tickers
@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+from html import escape
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_data.price_store import PriceStore, get_default_store
+from classes.Asset import Asset
+from classes.BuyHold import BuyHold
+from classes.Momentum import Momentum
+from classes.Strategy import run_strategies
+from classes.portfolio import Portfolio
+from classes.metrics import compute_metrics
+from classes.downsample import downsample_series
+
+"""
+Headless daily report (the 20:00 cron job), independent from the Streamlit interface.
+
+For every ticker of the watchlist : Buy & Hold and Momentum metrics, one equity chart. Then the equal (or configured)
+weights portfolio of the watchlist. Everything is written to one static HTML page (+ PNG charts when kaleido is installed).
+
+The report is incremental : manifest.json keeps, for each ticker, a fingerprint of its bars and of the config.
+Only the tickers whose fingerprint changed since the last report are recomputed (in a process pool),
+the others reuse their metrics and charts. Every stage is timed and logged.
+
+python src/report.py --tickers AAPL,MSFT,SPY
+python src/report.py --config watchlist.json --output /var/www/report --jobs 4
+
+crontab : 0 20 * * 1-5 cd /path/to/repo && python src/report.py --config watchlist.json
+"""
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'reports')
+
+DEFAULT_CONFIG = {
+    'tickers': ["AAPL", "MSFT", "GOOGL"],
+    'start_date': None,         # None = full history
+    'momentum_window': 50,
+    'capital': 1000,
+    'risk_free_rate': 0.02,
+    'confidence_level': 0.95,
+    'weights': None,            # {ticker: weight}, None = equal weights
+}
+
+logger = logging.getLogger("report")
+
+
+# -------------------------------------------------------
+# TIMINGS
+# -------------------------------------------------------
+
+class StageTimer:
+    """Wall time of each stage of the report, logged when the stage ends"""
+
+    def __init__(self):
+        self.timings = {} # {stage: seconds}, in the order of the stages
+
+    @contextmanager
+    def stage(self, name:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+            logger.info(f"{name:<10} {self.timings[name]:8.3f} s")
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+# -------------------------------------------------------
+# CONFIG AND MANIFEST
+# -------------------------------------------------------
+
+def load_config(path:str | None = None, tickers:list | None = None) -> dict:
+    """
+    Returns DEFAULT_CONFIG updated by the JSON file (if given), then by the tickers of the command line
+    """
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    if tickers:
+        config['tickers'] = tickers
+    config['tickers'] = list(dict.fromkeys(t.strip().upper() for t in config['tickers'] if t.strip()))
+    return config
+
+def load_manifest(output:str) -> dict:
+    """Returns the manifest of the last report, an empty one if there is none (or it can't be read)"""
+    path = os.path.join(output, 'manifest.json')
+    if not os.path.exists(path):
+        return {'tickers': {}, 'portfolio': None}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Unreadable manifest, everything is recomputed : {e}")
+        return {'tickers': {}, 'portfolio': None}
+
+def save_manifest(output:str, manifest:dict):
+    path = os.path.join(output, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, default=str)
+    os.replace(path + '.tmp', path)
+
+def fingerprint(bars:pd.DataFrame, config:dict) -> str:
+    """
+    Hash of the bars (dates and values) and of the settings the metrics depend on.
+    The whole history is hashed, not only the last bar : an adjusted history (dividend, split) changes the metrics too
+    """
+    settings = {k: config[k] for k in ('start_date', 'momentum_window', 'capital', 'risk_free_rate', 'confidence_level')}
+    h = hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode())
+    h.update(np.ascontiguousarray(bars.index.asi8).tobytes())
+    h.update(np.ascontiguousarray(bars.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+# -------------------------------------------------------
+# COMPUTATION (one task per ticker, in the pool)
+# -------------------------------------------------------
+
+def _metrics_row(m) -> dict:
+    return {'PnL (%)': m.pnl_pct, 'Annualized Volatility': m.annualized_volatility, 'Sharpe Ratio': m.sharpe,
+            'Sortino Ratio': m.sortino, 'Max Drawdown': m.max_drawdown, 'VaR': m.VaR, 'ES': m.ES}
+
+def equity_figure(title:str, curves:dict, capital:float) -> go.Figure:
+    """One line per equity curve {name: Series}, same look as the strategies capital graphs"""
+    fig = go.Figure()
+    for name, curve in curves.items():
+        values = downsample_series(curve)
+        fig.add_trace(go.Scatter(x=values.index, y=values, mode='lines', name=name, line=dict(width=2)))
+    fig.add_hline(y=capital, line_dash="dash", line_color="gray", annotation_text="Initial Capital")
+    fig.update_layout(title=title, yaxis_title="Capital Value ($)", xaxis_title="Date",
+                      template="plotly_dark", hovermode="x unified")
+    return fig
+
+def ticker_report(ticker:str, bars:pd.DataFrame, config:dict) -> dict:
+    """
+    Takes the bars of one ticker
+    Returns {'metrics': {strategy: {metric: value}}, 'last_price', 'last_bar', 'figure': figure as a dict}
+    """
+    # The bars are already loaded, the worker never touches the store
+    asset = Asset.from_bars(ticker, bars)
+    prices = asset.prices['Price']
+    start = config['start_date'] or prices.index[0]
+    end = prices.index[-1]
+
+    buy_hold = BuyHold(asset, start, end, cap=config['capital'])
+    momentum = Momentum(asset, start, end, cap=config['capital'])
+    momentum.define_positions(config['momentum_window'])
+    # Both strategies go through the kernel at once
+    equity = run_strategies([buy_hold, momentum]).equity
+
+    dates, _, _ = asset.price_slice(start, end)
+    names = ["Buy & Hold", f"Momentum ({config['momentum_window']})"]
+    metrics = compute_metrics(equity, config['risk_free_rate'], config['confidence_level'], asset.periods_per_year)
+    rows = {name: {k: float(np.asarray(v)[i]) for k, v in _metrics_row(metrics).items()} for i, name in enumerate(names)}
+
+    curves = {name: pd.Series(equity[i], index=dates) for i, name in enumerate(names)}
+    fig = equity_figure(f"{ticker} : Buy & Hold vs Momentum", curves, config['capital'])
+    return {'metrics': rows, 'last_price': float(prices.iloc[-1]), 'last_bar': str(end), 'figure': fig.to_dict()}
+
+def _ticker_task(args):
+    ticker, bars, config = args
+    try:
+        return ticker, ticker_report(ticker, bars, config), None
+    except Exception as e:
+        return ticker, None, f"{type(e).__name__} : {e}"
+
+def compute_tickers(jobs:dict, config:dict, n_jobs:int = 1) -> tuple:
+    """
+    Takes {ticker: bars} to recompute
+    Returns ({ticker: result}, {ticker: error}), the tickers are spread on n_jobs processes
+    """
+    tasks = [(t, bars, config) for t, bars in jobs.items()]
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            results = list(pool.map(_ticker_task, tasks))
+    else:
+        results = [_ticker_task(task) for task in tasks]
+
+    done = {t: res for t, res, err in results if err is None}
+    errors = {t: err for t, _, err in results if err is not None}
+    return done, errors
+
+def portfolio_report(bars:dict, config:dict) -> dict:
+    """
+    Takes {ticker: bars} of the whole watchlist
+    Returns the metrics of the portfolio and its figures (value, correlation) as dicts
+    """
+    portfolio = Portfolio("Watchlist")
+    for t, b in bars.items():
+        portfolio.add_asset(t, asset=Asset.from_bars(t, b))
+    if config['weights']:
+        portfolio.set_custom_weights(config['weights'])
+    else:
+        portfolio.set_equal_weights()
+
+    value = portfolio.portfolio_value(initial_capital=config['capital'])
+    m = compute_metrics(np.concatenate([[config['capital']], value.values]), config['risk_free_rate'],
+                        config['confidence_level'], portfolio.periods_per_year)
+    metrics = {k: float(v) for k, v in _metrics_row(m).items()}
+    metrics['Diversification Ratio'] = portfolio.diversification_ratio()
+
+    corr = portfolio.correlation_matrix()
+    corr_fig = go.Figure(go.Heatmap(z=corr.values, x=corr.columns, y=corr.index, colorscale="RdBu", zmid=0,
+                                    zmin=-1, zmax=1, colorbar=dict(title="Correlation")))
+    corr_fig.update_layout(title="Correlation of the returns", template="plotly_dark")
+    value_fig = equity_figure("Watchlist portfolio", {"Portfolio": value}, config['capital'])
+    return {'metrics': metrics, 'weights': dict(portfolio.weights), 'start': str(value.index[0]),
+            'figures': {'portfolio': value_fig.to_dict(), 'correlation': corr_fig.to_dict()}}
+
+
+# -------------------------------------------------------
+# RENDERING
+# -------------------------------------------------------
+
+def write_charts(figures:dict, folder:str, png:bool = True) -> dict:
+    """
+    Takes {name: figure dict}, writes folder/name.html (a div, plotly.js is loaded once by the page)
+    and folder/name.png in one batch when kaleido is installed.
+    Returns {name: True if the PNG was written}
+    """
+    os.makedirs(folder, exist_ok=True)
+    figs = {name: go.Figure(fig) for name, fig in figures.items()}
+    for name, fig in figs.items():
+        with open(os.path.join(folder, f"{name}.html"), 'w') as f:
+            f.write(fig.to_html(full_html=False, include_plotlyjs=False))
+
+    if not png or not figs:
+        return {name: False for name in figs}
+    try:
+        import kaleido # noqa: F401, optional : only needed for the PNG
+    except ImportError:
+        logger.warning("kaleido is not installed, no PNG charts (HTML only)")
+        return {name: False for name in figs}
+    try:
+        # One call for every image, the browser behind kaleido starts only once
+        pio.write_images(list(figs.values()), [os.path.join(folder, f"{n}.png") for n in figs], width=1000, height=500)
+        return {name: True for name in figs}
+    except Exception as e:
+        logger.warning(f"PNG export failed : {e}")
+        return {name: False for name in figs}
+
+def _read_chart(folder:str, name:str) -> str:
+    path = os.path.join(folder, f"{name}.html")
+    if not os.path.exists(path):
+        return "<p>Chart not available</p>"
+    with open(path) as f:
+        return f.read()
+
+def _table(df:pd.DataFrame) -> str:
+    return df.to_html(float_format=lambda x: f"{x:,.4f}", na_rep="-", border=0, classes="metrics")
+
+def render_html(manifest:dict, config:dict, charts_folder:str, timings:dict, errors:dict) -> str:
+    """Returns the whole report page"""
+    rows = []
+    for t in config['tickers']:
+        entry = manifest['tickers'].get(t)
+        if not entry:
+            continue
+        for strategy, metrics in entry['metrics'].items():
+            rows.append({'Ticker': t, 'Strategy': strategy, 'Last Price': entry['last_price'],
+                         'Last Bar': entry['last_bar'], **metrics})
+    table = pd.DataFrame(rows).set_index(['Ticker', 'Strategy']) if rows else pd.DataFrame()
+
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>Daily report {escape(manifest['generated_at'][:10])}</title>",
+        # plotly.js is loaded once, the charts are divs
+        f"<script src='https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js'></script>",
+        "<style>body{background:#111;color:#eee;font-family:sans-serif;margin:2em}"
+        "table.metrics{border-collapse:collapse}table.metrics td,table.metrics th{padding:4px 10px;text-align:right}"
+        "table.metrics tr:nth-child(even){background:#1c1c1c}</style></head><body>",
+        f"<h1>Daily report</h1><p>Generated at {escape(manifest['generated_at'])}</p>",
+        "<h2>Watchlist</h2>", _table(table) if not table.empty else "<p>No data</p>",
+    ]
+    if errors:
+        parts.append("<h3>Not in the report</h3><ul>")
+        parts += [f"<li>{escape(t)} : {escape(str(e))}</li>" for t, e in errors.items()]
+        parts.append("</ul>")
+
+    portfolio = manifest.get('portfolio')
+    if portfolio:
+        weights = ", ".join(f"{t} {w:.1%}" for t, w in portfolio['weights'].items())
+        parts += ["<h2>Portfolio</h2>", f"<p>Weights : {escape(weights)} (since {escape(portfolio['start'][:10])})</p>",
+                  _table(pd.DataFrame([portfolio['metrics']], index=["Portfolio"])),
+                  _read_chart(charts_folder, 'portfolio'), _read_chart(charts_folder, 'correlation')]
+
+    parts.append("<h2>Charts</h2>")
+    parts += [_read_chart(charts_folder, t) for t in config['tickers'] if t in manifest['tickers']]
+
+    timing_rows = pd.DataFrame({'Seconds': timings}).rename_axis('Stage')
+    parts += ["<h2>Timings</h2>", _table(timing_rows), "</body></html>"]
+    return "\n".join(parts)
+
+# -------------------------------------------------------
+# REPORT
+# -------------------------------------------------------
+
+def generate_report(config:dict, output:str = DEFAULT_OUTPUT, store:PriceStore | None = None, n_jobs:int = 1,
+                    force:bool = False, png:bool = True) -> dict:
+    """
+    Builds the report of the watchlist in output/ (report.html, charts/, manifest.json).
+    force=True recomputes every ticker. Returns the new manifest (with the timings of this run)
+    """
+    store = store if store is not None else get_default_store()
+    timer = StageTimer()
+    charts_folder = os.path.join(output, 'charts')
+    os.makedirs(output, exist_ok=True)
+    manifest = load_manifest(output)
+    tickers = config['tickers']
+
+    with timer.stage("refresh"):
+        # Only the bars missing from the cache are downloaded, the tickers in parallel
+        errors = store.prefetch(tickers)
+
+    with timer.stage("load"):
+        bars = {}
+        for t in tickers:
+            if t in errors:
+                continue
+            history = store.get_history(t)
+            if config['start_date']:
+                history = history.loc[config['start_date']:]
+            if len(history) < 3:
+                errors[t] = "Not enough data"
+                continue
+            bars[t] = history
+
+    with timer.stage("diff"):
+        prints = {t: fingerprint(b, config) for t, b in bars.items()}
+        previous = manifest['tickers']
+        changed = [t for t in bars if force or previous.get(t, {}).get('fingerprint') != prints[t]]
+        logger.info(f"{len(changed)} ticker(s) to compute, {len(bars) - len(changed)} unchanged")
+
+    with timer.stage("compute"):
+        results, failures = compute_tickers({t: bars[t] for t in changed}, config, n_jobs)
+        errors.update(failures)
+
+        # The portfolio depends on every ticker (and the weights)
+        portfolio_print = hashlib.sha1(json.dumps([prints, config['weights']], sort_keys=True).encode()).hexdigest()
+        old_portfolio = manifest.get('portfolio')
+        portfolio = None
+        if len(bars) > 1 and (force or not old_portfolio or old_portfolio.get('fingerprint') != portfolio_print):
+            try:
+                portfolio = portfolio_report(bars, config)
+                portfolio['fingerprint'] = portfolio_print
+            except Exception as e:
+                errors['Portfolio'] = f"{type(e).__name__} : {e}"
+
+    with timer.stage("charts"):
+        figures = {t: res.pop('figure') for t, res in results.items()}
+        if portfolio:
+            figures.update(portfolio.pop('figures'))
+        written = write_charts(figures, charts_folder, png)
+
+    with timer.stage("render"):
+        for t, res in results.items():
+            previous[t] = {'fingerprint': prints[t], 'bars': len(bars[t]), 'png': written[t], **res}
+        # Tickers removed from the watchlist (or without data today) leave the report
+        manifest['tickers'] = {t: previous[t] for t in tickers if t in previous and t in bars and t not in failures}
+        if portfolio:
+            manifest['portfolio'] = portfolio
+        elif len(bars) < 2 or 'Portfolio' in errors:
+            manifest['portfolio'] = None
+        manifest['generated_at'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        manifest['recomputed'] = sorted(results)
+
+        html = render_html(manifest, config, charts_folder, timer.timings, errors)
+        with open(os.path.join(output, 'report.html.tmp'), 'w') as f:
+            f.write(html)
+        os.replace(os.path.join(output, 'report.html.tmp'), os.path.join(output, 'report.html'))
+
+    manifest['timings'] = dict(timer.timings)
+    manifest['errors'] = errors
+    save_manifest(output, manifest)
+    logger.info(f"{'total':<10} {timer.total:8.3f} s, report in {os.path.join(output, 'report.html')}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless daily report of a watchlist")
+    parser.add_argument('--config', help="JSON file with the watchlist and the settings (see DEFAULT_CONFIG)")
+    parser.add_argument('--tickers', help="Comma separated tickers, replaces the ones of the config")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Folder of the report")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Number of processes")
+    parser.add_argument('--force', action='store_true', help="Recompute every ticker, even unchanged ones")
+    parser.add_argument('--no-png', action='store_true', help="HTML charts only")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = load_config(args.config, args.tickers.split(',') if args.tickers else None)
+    manifest = generate_report(config, args.output, n_jobs=args.jobs, force=args.force, png=not args.no_png)
+    return 1 if not manifest['tickers'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from classes.Asset import Asset
+from classes.instrumentation import span
+from load_data.price_store import get_default_store
+from load_data.refresh_daemon import read_status, daemon_alive
+
+"""
+Cache shared by every Streamlit session of the server process.
+Streamlit reruns the whole page on each widget change, so without it every checkbox re-downloads,
+re-rolls and rebuilds the figures. Entries are keyed by a hash of (ticker, dates, params),
+expire after a TTL and are evicted LRU-first when there are too many of them or they take too much memory.
+"""
+
+# -------------------------------------------------------
+# CACHE
+# -------------------------------------------------------
+
+def make_key(namespace:str, *args, **kwargs) -> str:
+    """Returns a hash of the namespace and of the parameters"""
+    content = repr((namespace, args, sorted(kwargs.items())))
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def _sizeof(obj, depth:int=0) -> int:
+    """Rough memory size of a cached object (pandas/numpy aware, one level inside objects)"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=False).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=False))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(getattr(obj, 'nbytes', None), int):
+        # Objects that count their own memory (Asset : no __dict__, its views share the same block)
+        return obj.nbytes
+    if depth > 1:
+        return sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(_sizeof(o, depth + 1) for o in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_sizeof(o, depth + 1) for o in obj.values())
+    if hasattr(obj, 'data') and hasattr(obj, 'layout'):
+        # Plotly figure : the arrays of the traces are what matters
+        return sum(_sizeof(v, depth + 1) for trace in obj.data for v in trace.to_plotly_json().values())
+    if hasattr(obj, '__dict__'):
+        return sys.getsizeof(obj) + sum(_sizeof(v, depth + 1) for v in vars(obj).values())
+    return sys.getsizeof(obj)
+
+
+class TTLCache:
+    """
+    LRU cache with a time to live, a max number of entries and a max size in bytes.
+    Thread safe, since Streamlit sessions run in different threads.
+    """
+
+    def __init__(self, name:str, ttl:float=300, max_entries:int=128, max_bytes:int=256 * 1024**2):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict() # {key: (expires_at, size, value)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key:str):
+        """Returns (found, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def set(self, key:str, value):
+        size = _sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            # Least recently used first
+            while len(self._data) > self.max_entries or (self._bytes > self.max_bytes and len(self._data) > 1):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key:str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def get_or_compute(self, key:str, compute):
+        with span(f"cache.{self.name}") as timing:
+            found, value = self.get(key)
+            timing.hit = found
+            if not found:
+                value = compute()
+                self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'cache': self.name,
+            'entries': len(self._data),
+            'size (MB)': self._bytes / 1024**2,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions
+        }
+
+
+@st.cache_resource
+def _caches() -> dict:
+    # cache_resource : one instance for the whole server, shared by all the sessions
+    return {
+        'assets': TTLCache('assets', ttl=300, max_entries=64, max_bytes=512 * 1024**2),
+        'series': TTLCache('series', ttl=300, max_entries=512, max_bytes=128 * 1024**2),
+        'strategies': TTLCache('strategies', ttl=300, max_entries=128, max_bytes=128 * 1024**2),
+        'figures': TTLCache('figures', ttl=300, max_entries=128, max_bytes=256 * 1024**2),
+    }
+
+def cache_stats() -> pd.DataFrame:
+    """Returns the hit/miss counters of every cache"""
+    return pd.DataFrame([c.stats() for c in _caches().values()]).set_index('cache')
+
+
+# -------------------------------------------------------
+# WRAPPERS
+# -------------------------------------------------------
+
+_daemon_check = {'at': None, 'alive': False}
+
+def daemon_running(every:float = 30) -> bool:
+    """
+    True if the refresh daemon is alive (status file read at most every `every` seconds).
+    While it runs, the shared store only reads the cache : the daemon refreshes it
+    """
+    now = time.monotonic()
+    if _daemon_check['at'] is None or now - _daemon_check['at'] >= every:
+        _daemon_check['alive'] = daemon_alive(read_status())
+        _daemon_check['at'] = now
+        get_default_store().warm_only = _daemon_check['alive']
+    return _daemon_check['alive']
+
+def get_asset(ticker:str, start_date=None, end_date=None, interval:str='1d') -> Asset:
+    """
+    Returns a shared Asset (the same object for every session asking the same ticker, dates and interval)
+    """
+    daemon_running()
+    key = make_key('asset', ticker, str(start_date), str(end_date), interval)
+    return _caches()['assets'].get_or_compute(key, lambda: Asset(ticker, start_date=start_date, end_date=end_date, interval=interval))
+
+def get_rolling_means(asset:Asset, windows:list, start_date=None, end_date=None) -> pd.DataFrame:
+    """Rolling means of the asset, one column per window (see Asset.rolling_means)"""
+    windows = [int(w) for w in windows]
+    key = make_key('rolling_means', asset.ticker_symbol, str(asset.start_date), str(asset.end_date),
+                   asset.interval, len(asset.prices), windows, str(start_date), str(end_date))
+    return _caches()['series'].get_or_compute(key, lambda: asset.rolling_means(windows, start_date, end_date))
+
+def get_rolling_std(asset:Asset, window:int) -> pd.DataFrame:
+    key = make_key('rolling_std', asset.ticker_symbol, str(asset.start_date), str(asset.end_date),
+                   asset.interval, len(asset.prices), int(window))
+    return _caches()['series'].get_or_compute(key, lambda: asset.rolling_std(window))
+
+def get_strategy(strategy_cls, asset:Asset, start, end, **params):
+    """
+    Returns a shared strategy object. Its equity curve and metrics are memoized inside it,
+    so sharing the object shares them too. params are passed to define_positions (ex : w=20 for Momentum)
+    """
+    key = make_key('strategy', strategy_cls.__name__, asset.ticker_symbol, str(asset.start_date),
+                   str(asset.end_date), len(asset.prices), str(start), str(end), **params)
+
+    def build():
+        strat = strategy_cls(asset, start, end)
+        if params:
+            strat.define_positions(**params)
+        strat.get_equity_curve()
+        return strat
+
+    return _caches()['strategies'].get_or_compute(key, build)
+
+def get_cached(namespace:str, compute, *key_parts, **key_kwargs):
+    """
+    Generic wrapper for any other result (hill plot, sweep...), keyed by the given parts
+    """
+    return _caches()['series'].get_or_compute(make_key(namespace, *key_parts, **key_kwargs), compute)
+
+def get_figure(name:str, build, *key_parts, **key_kwargs):
+    """
+    Returns a cached figure. The figure is shared : the caller must not modify it,
+    so everything that goes in the figure must be in the key.
+    """
+    return _caches()['figures'].get_or_compute(make_key(name, *key_parts, **key_kwargs), build)
@@ -3,12 +3,26 @@ import streamlit as st
 from classes.Asset import Asset
 from classes.BuyHold import BuyHold
 from classes.Momentum import Momentum
+from classes.Strategy import run_strategies
+from classes.walkforward import WalkForward
+from classes.kernel import FeeModel, SlippageModel
+from classes.metrics import compute_metrics
 
 from load_data.news_scraper import get_latest_news
+from load_data.price_store import INTRADAY_LOOKBACK
+from ui import cache
+from classes.instrumentation import span
+from classes.downsample import downsample_series
 import pandas as pd
+import numpy as np
 import datetime
 import plotly.graph_objects as go
 
+def plot_chart(fig):
+    """st.plotly_chart, timed : the figure is serialized to JSON there"""
+    with span("st.plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
 def render_home():
     st.title("Home")
     st.write("Welcome to the Financial Dashboard.")
@@ -27,11 +41,14 @@ def render_home():
                         # Title and link
                         st.markdown(f"**[{row['title']}]({row['link']})**")
                         # Tickers
-                        if (pd.notna(row['tickers']) and row['tickers'] != "MARKET"):
+                        if (row['tickers'] and row['tickers'] != ["MARKET"]):
                             badges = " ".join(row['tickers'])
                             st.markdown(f"{badges}")
                 st.divider()
 
+# Bars shown on the Stocks page : (interval stored, rule used to derive the bars from it)
+STOCK_INTERVALS = {'1d': ('1d', None), '1h': ('5m', '1h'), '15m': ('5m', '15min'), '5m': ('5m', None), '1m': ('1m', None)}
+
 def render_stocks():
     st.title("Stocks Analysis")
     st.write("Analyze asset price and risk metrics (EVT).")
@@ -54,7 +71,19 @@ def render_stocks():
     with col3:
         end_date = st.date_input("End Date", value=datetime.date.today())
 
-    my_asset = Asset(ticker_input, start_date=start_date, end_date=end_date)
+    # Intraday bars : only one base resolution is stored (1m or 5m), the coarser bars are derived from it
+    interval = st.radio("Bars", list(STOCK_INTERVALS), horizontal=True)
+    base_interval, rule = STOCK_INTERVALS[interval]
+    if base_interval != '1d':
+        oldest = datetime.date.today() - datetime.timedelta(days=INTRADAY_LOOKBACK[base_interval])
+        if start_date < oldest:
+            st.caption(f"{interval} bars only go back {INTRADAY_LOOKBACK[base_interval]} days, the start is moved to {oldest}.")
+            start_date = oldest
+        end_date = end_date + datetime.timedelta(days=1) # the end is excluded, and today's bars are wanted
+
+    my_asset = cache.get_asset(ticker_input, start_date=start_date, end_date=end_date, interval=base_interval)
+    if rule is not None and not my_asset.history.empty:
+        my_asset = my_asset.resample(rule)
 
     if my_asset.history.empty:
         st.error(f"No data found for '{ticker_input}' on these dates.")
@@ -67,32 +96,64 @@ def render_stocks():
     show_mean = opt_col1.checkbox("Add Rolling Mean")
     show_std = opt_col2.checkbox("Add Rolling Volatility")
 
-    if graph_type == "Candlestick":
-        fig = my_asset.candle_graph()
-    else:
-        fig = my_asset.price_graph()
-        
-    if show_mean:
-        window_mean = opt_col1.number_input("Choose mean window", value=20, min_value=2)
-        fig = my_asset.add_rolling_mean(fig, w=window_mean)
-    if show_std:
-        window_std = opt_col2.number_input("Choose volatility window", value=20, min_value=2)
-        fig = my_asset.add_rolling_std(fig, w=window_std)
+    window_mean = opt_col1.number_input("Choose mean window", value=20, min_value=2) if show_mean else None
+    window_std = opt_col2.number_input("Choose volatility window", value=20, min_value=2) if show_std else None
 
-    st.plotly_chart(fig, use_container_width=True)
+    def build_fig():
+        if graph_type == "Candlestick":
+            fig = my_asset.candle_graph()
+        else:
+            fig = my_asset.price_graph()
+        if window_mean:
+            fig = my_asset.add_rolling_mean(fig, w=window_mean, means=cache.get_rolling_means(my_asset, [window_mean]))
+        if window_std:
+            fig = my_asset.add_rolling_std(fig, w=window_std, std=cache.get_rolling_std(my_asset, window_std))
+        return fig
+
+    # Everything drawn on the figure is in the key, so the cached figure is never modified after
+    fig = cache.get_figure("stocks_graph", build_fig, ticker_input, str(start_date), str(end_date), interval,
+                           len(my_asset.prices), graph_type, window_mean, window_std)
+
+    plot_chart(fig)
 
     # EVT
     st.divider()
     st.subheader("Extreme Value Analysis (Hill Plot)")
 
-    hill_series = my_asset.get_hill_estimator()
+    show_bands = st.checkbox("Show bootstrap confidence bands (95%)")
+
+    hill_key = (ticker_input, str(start_date), str(end_date), interval, len(my_asset.prices))
+    if show_bands:
+        hill_df = cache.get_cached("hill_bootstrap", lambda: my_asset.get_hill_bootstrap(n_boot=200, confidence_level=0.95, seed=0), *hill_key)
+        hill_series = hill_df['Ksi']
+    else:
+        hill_series = cache.get_cached("hill", my_asset.get_hill_estimator, *hill_key)
 
     if hill_series.empty:
         st.warning("Not enough loss data to compute the Hill estimator.")
     else:
         # Graph
         fig_hill = go.Figure()
-        
+
+        if show_bands:
+            fig_hill.add_trace(go.Scatter(
+                x=hill_df.index,
+                y=hill_df['Upper'],
+                mode='lines',
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+            fig_hill.add_trace(go.Scatter(
+                x=hill_df.index,
+                y=hill_df['Lower'],
+                mode='lines',
+                line=dict(width=0),
+                fill='tonexty',
+                fillcolor='rgba(255, 165, 0, 0.2)',
+                name='95% Bootstrap Band'
+            ))
+
         fig_hill.add_trace(go.Scatter(
             x=hill_series.index,
             y=hill_series.values,
@@ -100,6 +161,12 @@ def render_stocks():
             name='Hill Estimator',
             line=dict(color='#FFA500') 
         ))
+
+        # Most stable k
+        best_k = my_asset.select_hill_k(hill_series)
+        if best_k is not None:
+            fig_hill.add_vline(x=best_k, line_dash="dash", line_color="gray", annotation_text=f"k = {best_k}")
+
         fig_hill.update_layout(
             title=f"Hill Plot: {my_asset.ticker_symbol}",
             xaxis_title="Number of Extremes (k)",
@@ -108,7 +175,65 @@ def render_stocks():
             hovermode="x unified"
         )
         
-        st.plotly_chart(fig_hill, use_container_width=True)
+        plot_chart(fig_hill)
+
+        if best_k is not None:
+            st.metric(f"Tail index (ksi) at the most stable k = {best_k}", f"{hill_series.loc[best_k]:.3f}")
+
+    # GARCH
+    st.divider()
+    st.subheader("Conditional Volatility (GARCH)")
+
+    garch_label = st.radio("Model", ["GARCH(1,1)", "GJR-GARCH(1,1)"], horizontal=True)
+    garch_model = 'gjr' if garch_label.startswith("GJR") else 'garch'
+
+    try:
+        garch = cache.get_cached("garch", lambda: my_asset.garch(garch_model), garch_model, *hill_key)
+    except ValueError as e:
+        st.warning(f"Could not fit the model : {e}")
+        return
+
+    cond_vol = downsample_series(garch.conditional_volatility())
+    rolling_vol = downsample_series(cache.get_rolling_std(my_asset, 20)['Std'] * np.sqrt(my_asset.periods_per_year))
+    horizon = 20
+    forecast = garch.forecast(horizon)
+    if base_interval == '1d':
+        forecast_dates = pd.bdate_range(garch.returns.index[-1], periods=horizon + 1)[1:]
+    else:
+        forecast_dates = pd.date_range(garch.returns.index[-1], periods=horizon + 1, freq=pd.Timedelta(rule or base_interval))[1:]
+    unit = "days" if base_interval == '1d' else "bars"
+
+    fig_garch = go.Figure()
+    fig_garch.add_trace(go.Scatter(x=rolling_vol.index, y=rolling_vol.values, name=f"20 {unit} rolling volatility", line=dict(dash="dot", color="gray")))
+    fig_garch.add_trace(go.Scatter(x=cond_vol.index, y=cond_vol.values, name=f"{garch_label} volatility", line=dict(color="#00CC96")))
+    fig_garch.add_trace(go.Scatter(x=forecast_dates, y=forecast, name=f"Forecast ({horizon} {unit})", line=dict(dash="dash", color="#EF553B")))
+    fig_garch.update_layout(
+        title=f"Annualized Volatility: {my_asset.ticker_symbol}",
+        yaxis_title="Annualized Volatility",
+        yaxis_tickformat=".0%",
+        template="plotly_dark",
+        hovermode="x unified"
+    )
+    plot_chart(fig_garch)
+
+    p = garch.params
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("alpha", f"{p['alpha']:.3f}")
+    col2.metric("beta", f"{p['beta']:.3f}")
+    col3.metric("gamma (leverage)", f"{p['gamma']:.3f}")
+    col4.metric("Persistence", f"{garch.persistence:.3f}")
+
+    # VaR with the volatility of tomorrow vs the flat historical one
+    hist_returns = my_asset.log_returns
+    hist_VaR = np.percentile(hist_returns, 5)
+    garch_VaR_1, garch_ES_1 = garch.VaR(0.95, horizon=1)
+    garch_VaR_10, _ = garch.VaR(0.95, horizon=10)
+    col1, col2, col3, col4 = st.columns(4)
+    bar = "day" if base_interval == '1d' else f"{interval} bar"
+    col1.metric(f"VaR 95% 1 {bar} (historical)", f"{hist_VaR:.2%}")
+    col2.metric(f"VaR 95% 1 {bar} (GARCH)", f"{garch_VaR_1:.2%}")
+    col3.metric(f"ES 95% 1 {bar} (GARCH)", f"{garch_ES_1:.2%}")
+    col4.metric(f"VaR 95% 10 {bar}s (GARCH)", f"{garch_VaR_10:.2%}")
 
 def render_strategies():
     
@@ -122,7 +247,7 @@ def render_strategies():
     ).upper()
 
     if ticker_input:
-        my_asset = Asset(ticker_input)
+        my_asset = cache.get_asset(ticker_input)
 
         if my_asset.history.empty:
             st.error(f"No data found for this ticker : '{ticker_input}'.")
@@ -164,32 +289,52 @@ def render_strategies():
 
             # BuyHold
             if opt_col1.checkbox("Test Buy and Hold Strategy"):
-                buyhold_strat = BuyHold(my_asset, start_date, end_date)
+                buyhold_strat = cache.get_strategy(BuyHold, my_asset, start_date, end_date)
                 active_strategies.append(("Buy and Hold", buyhold_strat))
 
-            # Momentum
+            # Momentum (several windows can be compared)
             if opt_col2.checkbox("Test Momentum Strategy"):
-                my_window = opt_col2.number_input(
-                    "Mobile Mean (Days)", 
-                    min_value=1, 
-                    max_value=200, 
-                    value=20,
-                    step=1
-                )
-                momentum_strat = Momentum(my_asset, start_date, end_date)
-                momentum_strat.define_positions(w=my_window) 
-                active_strategies.append((f"Momentum (w={my_window} days)", momentum_strat))
+                windows_input = opt_col2.text_input("Mobile Mean (Days), comma separated to compare several", value="20")
+                my_windows = sorted({int(w) for w in windows_input.replace(" ", "").split(",") if w.isdigit() and 1 <= int(w) <= 200})
+                if not my_windows:
+                    opt_col2.warning("Type windows between 1 and 200 days.")
+                for my_window in my_windows:
+                    momentum_strat = cache.get_strategy(Momentum, my_asset, start_date, end_date, w=my_window)
+                    active_strategies.append((f"Momentum (w={my_window} days)", momentum_strat))
+
+            # Trading costs, applied by the kernel to every strategy
+            with st.expander("Trading costs"):
+                c1, c2, c3, c4 = st.columns(4)
+                fee_bps = c1.number_input("Fee (bps of traded value)", min_value=0.0, value=0.0, step=1.0)
+                fee_fixed = c2.number_input("Fixed fee per trade ($)", min_value=0.0, value=0.0, step=0.5)
+                slippage_bps = c3.number_input("Slippage (bps)", min_value=0.0, value=0.0, step=1.0)
+                slippage_vol = c4.number_input("Slippage (x daily volatility)", min_value=0.0, value=0.0, step=0.05)
+            fee = FeeModel(rate=fee_bps / 10000, fixed=fee_fixed) if (fee_bps or fee_fixed) else None
+            slippage = SlippageModel(bps=slippage_bps, vol_multiplier=slippage_vol) if (slippage_bps or slippage_vol) else None
 
             if not active_strategies:
                 st.info("Please select at least one strategy to see the results.")
             else:
+                names = [name for name, _ in active_strategies]
+                strats = [strat for _, strat in active_strategies]
+
+                # Every strategy goes through the kernel at once, and the metrics come out of one pass
+                def run_all():
+                    res = run_strategies(strats, fee, slippage)
+                    return res, compute_metrics(res.equity, risk_free_rate=0.02, confidence_level=0.95,
+                                                periods_per_year=my_asset.periods_per_year)
+
+                res, m = cache.get_cached("strategies_kernel", run_all, ticker_input, str(start_date), str(end_date),
+                                          len(my_asset.prices), tuple(names), fee, slippage)
+                dates = strats[0].get_positions().index
+
                 st.subheader("Capital over time")
 
                 # Adding the graphs we want to compare
                 fig = go.Figure()
                 
-                for name, strat in active_strategies:
-                    equity_curve = strat.get_equity_curve()
+                for i, name in enumerate(names):
+                    equity_curve = downsample_series(pd.Series(res.equity[i], index=dates))
                     
                     fig.add_trace(go.Scatter(
                         x=equity_curve.index,
@@ -198,7 +343,7 @@ def render_strategies():
                         name=name, 
                     ))
 
-                fig.add_hline(y=active_strategies[0][1].capital, line_dash="dash", line_color="gray", annotation_text="Initial Capital")
+                fig.add_hline(y=strats[0].capital, line_dash="dash", line_color="gray", annotation_text="Initial Capital")
                 
                 fig.update_layout(
                     title="Equity Curve Comparison",
@@ -207,38 +352,252 @@ def render_strategies():
                     template="plotly_dark",
                     hovermode="x unified"
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                plot_chart(fig)
 
                 # Metrics
                 st.divider()
                 st.subheader("Metrics Comparison")
 
                 metrics_list = []
-                for name, strat in active_strategies:
-                    pnl_value, pnl_pct = strat.pnl()
-                    _, mdd = strat.drawdown()
+                for i, name in enumerate(names):
                     metrics_list.append({
                         "Strategy": name,
-                        "PnL": f"{pnl_value:.2f} ({pnl_pct:.2%})",
-                        "Annualized Volatility": f"{strat.annualized_volatility():.2%}",
-                        "Sharpe Ratio": f"{strat.sharpe():.2f}",
-                        "Sortino Ratio": f"{strat.sortino():.2f}",
-                        "Max Drawdown": f"{mdd:.2%}",
-                        "VaR (95%)": f"{strat.historical_VaR(0.95):.2%}",
-                        "Exp. Shortfall": f"{strat.historical_ES(0.95):.2%}"
+                        "PnL": f"{m.pnl[i]:.2f} ({m.pnl_pct[i]:.2%})",
+                        "Annualized Volatility": f"{m.annualized_volatility[i]:.2%}",
+                        "Sharpe Ratio": f"{m.sharpe[i]:.2f}",
+                        "Sortino Ratio": f"{m.sortino[i]:.2f}",
+                        "Max Drawdown": f"{m.max_drawdown[i]:.2%}",
+                        "VaR (95%)": f"{m.VaR[i]:.2%}",
+                        "Exp. Shortfall": f"{m.ES[i]:.2%}",
+                        "Trades": int(res.trades[i]),
+                        "Turnover": f"{res.turnover[i].sum():.1f}",
+                        "Costs": f"{res.costs[i].sum():.2f}"
                     })
 
                 st.dataframe(pd.DataFrame(metrics_list).set_index("Strategy"))
 
+                # Momentum tuning : every window at once
+                momentum_strats = [strat for _, strat in active_strategies if isinstance(strat, Momentum)]
+                if momentum_strats and st.checkbox("Compare all Momentum windows (1-200 days)"):
+                    st.divider()
+                    st.subheader("Momentum Window Sweep")
+
+                    sweep_table, sweep_fig = cache.get_cached(
+                        "momentum_sweep", lambda: momentum_strats[0].sweep(windows=range(1, 201), fee=fee, slippage=slippage),
+                        ticker_input, str(start_date), str(end_date), len(my_asset.prices), fee, slippage
+                    )
+                    plot_chart(sweep_fig)
+                    st.dataframe(sweep_table.sort_values("Sharpe Ratio", ascending=False))
+
+                # Walk-forward : the window is chosen on each train fold and only judged on the next one
+                if momentum_strats and st.checkbox("Walk-forward test of the Momentum window"):
+                    st.divider()
+                    st.subheader("Walk-forward (out of sample)")
+                    st.caption("Uses the whole price history. On each train fold, the best Sharpe window (5-200 days) is kept and tested on the following dates.")
+
+                    wf1, wf2, wf3 = st.columns(3)
+                    train_years = wf1.number_input("Train (years)", min_value=1, max_value=10, value=3)
+                    test_months = wf2.number_input("Test (months)", min_value=1, max_value=24, value=6)
+                    anchored = wf3.checkbox("Anchored (expanding train)")
+
+                    year = my_asset.periods_per_year
+                    walk = WalkForward(my_asset, train=int(train_years * year), test=int(test_months * year / 12),
+                                       anchored=anchored, fee=fee, slippage=slippage)
+                    folds, wf_equity = cache.get_cached(
+                        "walk_forward", walk.run, ticker_input, len(my_asset.prices),
+                        int(train_years), int(test_months), anchored, fee, slippage
+                    )
+
+                    if folds.empty:
+                        st.warning("Not enough history for one train fold.")
+                    else:
+                        prices = my_asset.prices['Price'].loc[wf_equity.index]
+                        buy_hold = prices / prices.iloc[0] * walk.capital
+
+                        fig_wf = go.Figure()
+                        for name, curve in [("Walk-forward Momentum", wf_equity), ("Buy and Hold", buy_hold)]:
+                            curve = downsample_series(curve)
+                            fig_wf.add_trace(go.Scatter(x=curve.index, y=curve, mode='lines', name=name))
+                        fig_wf.update_layout(
+                            title="Out-of-sample equity (test folds stitched)",
+                            yaxis_title="Capital Value ($)",
+                            template="plotly_dark",
+                            hovermode="x unified"
+                        )
+                        plot_chart(fig_wf)
+
+                        wf_c1, wf_c2, wf_c3 = st.columns(3)
+                        wf_c1.metric("Folds", len(folds))
+                        wf_c2.metric("Test folds beating Buy and Hold", f"{(folds['Test PnL (%)'] > folds['Buy and Hold (%)']).mean():.0%}")
+                        wf_c3.metric("Out-of-sample PnL", f"{wf_equity.iloc[-1] / walk.capital - 1:.2%}")
+
+                        st.dataframe(folds.set_index("Test Start").style.format({
+                            "Train Sharpe": "{:.2f}", "Test Sharpe": "{:.2f}",
+                            "Test PnL (%)": "{:.2%}", "Buy and Hold (%)": "{:.2%}",
+                            "Test Volatility": "{:.2%}", "Test Max Drawdown": "{:.2%}"
+                        }))
+
+from classes import pricing
+import time
+
 def render_pricing():
     st.title("Option Pricing")
-    st.write("WIP : We could try to use Cpp files from Cpp pricing project.")
+    st.write("Price whole option chains (Black-Scholes, binomial tree, Monte Carlo) on a real underlying.")
+
+    # Underlying
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        ticker_input = st.text_input("Underlying", value="SPY").upper()
+
+    my_asset = cache.get_asset(ticker_input)
+    if my_asset.history.empty:
+        st.error(f"No data found for '{ticker_input}'.")
+        return
+    spot, hist_vol = pricing.asset_inputs(my_asset)
+
+    with col2:
+        vol_source = st.selectbox("Volatility", ["Historical (1y)", "GARCH forecast (1m)", "Manual"])
+    if vol_source == "GARCH forecast (1m)":
+        garch = cache.get_cached("garch", lambda: my_asset.garch('garch'), 'garch', ticker_input, "None", "None", len(my_asset.prices))
+        default_vol = float(np.sqrt(np.mean(garch.forecast(21) ** 2)))
+    else:
+        default_vol = hist_vol
+    # NaN on a short or flat history, out of the input bounds for penny stocks / crypto : the input would raise
+    default_vol = float(np.clip(np.nan_to_num(default_vol, nan=0.2), 0.01, 3.0))
+    with col3:
+        sigma = st.number_input("Volatility (annualized)", value=round(default_vol, 4), min_value=0.01, max_value=3.0,
+                                step=0.01, format="%.4f", disabled=vol_source != "Manual")
+        if vol_source != "Manual":
+            sigma = default_vol
+    with col4:
+        r = st.number_input("Risk free rate", value=0.04, step=0.005, format="%.3f")
+    q = st.number_input("Dividend yield", value=0.0, step=0.005, format="%.3f")
+
+    st.caption(f"Spot {spot:,.2f} (last close) | volatility {sigma:.2%}")
+
+    # -----------------------------
+    # Surface
+    # -----------------------------
+    st.divider()
+    st.subheader("Price and Greeks Surface")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        kind = st.radio("Type", ["call", "put"], horizontal=True)
+    with col2:
+        greek = st.selectbox("Show", ["price", "delta", "gamma", "vega", "theta", "rho"])
+    with col3:
+        moneyness = st.slider("Strikes (% of spot)", 50, 150, (70, 130))
+
+    strikes = np.round(spot * np.linspace(moneyness[0], moneyness[1], 40) / 100, 2)
+    expiries = np.geomspace(7, 730, 50) / 365 # 1 week to 2 years, 40 x 50 = 2000 contracts
+
+    start = time.perf_counter()
+    surface = pricing.price_surface(spot, strikes, expiries, r, sigma, q, kind)
+    elapsed = time.perf_counter() - start
+
+    fig_surface = go.Figure(go.Heatmap(
+        x=surface[greek].columns,
+        y=surface[greek].index * 365,
+        z=surface[greek].values,
+        colorscale='Viridis',
+        colorbar=dict(title=greek.capitalize())
+    ))
+    fig_surface.update_layout(
+        title=f"{kind.capitalize()} {greek} by strike and expiry",
+        xaxis_title="Strike",
+        yaxis_title="Days to expiry",
+        yaxis_type="log",
+        template="plotly_dark"
+    )
+    plot_chart(fig_surface)
+    st.caption(f"{surface[greek].size} contracts priced in {elapsed * 1000:.1f} ms")
+
+    # -----------------------------
+    # One contract, three methods
+    # -----------------------------
+    st.divider()
+    st.subheader("Compare the Pricing Methods")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        strike = st.number_input("Strike", value=float(round(spot)), min_value=0.01)
+    with col2:
+        days = st.number_input("Days to expiry", value=90, min_value=1, max_value=3650)
+    with col3:
+        steps = st.select_slider("Tree steps", options=[100, 250, 500, 1000, 2000], value=500)
+    with col4:
+        n_paths = st.select_slider("Monte Carlo paths", options=[10_000, 100_000, 500_000, 1_000_000], value=100_000)
+
+    T = days / 365
+    rows = []
+
+    start = time.perf_counter()
+    bs = float(pricing.black_scholes(spot, strike, T, r, sigma, q, kind))
+    rows.append({"Method": "Black-Scholes (European)", "Price": bs, "Std. Error": np.nan, "Time (ms)": (time.perf_counter() - start) * 1000})
+
+    for american in (False, True):
+        start = time.perf_counter()
+        tree = float(pricing.crr_price(spot, strike, T, r, sigma, q, kind, steps=steps, american=american))
+        rows.append({"Method": f"CRR tree ({'American' if american else 'European'}, {steps} steps)", "Price": tree,
+                     "Std. Error": np.nan, "Time (ms)": (time.perf_counter() - start) * 1000})
+
+    start = time.perf_counter()
+    mc, stderr = pricing.mc_price(spot, strike, T, r, sigma, q, kind, n_paths=n_paths, seed=0)
+    rows.append({"Method": f"Monte Carlo (European, {n_paths:,} paths)", "Price": float(mc),
+                 "Std. Error": float(stderr), "Time (ms)": (time.perf_counter() - start) * 1000})
+
+    st.dataframe(pd.DataFrame(rows).set_index("Method").style.format({"Price": "{:.4f}", "Std. Error": "{:.4f}", "Time (ms)": "{:.1f}"}))
+
+    greeks = pricing.bs_greeks(spot, strike, T, r, sigma, q, kind)
+    cols = st.columns(5)
+    for col, name in zip(cols, ["delta", "gamma", "vega", "theta", "rho"]):
+        col.metric(name.capitalize(), f"{float(greeks[name]):.4f}")
+
+    # -----------------------------
+    # Implied volatility
+    # -----------------------------
+    st.divider()
+    st.subheader("Implied Volatility Smile")
+
+    if st.checkbox("Load the option quotes from Yahoo Finance"):
+        try:
+            expiry_dates = cache.get_cached("option_expiries", lambda: list(my_asset.ticker.options), ticker_input)
+        except Exception as e:
+            st.warning(f"Could not load the option chain : {e}")
+            return
+        if not expiry_dates:
+            st.warning(f"No listed options for {ticker_input}.")
+            return
+
+        expiry = st.selectbox("Expiry", expiry_dates)
+        chain = cache.get_cached("option_chain", lambda: my_asset.ticker.option_chain(expiry), ticker_input, expiry)
+        quotes = chain.calls if kind == "call" else chain.puts
+        mid = np.where((quotes['bid'] > 0) & (quotes['ask'] > 0), (quotes['bid'] + quotes['ask']) / 2, quotes['lastPrice'])
+        T_chain = max((pd.Timestamp(expiry) - pd.Timestamp.today().normalize()).days, 1) / 365
+
+        # The whole chain is solved at once
+        iv = pricing.implied_vol(mid, spot, quotes['strike'].values, T_chain, r, q, kind)
+
+        fig_iv = go.Figure()
+        fig_iv.add_trace(go.Scatter(x=quotes['strike'], y=iv, mode='markers+lines', name="Implied volatility"))
+        fig_iv.add_hline(y=sigma, line_dash="dash", line_color="gray", annotation_text="Model volatility")
+        fig_iv.add_vline(x=spot, line_dash="dot", line_color="gray", annotation_text="Spot")
+        fig_iv.update_layout(
+            title=f"{ticker_input} {kind}s expiring {expiry}",
+            xaxis_title="Strike",
+            yaxis_title="Implied Volatility",
+            yaxis_tickformat=".0%",
+            template="plotly_dark"
+        )
+        plot_chart(fig_iv)
 
 #############################
 # QUANT B - PORTFOLIO
 #############################
 
 from classes.portfolio import Portfolio
+from classes.optimizer import PortfolioOptimizer
 
 def render_portfolio():
     st.title("Portfolio (Quant B)")
@@ -259,69 +618,102 @@ def render_portfolio():
         return
 
     # -----------------------------
-    # 2. Weights selection
+    # 2. Loading the assets
+    # -----------------------------
+    # All the histories are loaded at the same time, and shared between sessions
+    def load_assets():
+        loader = Portfolio("Loader")
+        failures = loader.add_assets(tickers)
+        return loader.assets, failures
+
+    assets, failures = cache.get_cached("portfolio_assets", load_assets, tuple(tickers))
+    if failures:
+        st.warning("Could not load : " + ", ".join(f"{t} ({reason})" for t, reason in failures.items()))
+    if len(assets) == 0:
+        return
+
+    # Optimizer on an equally weighted portfolio of the loaded assets (weights don't change the statistics)
+    def build_optimizer():
+        base = Portfolio("Optimizer")
+        for t, asset in assets.items():
+            base.add_asset(t, 1 / len(assets), asset=asset)
+        return PortfolioOptimizer(base)
+
+    optimizer = cache.get_cached("portfolio_optimizer", build_optimizer, tuple(assets))
+
+    # -----------------------------
+    # 3. Weights selection
     # -----------------------------
     st.subheader("Portfolio Weights")
 
-    raw_weights = {}
-    for t in tickers:
-        raw_weights[t] = st.slider(
-            f"Weight {t}",
-            min_value=0.0,
-            max_value=1.0,
-            value=1 / len(tickers),
-            step=0.01
-        )
+    method = st.radio("Weighting method", ["Manual", "Min Variance", "Max Sharpe", "Risk Parity"], horizontal=True)
+
+    if method == "Manual":
+        raw_weights = {}
+        for t in assets:
+            raw_weights[t] = st.slider(
+                f"Weight {t}",
+                min_value=0.0,
+                max_value=1.0,
+                value=1 / len(assets),
+                step=0.01
+            )
 
-    total_weight = sum(raw_weights.values())
+        total_weight = sum(raw_weights.values())
 
-    if total_weight == 0:
-        st.error("Total weight cannot be zero.")
-        return
+        if total_weight == 0:
+            st.error("Total weight cannot be zero.")
+            return
 
-    # Normalize weights automatically
-    weights = {t: w / total_weight for t, w in raw_weights.items()}
+        # Normalize weights automatically
+        weights = {t: w / total_weight for t, w in raw_weights.items()}
 
-    st.caption(
-        "Weights are automatically normalized to sum to 1 "
-        f"(current sum: {sum(weights.values()):.2f})"
-    )
+        st.caption(
+            "Weights are automatically normalized to sum to 1 "
+            f"(current sum: {sum(weights.values()):.2f})"
+        )
+    else:
+        solvers = {"Min Variance": optimizer.min_variance, "Max Sharpe": optimizer.max_sharpe,
+                   "Risk Parity": optimizer.risk_parity}
+        weights = cache.get_cached("portfolio_weights", solvers[method], tuple(assets), method)
+        st.dataframe(pd.DataFrame({"Weight": weights}).style.format("{:.2%}"))
 
     # -----------------------------
-    # 3. Portfolio construction
+    # 4. Portfolio construction
     # -----------------------------
     p = Portfolio("User Portfolio")
-
-    for t in tickers:
-        p.add_asset(t, weights[t])
+    for t, asset in assets.items():
+        p.add_asset(t, weights[t], asset=asset)
 
     if not p.check_weights():
         st.error("Portfolio weights must sum to 1.")
         return
 
     # -----------------------------
-    # 4. Main chart: assets + portfolio
+    # 5. Main chart: assets + portfolio
     # -----------------------------
     st.subheader("Assets vs Portfolio Performance")
 
     fig = go.Figure()
 
     for t, asset in p.assets.items():
-        price_series = asset.prices.squeeze()
+        price_series = asset.prices['Price']
+        normalized = downsample_series(price_series / price_series.iloc[0])
         fig.add_trace(
             go.Scatter(
-                x=price_series.index,
-                y=price_series / price_series.iloc[0],
+                x=normalized.index,
+                y=normalized.values,
                 name=f"{t} (normalized)",
                 line=dict(dash="dot")
             )
         )
 
     portfolio_value = p.portfolio_value()
+    normalized_value = downsample_series(portfolio_value / portfolio_value.iloc[0])
     fig.add_trace(
         go.Scatter(
-            x=portfolio_value.index,
-            y=portfolio_value / portfolio_value.iloc[0],
+            x=normalized_value.index,
+            y=normalized_value.values,
             name="Portfolio",
             line=dict(width=3)
         )
@@ -335,10 +727,10 @@ def render_portfolio():
         hovermode="x unified"
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    plot_chart(fig)
 
     # -----------------------------
-    # 5. Portfolio metrics
+    # 6. Portfolio metrics
     # -----------------------------
     st.divider()
     st.subheader("Portfolio Metrics")
@@ -359,3 +751,231 @@ def render_portfolio():
 
     st.subheader("Correlation Matrix")
     st.dataframe(p.correlation_matrix())
+
+    # -----------------------------
+    # 7. Efficient frontier
+    # -----------------------------
+    st.subheader("Efficient Frontier")
+    frontier_fig = cache.get_figure("frontier", lambda: optimizer.frontier_graph(current_weights=weights),
+                                    tuple(assets), tuple(sorted(weights.items())))
+    plot_chart(frontier_fig)
+
+    # -----------------------------
+    # 8. Rebalancing backtest
+    # -----------------------------
+    st.divider()
+    st.subheader("Rebalancing Backtest")
+
+    policies = {"Monthly": "monthly", "Quarterly": "quarterly", "Yearly": "yearly",
+                "Drift threshold": "threshold", "Never (buy and hold)": "never", "Daily": "daily"}
+    col1, col2 = st.columns(2)
+    with col1:
+        policy_label = st.selectbox("Rebalancing policy", list(policies))
+    with col2:
+        cost_bps = st.number_input("Transaction cost (bps of traded value)", min_value=0.0, max_value=200.0, value=10.0, step=1.0)
+    threshold = 0.05
+    if policies[policy_label] == "threshold":
+        threshold = st.slider("Rebalance when a weight drifts by more than", 0.01, 0.25, 0.05, 0.01, format="%.2f")
+
+    result = p.backtest(policy=policies[policy_label], threshold=threshold, cost=cost_bps / 10000)
+    ideal = p.portfolio_value()
+
+    fig_bt = go.Figure()
+    for name, series, style in [(f"{policy_label} rebalancing (net of costs)", result.value, dict(width=3)),
+                                ("Fixed weights, no costs", ideal, dict(dash="dot"))]:
+        s = downsample_series(series)
+        fig_bt.add_trace(go.Scatter(x=s.index, y=s.values, name=name, line=style))
+    fig_bt.update_layout(
+        title="Portfolio Value with Rebalancing",
+        yaxis_title="Value",
+        xaxis_title="Date",
+        template="plotly_dark",
+        hovermode="x unified"
+    )
+    plot_chart(fig_bt)
+
+    years = max((result.value.index[-1] - result.value.index[0]).days / 365.25, 1e-9)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Final Value", f"{result.value.iloc[-1]:,.0f}", f"{result.value.iloc[-1] - ideal.iloc[-1]:,.0f} vs fixed weights")
+    col2.metric("Rebalances", result.n_rebalances)
+    col3.metric("Annual Turnover", f"{result.turnover.sum() / years:.1%}")
+    col4.metric("Total Costs", f"{result.total_costs:,.2f}")
+
+    with st.expander("Weights drift"):
+        # Month-end weights are enough to see the drift, and keep the chart light
+        st.area_chart(result.weights.resample('ME').last())
+
+    # -----------------------------
+    # 9. Monte Carlo VaR / ES
+    # -----------------------------
+    st.divider()
+    st.subheader("Monte Carlo VaR / Expected Shortfall")
+
+    models = {"Multivariate normal": "normal", "Multivariate Student-t": "student_t",
+              "Filtered historical bootstrap": "filtered_bootstrap"}
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        model_label = st.selectbox("Model", list(models))
+    with col2:
+        n_scenarios = st.select_slider("Scenarios", options=[10_000, 50_000, 100_000, 500_000], value=50_000)
+    with col3:
+        mc_confidence = st.select_slider("Confidence level", options=[0.90, 0.95, 0.975, 0.99], value=0.99)
+
+    risk = cache.get_cached(
+        "portfolio_mc_risk",
+        lambda: p.monte_carlo_risk(models[model_label], n_scenarios, horizons=(1, 10), confidence_level=mc_confidence, seed=0),
+        tuple(sorted(weights.items())), models[model_label], n_scenarios, mc_confidence
+    )
+    # Historical 1 day VaR of the same portfolio, for comparison
+    hist_returns = p.portfolio_returns()
+    hist_VaR = np.percentile(hist_returns, (1 - mc_confidence) * 100)
+    hist_ES = hist_returns[hist_returns <= hist_VaR].mean()
+
+    risk_table = risk.rename(index=lambda h: f"{h} day{'s' if h > 1 else ''} (Monte Carlo)")
+    risk_table.loc["1 day (historical)"] = [hist_VaR, hist_ES]
+    st.dataframe(risk_table.style.format("{:.2%}"))
+
+from classes.screener import screen_universe
+from load_data.price_store import get_default_store
+from load_data.universe import sp500_tickers
+
+def render_screener():
+    st.title("Screener")
+    st.write("Risk metrics of a whole universe at once, from the local price cache.")
+
+    store = get_default_store()
+
+    # Universe
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        universe = st.radio("Universe", ["Cached tickers", "S&P 500", "Custom"], horizontal=True)
+    if universe == "Cached tickers":
+        tickers = store.tickers()
+    elif universe == "S&P 500":
+        tickers = cache.get_cached("sp500_tickers", sp500_tickers)
+    else:
+        with col2:
+            custom = st.text_input("Tickers, comma separated", value="SPY, AAPL, MSFT, GOOGL, AMZN, NVDA, META")
+        tickers = [t.strip().upper() for t in custom.split(",") if t.strip()]
+
+    if not tickers:
+        st.info("No ticker in this universe yet.")
+        return
+
+    # Only the cache is read : the missing tickers have to be downloaded first
+    cached = set(store.tickers())
+    missing = [t for t in tickers if t not in cached]
+    if missing:
+        st.caption(f"{len(missing)} of {len(tickers)} tickers are not in the local cache.")
+        if st.button(f"Download the {len(missing)} missing tickers"):
+            with st.spinner("Downloading..."):
+                failures = store.prefetch(missing)
+            if failures:
+                st.warning(f"Failed : {', '.join(sorted(failures))}")
+            cached = set(store.tickers())
+            missing = [t for t in tickers if t not in cached]
+
+    # Period and parameters
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        period = st.selectbox("Period", ["1 year", "3 years", "5 years", "10 years", "Max"], index=1)
+    with col2:
+        confidence_level = st.select_slider("VaR confidence level", options=[0.90, 0.95, 0.975, 0.99], value=0.95)
+    with col3:
+        risk_free_rate = st.number_input("Risk free rate", min_value=0.0, max_value=0.2, value=0.02, step=0.005)
+
+    start_date = None
+    if period != "Max":
+        start_date = datetime.date.today() - pd.DateOffset(years=int(period.split()[0]))
+
+    start = time.perf_counter()
+    table = cache.get_cached(
+        "screener",
+        lambda: screen_universe(tickers, start_date=start_date, store=store,
+                                risk_free_rate=risk_free_rate, confidence_level=confidence_level),
+        tuple(tickers), len(missing), period, str(datetime.date.today()), confidence_level, risk_free_rate
+    )
+    elapsed = time.perf_counter() - start
+
+    if table.empty:
+        st.warning("None of these tickers has enough cached history on this period.")
+        return
+
+    # Filters
+    with st.expander("Filters", expanded=True):
+        c1, c2, c3, c4 = st.columns(4)
+        max_vol = c1.slider("Max volatility", 0.0, 2.0, 2.0, 0.05)
+        min_sharpe = c2.slider("Min Sharpe ratio", -3.0, 3.0, -3.0, 0.1)
+        max_drawdown = c3.slider("Max drawdown (at most)", 0.0, 1.0, 1.0, 0.05)
+        momentum_only = c4.checkbox("Positive momentum only")
+
+    mask = (table['Annualized Volatility'] <= max_vol) & (table['Sharpe Ratio'] >= min_sharpe)
+    mask &= table['Max Drawdown'] >= -max_drawdown
+    if momentum_only:
+        mask &= table['Momentum 12-1'] > 0
+    filtered = table[mask]
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Tickers screened", len(table))
+    c2.metric("Matching the filters", len(filtered))
+    c3.metric("Computed in", f"{elapsed:.2f} s")
+
+    # Sortable table (click on the headers)
+    st.dataframe(filtered.sort_values("Sharpe Ratio", ascending=False).style.format({
+        "Last Price": "{:.2f}", "Annualized Return": "{:.2%}", "Annualized Volatility": "{:.2%}",
+        "Sharpe Ratio": "{:.2f}", "Sortino Ratio": "{:.2f}", "Max Drawdown": "{:.2%}",
+        "VaR": "{:.2%}", "ES": "{:.2%}", "Hill Ksi": "{:.3f}",
+        "Momentum 12-1": "{:.2%}", "Momentum Score": "{:.2f}", "Observations": "{:.0f}"
+    }), use_container_width=True)
+
+    # Risk / return map
+    fig = go.Figure(go.Scatter(
+        x=filtered['Annualized Volatility'], y=filtered['Annualized Return'],
+        mode='markers', text=filtered.index,
+        marker=dict(color=filtered['Sharpe Ratio'], colorscale='RdYlGn', showscale=True, colorbar=dict(title="Sharpe"))
+    ))
+    fig.update_layout(
+        title="Risk / Return",
+        xaxis_title="Annualized Volatility",
+        yaxis_title="Annualized Return",
+        xaxis_tickformat=".0%",
+        yaxis_tickformat=".0%",
+        template="plotly_dark"
+    )
+    plot_chart(fig)
+
+
+# -------------------------------------------------------
+# DEBUG PANEL (app.py, with ?debug=1 in the url)
+# -------------------------------------------------------
+
+from classes import instrumentation
+import os
+
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'metrics.prom')
+
+def render_debug_panel(rerun:int | None):
+    with st.expander("Debug : timings", expanded=True):
+        enabled = st.toggle("Instrumentation (whole server)", value=instrumentation.is_enabled())
+        if enabled != instrumentation.is_enabled():
+            instrumentation.enable(enabled)
+            st.rerun()
+        if not enabled:
+            st.caption("Disabled : nothing is recorded. Enable it, then use the page.")
+            return
+
+        st.subheader("This rerun")
+        st.dataframe(instrumentation.summary(rerun), use_container_width=True)
+        st.subheader("Last reruns")
+        st.dataframe(instrumentation.reruns().iloc[::-1], use_container_width=True)
+        st.subheader("Caches")
+        st.dataframe(cache.cache_stats(), use_container_width=True)
+
+        st.subheader("Since the start of the server")
+        st.dataframe(instrumentation.summary(), use_container_width=True)
+        text = instrumentation.to_prometheus()
+        col1, col2 = st.columns(2)
+        col1.download_button("Download metrics.prom", text, file_name="metrics.prom", mime="text/plain")
+        if col2.button("Write data/metrics.prom"):
+            instrumentation.export_prometheus(METRICS_PATH)
+            col2.caption(f"Written to {os.path.abspath(METRICS_PATH)}")